@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+from bench.casos import correr
+from bench.generador import escribir_datos
+
+# --- Benchmarks de la app ---
+#   python -m bench                                  corre 1k y 10k eventos, guarda bench/resultados.json
+#   python -m bench --tamanos 1000 100000 1000000    otros tamaños
+#   python -m bench --guardar-base                   además deja los resultados como bench/base.json
+#   python -m bench --comparar bench/base.json       marca regresiones contra una base (sale con código 1)
+#   python -m bench generar --eventos 100000 --destino /tmp/reyma_100k
+#                                                    solo escribe data/calendar.json, data/units.json y pedidos.xlsx
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS_PATH = os.path.join(DIRECTORIO, "resultados.json")
+BASE_PATH = os.path.join(DIRECTORIO, "base.json")
+TAMANOS = [1000, 10000]
+TOLERANCIA = 0.25  # un mínimo 25% más lento que el de la base cuenta como regresión
+
+
+def comparar(resultados, base, tolerancia=TOLERANCIA):
+    """
+    Lista de (tamaño, caso, tiempo base, tiempo actual) que empeoraron más de `tolerancia`.
+    Se compara el mínimo de cada caso, que es el menos afectado por el ruido de la máquina.
+    """
+    regresiones = []
+    for tamano, casos in resultados["tamanos"].items():
+        for caso, medicion in casos.items():
+            anterior = base.get("tamanos", {}).get(tamano, {}).get(caso)
+            if anterior and medicion["min"] > anterior["min"] * (1 + tolerancia):
+                regresiones.append((tamano, caso, anterior["min"], medicion["min"]))
+    return regresiones
+
+
+def _escribir(path, datos):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmarks del planificador de transportes.")
+    subparsers = parser.add_subparsers(dest="comando")
+    generar = subparsers.add_parser("generar", help="Escribe datos sintéticos sin medir nada.")
+    generar.add_argument("--eventos", type=int, required=True)
+    generar.add_argument("--destino", required=True)
+    generar.add_argument("--semilla", type=int, default=0)
+    generar.add_argument("--sin-excel", action="store_true")
+
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS, help="Número de eventos por calendario.")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default=RESULTADOS_PATH)
+    parser.add_argument("--comparar", metavar="BASE", help="Archivo de resultados contra el cual comparar.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--guardar-base", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.comando == "generar":
+        escribir_datos(args.destino, args.eventos, args.semilla, excel=not args.sin_excel)
+        print(f"✅ Datos sintéticos de {args.eventos} eventos en {args.destino}")
+        return 0
+
+    resultados = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "backend": os.environ.get("REYMA_STORAGE", "json"),
+        "tamanos": {},
+    }
+    for tamano in args.tamanos:
+        print(f"⏱️ {tamano} eventos...")
+        casos = correr(tamano, args.repeticiones, args.semilla)
+        resultados["tamanos"][str(tamano)] = casos
+        for caso, medicion in casos.items():
+            print(f"   {caso:<34} {medicion['mediana'] * 1000:>12.3f} ms")
+
+    _escribir(args.salida, resultados)
+    print(f"📁 Resultados en {args.salida}")
+    if args.guardar_base:
+        _escribir(BASE_PATH, resultados)
+        print(f"📁 Base actualizada en {BASE_PATH}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.tolerancia)
+        for tamano, caso, antes, ahora in regresiones:
+            print(f"⚠️ Regresión en {caso} ({tamano} eventos): {antes * 1000:.3f} ms → {ahora * 1000:.3f} ms")
+        if regresiones:
+            return 1
+        print("✅ Sin regresiones contra la base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
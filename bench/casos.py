@@ -0,0 +1,144 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from bench.generador import generar_calendario, generar_unidades, UNIDADES, DIAS_RETORNO
+from utils import storage
+from utils.calendar_logic import agregar_pedido, eliminar_pedido, editar_dias_retorno
+from utils.disponibilidad import columnas_calendario, pronostico_disponibilidad
+from utils.indices import IndicesCalendario, IndiceTransito
+from utils.migraciones import migrar_calendario
+from utils.modelo import CalendarioModelo
+from utils.planificador import planificar
+
+# --- Casos de benchmark ---
+# Cada caso mide una operación de la app sobre un calendario sintético del tamaño pedido.
+# Los casos por pedido (agregar, eliminar, editar) repiten la operación `OPERACIONES`
+# veces por medición y reportan el tiempo por operación.
+
+OPERACIONES = 100
+PEDIDOS_PLANIFICADOR = 1000  # lote de Excel que se asigna de una vez
+VENTANA_CALENDARIO = 15  # días que muestra la pestaña Calendario con el radio por defecto
+
+
+def _medir(funcion, repeticiones, operaciones=1, preparar=None):
+    """Tiempo por operación (segundos) de `repeticiones` mediciones; `preparar` no se cronometra."""
+    tiempos = []
+    for _ in range(repeticiones):
+        argumento = preparar() if preparar else None
+        inicio = time.perf_counter()
+        funcion(argumento)
+        tiempos.append((time.perf_counter() - inicio) / operaciones)
+    return {
+        "min": min(tiempos),
+        "mediana": statistics.median(tiempos),
+        "repeticiones": repeticiones,
+        "operaciones": operaciones,
+    }
+
+
+def _copiar(calendar):
+    return {fecha: [dict(evento) for evento in eventos] for fecha, eventos in calendar.items()}
+
+
+def correr(eventos, repeticiones=5, semilla=0, directorio=None):
+    """
+    Corre todos los casos para un calendario de `eventos` eventos y devuelve
+    {nombre del caso: {"min", "mediana", "repeticiones", "operaciones"}}.
+    Los casos de almacenamiento escriben en `directorio`/data (uno temporal si no se indica).
+    """
+    rng = random.Random(semilla)
+    calendar, ids = generar_calendario(eventos, semilla)
+    units = generar_unidades(calendar)
+    ultima_fecha = date.fromisoformat(max(calendar)) if calendar else date.today()
+    hoy = ultima_fecha - timedelta(days=10)
+    resultados = {}
+
+    # --- Almacenamiento (nunca sobre el data/ real: por defecto en un directorio temporal) ---
+    anterior = os.getcwd()
+    temporal = None
+    if directorio is None:
+        temporal = tempfile.TemporaryDirectory()
+        directorio = temporal.name
+    os.makedirs(os.path.join(directorio, "data"), exist_ok=True)
+    os.chdir(directorio)
+    try:
+        storage.save_units(units)
+        storage.save_calendar(calendar)
+        resultados["save_calendar"] = _medir(lambda _: storage.save_calendar(calendar), repeticiones)
+
+        def _sin_cache():
+            storage._invalidar("calendar")
+        resultados["load_calendar"] = _medir(lambda _: storage.load_calendar(), repeticiones, preparar=_sin_cache)
+    finally:
+        os.chdir(anterior)
+        if temporal is not None:
+            temporal.cleanup()
+
+    # --- Índices (se arman una vez por versión del calendario) ---
+    resultados["indices_desde_calendario"] = _medir(lambda _: IndicesCalendario.desde_calendario(calendar),
+                                                    repeticiones)
+
+    # --- Altas, bajas y ediciones sobre una copia con sus índices, como hace la app ---
+    trabajo = _copiar(calendar)
+    indices = IndicesCalendario.desde_calendario(trabajo)
+
+    def _agregar(_):
+        for _ in range(OPERACIONES):
+            fecha = hoy + timedelta(days=rng.randrange(30))
+            agregar_pedido(trabajo, units, "Cliente benchmark", rng.choice(UNIDADES), fecha,
+                           rng.choice(DIAS_RETORNO), indices=indices, cambios=[])
+    resultados["agregar_pedido"] = _medir(_agregar, repeticiones, OPERACIONES)
+
+    por_eliminar = rng.sample(ids, min(len(ids), OPERACIONES * repeticiones))
+
+    def _eliminar(_):
+        for _ in range(OPERACIONES):
+            if por_eliminar:
+                eliminar_pedido(trabajo, units, por_eliminar.pop(), indices=indices, cambios=[])
+    resultados["eliminar_pedido"] = _medir(_eliminar, repeticiones, OPERACIONES)
+
+    restantes = [pedido_id for pedido_id in ids if indices.pedidos.entrega(pedido_id)]
+
+    def _editar(_):
+        for _ in range(OPERACIONES):
+            editar_dias_retorno(trabajo, units, rng.choice(restantes), rng.choice(DIAS_RETORNO),
+                                indices=indices, cambios=[])
+    resultados["editar_dias_retorno"] = _medir(_editar, repeticiones, OPERACIONES)
+
+    # --- Migraciones de esquema desde v0 (sobre una copia nueva en cada medición) ---
+    resultados["migrar_retornos"] = _medir(lambda copia: migrar_calendario(copia), repeticiones,
+                                           preparar=lambda: _copiar(calendar))
+
+    # --- Pestaña 0: resumen y pronóstico de disponibilidad ---
+    def _resumen_tras_cambio(_):
+        columnas = columnas_calendario(CalendarioModelo.desde_json(calendar))
+        pronostico_disponibilidad(columnas, units, hoy, 7)
+    resultados["resumen_disponibilidad"] = _medir(_resumen_tras_cambio, repeticiones)
+
+    columnas = columnas_calendario(calendar)
+    resultados["resumen_disponibilidad_en_cache"] = _medir(
+        lambda _: pronostico_disponibilidad(columnas, units, hoy, 7), repeticiones)
+
+    # --- Pestaña 1: asignación automática de un lote de pedidos ---
+    lote = [{"fila": i + 1, "cliente": f"Cliente {i}", "dias_retorno": rng.choice(DIAS_RETORNO),
+             "unidades": rng.choice([None, [rng.choice(UNIDADES)]]), "fecha_minima": None, "fecha_limite": None}
+            for i in range(PEDIDOS_PLANIFICADOR)]
+    resultados["planificar_lote"] = _medir(lambda _: planificar(lote, units, columnas, hoy), repeticiones)
+
+    # --- Pestaña 2: unidades en tránsito en la ventana de días visible ---
+    def _transito_tras_cambio(_):
+        transito = IndiceTransito.desde_calendario(calendar)
+        for i in range(VENTANA_CALENDARIO):
+            transito.en_transito(hoy + timedelta(days=i))
+    resultados["transito_ventana"] = _medir(_transito_tras_cambio, repeticiones)
+
+    transito = IndiceTransito.desde_calendario(calendar)
+    resultados["transito_ventana_en_cache"] = _medir(
+        lambda _: [transito.en_transito(hoy + timedelta(days=i)) for i in range(VENTANA_CALENDARIO)],
+        repeticiones)
+
+    return resultados
@@ -0,0 +1,130 @@
+import json
+import os
+import random
+import uuid
+from datetime import date, timedelta
+
+import pandas as pd
+
+from utils.calendar_logic import calcular_dias_retorno
+
+# --- Generador de datos sintéticos para los benchmarks ---
+# Produce calendar.json, units.json y un Excel de pedidos con la misma forma que deja
+# la app: cada pedido es una entrega y su retorno (2 eventos). La mitad de los retornos
+# tiene la forma de los datos sin migrar (id propio + pedido_id_asociado) y la otra
+# mitad la del esquema actual (solo id_entrega_asociada), para medir las migraciones.
+
+UNIDADES = ["Tráiler 53", "Tráiler 48", "Torton", "Interplanta"]
+PESOS_UNIDADES = [0.55, 0.2, 0.2, 0.05]
+DIAS_RETORNO = [1, 2, 2, 3, 4, 4, 5, 7]
+PEDIDOS_POR_DIA = 40
+FECHA_INICIO = date(2024, 1, 1)
+
+
+def _clientes(rng, cantidad=300):
+    nombres = ["Plastisaro", "Plasticun", "Edce", "Sanchez", "Succasa", "Peralta", "Verbena", "Poliyuca",
+               "Yukunsa", "Fervab", "PDS", "Casa Santos", "Comprando y Ganando", "MS Computacion"]
+    sufijos = ["", " Merida", " Cancun", " Chetumal", " Playa", " Campeche", " Villahermosa", " Tizimin"]
+    clientes = []
+    while len(clientes) < cantidad:
+        clientes.append(f"{rng.choice(nombres)}{rng.choice(sufijos)} {len(clientes)}")
+    return clientes
+
+
+def generar_calendario(eventos, semilla=0, pedidos_por_dia=PEDIDOS_POR_DIA):
+    """
+    Calendario con `eventos` eventos (la mitad entregas, la mitad retornos) repartidos a
+    razón de `pedidos_por_dia` cargas diarias desde FECHA_INICIO.
+    Devuelve (calendar, ids de las entregas en orden de creación).
+    """
+    rng = random.Random(semilla)
+    clientes = _clientes(rng)
+    calendar = {}
+    ids = []
+    for n in range(eventos // 2):
+        fecha_pedido = FECHA_INICIO + timedelta(days=n // pedidos_por_dia)
+        fecha_str = fecha_pedido.strftime("%Y-%m-%d")
+        cliente = rng.choice(clientes)
+        unidad = rng.choices(UNIDADES, PESOS_UNIDADES)[0]
+        dias_retorno = rng.choice(DIAS_RETORNO)
+        dias_retorno_ajustados = calcular_dias_retorno(fecha_pedido, dias_retorno)
+        pedido_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+        calendar.setdefault(fecha_str, []).append({
+            "id": pedido_id,
+            "cliente": cliente,
+            "unidad": unidad,
+            "dias_retorno": dias_retorno,
+            "dias_retorno_calculados": dias_retorno_ajustados,
+            "fecha_pedido": fecha_str,
+            "tipo_evento": "entrega"
+        })
+        retorno_str = (fecha_pedido + timedelta(days=dias_retorno_ajustados)).strftime("%Y-%m-%d")
+        if n % 2 == 0:
+            retorno = {
+                "id": f"retorno-{pedido_id}",
+                "tipo_evento": "retorno",
+                "unidad": unidad,
+                "pedido_id_asociado": pedido_id,
+                "cliente_asociado": cliente,
+                "fecha_pedido_asociado": fecha_str
+            }
+        else:
+            retorno = {
+                "tipo_evento": "retorno",
+                "unidad": unidad,
+                "id_entrega_asociada": pedido_id,
+                "cliente_asociado": cliente,
+                "fecha_pedido_asociado": fecha_str
+            }
+        calendar.setdefault(retorno_str, []).append(retorno)
+        ids.append(pedido_id)
+    return calendar, ids
+
+
+def generar_unidades(calendar, holgura=5):
+    """Unidades base suficientes para el día más cargado de cada tipo, más una holgura."""
+    diferencias = {}
+    for eventos in calendar.values():
+        for evento in eventos:
+            if evento.get("tipo_evento") == "entrega":
+                inicio = date.fromisoformat(evento["fecha_pedido"]).toordinal()
+                fila = diferencias.setdefault(evento["unidad"], {})
+                fila[inicio] = fila.get(inicio, 0) + 1
+                fin = inicio + evento["dias_retorno_calculados"]
+                fila[fin] = fila.get(fin, 0) - 1
+    units = {}
+    for unidad in UNIDADES:
+        ocupadas = maximo = 0
+        for dia in sorted(diferencias.get(unidad, {})):
+            ocupadas += diferencias[unidad][dia]
+            maximo = max(maximo, ocupadas)
+        units[unidad] = maximo + holgura
+    return units
+
+
+def generar_pedidos_excel(filas, semilla=0):
+    """DataFrame con las columnas que pide `cargar_excel` (Cliente, Días Retorno)."""
+    rng = random.Random(semilla)
+    clientes = _clientes(rng)
+    return pd.DataFrame({
+        "Cliente": [rng.choice(clientes) for _ in range(filas)],
+        "Días Retorno": [rng.choice(DIAS_RETORNO) for _ in range(filas)],
+    })
+
+
+def escribir_datos(destino, eventos, semilla=0, excel=True):
+    """
+    Escribe en `destino` la misma estructura que usa la app: data/calendar.json,
+    data/units.json y, si se pide, pedidos.xlsx con una fila por pedido.
+    """
+    calendar, _ = generar_calendario(eventos, semilla)
+    data_dir = os.path.join(destino, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, "calendar.json"), "w", encoding="utf-8") as f:
+        json.dump(calendar, f, indent=2)
+    with open(os.path.join(data_dir, "units.json"), "w", encoding="utf-8") as f:
+        json.dump(generar_unidades(calendar), f, indent=2)
+    if excel:
+        generar_pedidos_excel(eventos // 2, semilla).to_excel(os.path.join(destino, "pedidos.xlsx"), index=False)
+    return calendar
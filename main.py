@@ -1,381 +1,818 @@
 import streamlit as st
+import math
+import io
+import numpy as np
 import pandas as pd
 from datetime import date
 from utils.file_handler import cargar_excel
 from utils.storage import load_units, save_units, load_calendar, save_calendar, load_pedidos_excel, save_pedidos_excel, \
-    PEDIDOS_EXCEL_PATH
-from utils.calendar_logic import agregar_pedido, eliminar_pedido, editar_dias_retorno
+    delete_pedidos_excel, obtener_derivado, clientes_normalizados, escritura_calendario
+from utils.calendar_logic import agregar_pedidos, eliminar_pedido, editar_dias_retorno
+from utils.indices import IndicesCalendario
+from utils.disponibilidad import columnas_calendario, pronostico_disponibilidad
+from utils import diagnostico
+from utils.busqueda import IndiceClientes
+from utils.planificador import HORIZONTE_DIAS, pedidos_desde_excel, planificar
+from utils.eventos import id_entrega_de_retorno
+from utils import exportacion
+from utils.historial import Historial, auditoria, registrar_auditoria
 from datetime import datetime, timedelta
-import os
-import json
+
+# Fechas que se muestran como máximo al filtrar el calendario por cliente
+MAX_FECHAS_FILTRO_CLIENTE = 30
 
 # 📌 Configuración de la app
 st.set_page_config(page_title="Reyma del Sureste - Logística", layout="wide")
 st.title("🚚 Planificador de Transportes | Reyma del Sureste")
 
-# 🔄 Carga de datos persistentes al inicio de la app
-units = load_units()
-calendar = load_calendar()
-pedidos_excel_df = load_pedidos_excel()
 
-tabs = st.tabs(["📦 Unidades disponibles", "📥 Cargar pedidos", "🗓️ Calendario", "🧹 Limpieza"])
+# --- Datos del calendario para cada pestaña: en memoria mientras el calendario no cambie ---
+def datos_calendario():
+    """
+    Calendario e índices (pedidos por id, tránsito carga→retorno y capacidad). Se rearman
+    solo si el calendario cambió, así que cada pestaña puede pedirlos sin costo en sus
+    propios reruns.
+    """
+    calendar = load_calendar()
+    indices = obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario)
+    return calendar, indices
+
+
+def calendario_para_escribir():
+    """
+    Calendario e índices vigentes para modificarlos. Se llama con `escritura_calendario`
+    tomado, que se sostiene hasta guardar y registrar la operación en el historial.
+    """
+    calendar = load_calendar()
+    indices = obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario)
+    return calendar, indices
+
+
+def olvidar_seleccion_excel():
+    """
+    Quita lo marcado sobre el Excel guardado (asignaciones, página, ediciones de la tabla,
+    selección masiva y propuesta). Todo va por número de fila: con otro Excel, o sin Excel,
+    quedaría pegado a pedidos distintos.
+    """
+    for clave in ["asignaciones_excel", "excel_pagina", "masivo_filas", "propuesta_excel"]:
+        st.session_state.pop(clave, None)
+    for clave in [clave for clave in st.session_state if str(clave).startswith("editor_excel_")]:
+        del st.session_state[clave]
+
+
+def historial_sesion():
+    """Pilas de deshacer/rehacer de esta sesión, con el usuario de la barra lateral para la auditoría."""
+    if "historial" not in st.session_state:
+        st.session_state.historial = Historial()
+    historial = st.session_state.historial
+    if st.session_state.get("usuario"):
+        historial.usuario = st.session_state.usuario
+    return historial
+
+
+# ⏱️ Tiempos por rerun de esta sesión, solo con REYMA_DIAGNOSTICO=1
+diagnostico.iniciar_rerun(historial_sesion().sesion)
+
+
+# ↩️ Deshacer/rehacer de esta sesión y auditoría (barra lateral, fuera de los fragmentos)
+with st.sidebar:
+    st.text_input("👤 Usuario", key="usuario", help="Nombre con el que quedan tus cambios en la auditoría.")
+    historial = historial_sesion()
+    col_deshacer, col_rehacer = st.columns(2)
+    with col_deshacer:
+        deshacer = st.button("↩️ Deshacer", key="btn_deshacer", disabled=historial.por_deshacer() is None,
+                             help=historial.por_deshacer())
+    with col_rehacer:
+        rehacer = st.button("↪️ Rehacer", key="btn_rehacer", disabled=historial.por_rehacer() is None,
+                            help=historial.por_rehacer())
+    if deshacer or rehacer:
+        with escritura_calendario:
+            calendar, indices = calendario_para_escribir()
+            cambios = []
+            operacion = historial.deshacer if deshacer else historial.rehacer
+            ok, msg = operacion(calendar, indices=indices, cambios=cambios)
+            if cambios:
+                save_calendar(calendar, cambios)
+        st.session_state.mensaje_historial = (ok, msg)
+        st.rerun()
+    if st.session_state.get("mensaje_historial"):
+        ok, msg = st.session_state.pop("mensaje_historial")
+        (st.success if ok else st.warning)(msg)
+    with st.expander("🧾 Auditoría"):
+        registros = auditoria(30)
+        if registros:
+            st.dataframe(pd.DataFrame([{"Fecha": r["fecha"], "Usuario": r["usuario"], "Acción": r["accion"],
+                                        "Descripción": r["descripcion"]} for r in registros]), hide_index=True)
+        else:
+            st.caption("Aún no hay cambios registrados.")
 
-# 📦 Unidades disponibles - Lógica de "En Tránsito" corregida
-with tabs[0]:
-    st.subheader("🔧 Configurar unidades base")
-    for unidad in units:
-        nuevo_valor = st.number_input(f"{unidad}", value=units[unidad], min_value=0, step=1,
-                                      key=f"config_unit_{unidad}")
-        units[unidad] = nuevo_valor
-    save_units(units)
-
-    st.markdown("---")
-    st.subheader("📊 Resumen y Pronóstico de Unidades")
-
-    hoy = datetime.today().date()
-    mañana = hoy + timedelta(days=1)
-
-    hoy_str = hoy.strftime("%Y-%m-%d")
-    mañana_str = mañana.strftime("%Y-%m-%d")
-
-    # Contadores para cargas y retornos por día (hoy y mañana)
-    cargas_hoy = {unidad: 0 for unidad in units.keys()}
-    retornos_hoy = {unidad: 0 for unidad in units.keys()}
-    cargas_mañana = {unidad: 0 for unidad in units.keys()}
-    retornos_mañana = {unidad: 0 for unidad in units.keys()}
-    unidades_en_transito = {unidad: 0 for unidad in units.keys()}
-
-    # Iterar por TODO el calendario para calcular las unidades en tránsito y los eventos del día
-    for fecha_cal_str, eventos_dia in calendar.items():
-        fecha_cal_dt = datetime.strptime(fecha_cal_str, "%Y-%m-%d").date()
-
-        for evento in eventos_dia:
-            if evento.get("tipo_evento") == "entrega":
-                unidad_entrega = evento["unidad"]
-                fecha_pedido_entrega_dt = datetime.strptime(evento["fecha_pedido"], "%Y-%m-%d").date()
-
-                dias_retorno_para_calculo = evento.get('dias_retorno_calculados', evento['dias_retorno'])
-
-                fecha_retorno_estimada = fecha_pedido_entrega_dt + timedelta(days=dias_retorno_para_calculo)
-
-                # Lógica corregida: El tránsito son los que salieron ANTES de hoy.
-                if fecha_pedido_entrega_dt < hoy and fecha_retorno_estimada > hoy:
-                    unidades_en_transito[unidad_entrega] += 1
-
-                if fecha_pedido_entrega_dt == hoy:
-                    cargas_hoy[unidad_entrega] += 1
-                elif fecha_pedido_entrega_dt == mañana:
-                    cargas_mañana[unidad_entrega] += 1
-
-            elif evento.get("tipo_evento") == "retorno":
-                unidad_retorno = evento["unidad"]
-                if fecha_cal_dt == hoy:
-                    retornos_hoy[unidad_retorno] += 1
-                elif fecha_cal_dt == mañana:
-                    retornos_mañana[unidad_retorno] += 1
-
-    # Preparar datos para la tabla
-    data = []
-    for unidad_tipo in units.keys():
-        disponibles_config = units[unidad_tipo]
-
-        # El cálculo de "disponibles hoy neto" se basa en las unidades totales menos
-        # las que salieron ANTES de hoy, más los retornos de hoy, menos las cargas de hoy.
-        disponibles_neto_hoy = (
-                disponibles_config - unidades_en_transito[unidad_tipo] +
-                retornos_hoy[unidad_tipo] - cargas_hoy[unidad_tipo]
-        )
-
-        # Pronóstico para mañana: Disponibles Hoy (Neto) + Retornos de Mañana - Cargas de Mañana
-        pronostico_mañana = disponibles_neto_hoy + retornos_mañana[unidad_tipo] - cargas_mañana[unidad_tipo]
-
-        data.append({
-            "Unidad": unidad_tipo,
-            "Config. Base (Físicas)": disponibles_config,
-            f"Cargas Hoy ({hoy.strftime('%d/%m')})": cargas_hoy[unidad_tipo],
-            f"Retornos Hoy ({hoy.strftime('%d/%m')})": retornos_hoy[unidad_tipo],
-            "En Tránsito (Ahora)": unidades_en_transito[unidad_tipo],
-            f"Disponibles Hoy (Neto)": disponibles_neto_hoy,
-            f"Cargas Mañana ({mañana.strftime('%d/%m')})": cargas_mañana[unidad_tipo],
-            f"Retornos Mañana ({mañana.strftime('%d/%m')})": retornos_mañana[unidad_tipo],
-            f"Pronóstico Mañana ({mañana.strftime('%d/%m')})": pronostico_mañana
-        })
-
-    df_resumen = pd.DataFrame(data)
-
-    # --- Calcular y añadir fila de totales ---
-    totales = df_resumen.sum(numeric_only=True)
-    totales_df = pd.DataFrame(totales).T
-    totales_df.insert(0, "Unidad", "TOTAL")
-    totales_df = totales_df[df_resumen.columns]
-    df_resumen_con_totales = pd.concat([df_resumen, totales_df], ignore_index=True)
-
-    st.dataframe(df_resumen_con_totales.set_index("Unidad"))
 
-# 📥 Cargar pedidos - (Sin cambios en esta sección)
-with tabs[1]:
-    st.subheader("📁 Cargar pedidos desde Excel")
+# Cada pestaña es un fragmento: un widget de una pestaña vuelve a ejecutar solo esa pestaña.
+# Lo que cambia datos compartidos (registrar, eliminar, editar, limpiar) termina en st.rerun()
+# para que el resto de la app se actualice.
 
-    df_cargado_temporal = cargar_excel()
+# 📦 Unidades disponibles - Lógica de "En Tránsito" corregida
+@st.fragment
+def pestana_unidades():
+    with diagnostico.fragmento("tab.Unidades disponibles", historial_sesion().sesion):
+        units = load_units()
+
+        st.subheader("🔧 Configurar unidades base")
+        nuevas = {unidad: st.number_input(f"{unidad}", value=units[unidad], min_value=0, step=1,
+                                          key=f"config_unit_{unidad}")
+                  for unidad in units}
+        # Solo se escribe units.json si de verdad cambió algún valor
+        if nuevas != units:
+            save_units(nuevas)
+            units = nuevas
 
-    if df_cargado_temporal is not None:
-        st.info("Archivo Excel listo para ser guardado.")
-        if st.button("💾 Guardar Pedidos del Excel", type="primary"):
-            save_pedidos_excel(df_cargado_temporal)
-            st.success("Archivo Excel cargado y guardado correctamente.")
-            st.rerun()
-    elif pedidos_excel_df is None:
-        st.info("Por favor, sube un archivo Excel para empezar a registrar pedidos.")
+        st.markdown("---")
+        st.subheader("📊 Resumen y Pronóstico de Unidades")
+
+        hoy = datetime.today().date()
+        mañana = hoy + timedelta(days=1)
+
+        # Motor de disponibilidad: columnas del calendario en memoria mientras no cambie
+        columnas = obtener_derivado("calendar", "columnas_disponibilidad", columnas_calendario)
+        horizonte = st.selectbox("Horizonte del pronóstico (días)", options=[7, 14, 30, 90], index=0,
+                                 key="horizonte_pronostico")
+        pronostico = pronostico_disponibilidad(columnas, units, hoy, horizonte)
+
+        # Preparar datos para la tabla
+        data = []
+        for unidad_tipo in units.keys():
+            disponibles_config = units[unidad_tipo]
+            dia_hoy = pronostico.loc[(unidad_tipo, hoy)]
+            dia_mañana = pronostico.loc[(unidad_tipo, mañana)]
+
+            # El cálculo de "disponibles hoy neto" se basa en las unidades totales menos
+            # las que salieron ANTES de hoy, más los retornos de hoy, menos las cargas de hoy.
+            # Pronóstico para mañana: Disponibles Hoy (Neto) + Retornos de Mañana - Cargas de Mañana
+            data.append({
+                "Unidad": unidad_tipo,
+                "Config. Base (Físicas)": disponibles_config,
+                f"Cargas Hoy ({hoy.strftime('%d/%m')})": dia_hoy["Cargas"],
+                f"Retornos Hoy ({hoy.strftime('%d/%m')})": dia_hoy["Retornos"],
+                "En Tránsito (Ahora)": dia_hoy["En Tránsito"],
+                f"Disponibles Hoy (Neto)": dia_hoy["Disponibles"],
+                f"Cargas Mañana ({mañana.strftime('%d/%m')})": dia_mañana["Cargas"],
+                f"Retornos Mañana ({mañana.strftime('%d/%m')})": dia_mañana["Retornos"],
+                f"Pronóstico Mañana ({mañana.strftime('%d/%m')})": dia_mañana["Disponibles"]
+            })
+
+        df_resumen = pd.DataFrame(data)
+
+        # --- Calcular y añadir fila de totales ---
+        totales = df_resumen.sum(numeric_only=True)
+        totales_df = pd.DataFrame(totales).T
+        totales_df.insert(0, "Unidad", "TOTAL")
+        totales_df = totales_df[df_resumen.columns]
+        df_resumen_con_totales = pd.concat([df_resumen, totales_df], ignore_index=True)
+
+        st.dataframe(df_resumen_con_totales.set_index("Unidad"))
+
+        st.markdown(f"#### 📈 Disponibles netas — próximos {horizonte} días")
+        st.line_chart(pronostico["Disponibles"].unstack("Unidad"))
+        with st.expander("Ver pronóstico día por día"):
+            st.dataframe(pronostico)
 
-    df_actual_pedidos = pedidos_excel_df
 
-    if df_actual_pedidos is not None and not df_actual_pedidos.empty:
-        st.write("---")
-        st.subheader("Pedidos disponibles para registrar:")
+# 📥 Cargar pedidos - (Sin cambios en esta sección)
+@st.fragment
+def pestana_cargar_pedidos():
+    with diagnostico.fragmento("tab.Cargar pedidos", historial_sesion().sesion):
+        units = load_units()
+        calendar, indices = datos_calendario()
+        pedidos_excel_df = load_pedidos_excel()
+
+        st.subheader("📁 Cargar pedidos desde Excel")
+
+        df_cargado_temporal = cargar_excel(list(units.keys()))
+
+        if df_cargado_temporal is not None:
+            st.info("Archivo Excel listo para ser guardado.")
+            if st.button("💾 Guardar Pedidos del Excel", type="primary"):
+                save_pedidos_excel(df_cargado_temporal)
+                olvidar_seleccion_excel()
+                st.success("Archivo Excel cargado y guardado correctamente.")
+                st.rerun()
+        elif pedidos_excel_df.empty:
+            st.info("Por favor, sube un archivo Excel para empezar a registrar pedidos.")
+
+        df_actual_pedidos = pedidos_excel_df
+
+        if df_actual_pedidos is not None and not df_actual_pedidos.empty:
+            st.write("---")
+            st.subheader("Pedidos disponibles para registrar:")
+
+            search_cliente_registrar = st.text_input("🔍 Buscar cliente para registrar:", "",
+                                                     key="search_cliente_registrar")
+
+            if search_cliente_registrar:
+                # El índice (prefijo + trigramas) se arma una vez sobre los clientes distintos;
+                # las filas se eligen y ordenan por el puntaje de su código de categoría
+                indice_clientes_excel = obtener_derivado(
+                    "pedidos_excel", "indice_clientes",
+                    lambda df: IndiceClientes(df["Cliente"].cat.categories, clientes_normalizados(df))
+                )
+                puntaje_por_codigo = np.zeros(len(indice_clientes_excel.nombres) + 1)  # último: código -1 (vacío)
+                for codigo, puntaje in indice_clientes_excel.buscar(search_cliente_registrar):
+                    puntaje_por_codigo[codigo] = puntaje
+                puntajes_filas = puntaje_por_codigo[df_actual_pedidos["Cliente"].cat.codes.to_numpy()]
+                orden = np.argsort(-puntajes_filas, kind="stable")
+                df_display = df_actual_pedidos.iloc[orden[puntajes_filas[orden] > 0]]
+                if df_display.empty:
+                    st.warning(f"No se encontraron clientes que coincidan con '{search_cliente_registrar}'.")
+            else:
+                df_display = df_actual_pedidos
 
-        search_cliente_registrar = st.text_input("🔍 Buscar cliente para registrar:", "",
-                                                 key="search_cliente_registrar").lower()
+            st.dataframe(df_display)
 
-        if search_cliente_registrar:
-            df_display = df_actual_pedidos[
-                df_actual_pedidos["Cliente"].astype(str).str.lower().str.contains(search_cliente_registrar)
-            ]
-            if df_display.empty:
-                st.warning(f"No se encontraron clientes que coincidan con '{search_cliente_registrar}'.")
-        else:
-            df_display = df_actual_pedidos
+            if st.button("🗑️ Eliminar Excel cargado (permanentemente)", type="secondary"):
+                delete_pedidos_excel()
+                olvidar_seleccion_excel()
+                st.success("Archivo Excel de pedidos guardado eliminado.")
+                st.rerun()
 
-        st.dataframe(df_display)
+            permitir_sobrecupo = st.checkbox("⚠️ Permitir sobrecupo (registrar aunque no queden unidades libres)",
+                                             key="permitir_sobrecupo")
 
-        if st.button("🗑️ Eliminar Excel cargado (permanentemente)", type="secondary"):
-            if os.path.exists(PEDIDOS_EXCEL_PATH):
-                os.remove(PEDIDOS_EXCEL_PATH)
-                st.success("Archivo Excel de pedidos guardado eliminado.")
+            # --- Registro masivo: una misma fecha y unidad para varios pedidos, un solo guardado ---
+            with st.expander("📦 Registro masivo", expanded=False):
+                todos_filtrados = st.checkbox(f"Seleccionar todos los pedidos mostrados ({len(df_display)})",
+                                              key="masivo_todos")
+                if todos_filtrados:
+                    filas_seleccionadas = list(df_display.index)
+                else:
+                    filas_seleccionadas = st.multiselect(
+                        "Pedidos a registrar:",
+                        options=list(df_display.index),
+                        format_func=lambda i: f"#{i + 1} · {df_display.at[i, 'Cliente']} ({df_display.at[i, 'Días Retorno']} días)",
+                        key="masivo_filas"
+                    )
+                col_fecha_masiva, col_unidad_masiva = st.columns(2)
+                with col_fecha_masiva:
+                    fecha_masiva = st.date_input("Fecha de carga para todos", value=date.today(), key="masivo_fecha")
+                with col_unidad_masiva:
+                    unidad_masiva = st.selectbox("Unidad para todos", options=list(units.keys()), key="masivo_unidad")
+
+                if st.button(f"➕ Registrar {len(filas_seleccionadas)} pedidos", key="masivo_btn",
+                             disabled=not filas_seleccionadas):
+                    pedidos_lote = [{
+                        "fila": i + 1,
+                        "cliente": df_display.at[i, "Cliente"],
+                        "unidad": unidad_masiva,
+                        "fecha_pedido": fecha_masiva,
+                        "dias_retorno": df_display.at[i, "Días Retorno"]
+                    } for i in filas_seleccionadas]
+                    with escritura_calendario:
+                        calendar, indices = calendario_para_escribir()
+                        cambios = []
+                        reporte = agregar_pedidos(calendar, units, pedidos_lote, indices=indices, cambios=cambios,
+                                                  permitir_sobrecupo=permitir_sobrecupo)
+                        if cambios:
+                            save_calendar(calendar, cambios)
+                            historial_sesion().registrar("agregar", f"Registro masivo de {len(cambios) // 2} pedidos "
+                                                         f"({unidad_masiva}, {fecha_masiva.strftime('%d/%m/%Y')})", cambios)
+                    st.session_state.reporte_registro_masivo = reporte
+                    st.rerun()
+
+            # --- Asignación automática: unidad y fecha propuestas para todo lo mostrado, se acepta completa ---
+            with st.expander("🤖 Asignación automática", expanded=False):
+                st.caption("Propone unidad y fecha de carga para los pedidos mostrados sin dejar días en sobrecupo. "
+                           "Si el Excel trae 'Unidades permitidas' (o 'Unidad'), 'Fecha' y 'Fecha límite', se respetan.")
+                col_desde_plan, col_horizonte_plan = st.columns(2)
+                with col_desde_plan:
+                    desde_plan = st.date_input("Cargar a partir de", value=date.today(), key="plan_desde")
+                with col_horizonte_plan:
+                    horizonte_plan = st.number_input("Días posibles de carga (sin fecha límite)", min_value=1,
+                                                     max_value=90, value=HORIZONTE_DIAS, key="plan_horizonte")
+                if st.button(f"🤖 Proponer asignación ({len(df_display)} pedidos)", key="plan_btn",
+                             disabled=df_display.empty):
+                    columnas = obtener_derivado("calendar", "columnas_disponibilidad", columnas_calendario)
+                    asignados, sin_asignar = planificar(pedidos_desde_excel(df_display), units, columnas,
+                                                        desde_plan, int(horizonte_plan))
+                    st.session_state.propuesta_excel = {"asignados": asignados, "sin_asignar": sin_asignar}
+
+                propuesta = st.session_state.get("propuesta_excel")
+                if propuesta:
+                    asignados, sin_asignar = propuesta["asignados"], propuesta["sin_asignar"]
+                    st.success(f"✅ {len(asignados)} de {len(asignados) + len(sin_asignar)} pedidos con unidad y fecha.")
+                    if asignados:
+                        st.dataframe(pd.DataFrame(asignados).sort_values("fila").rename(columns={
+                            "fila": "#", "cliente": "Cliente", "unidad": "Unidad", "fecha_pedido": "Fecha pedido",
+                            "dias_retorno": "Días Retorno", "dias_retorno_calculados": "Días calculados"
+                        }).set_index("#"))
+                    if sin_asignar:
+                        st.warning(f"⚠️ {len(sin_asignar)} pedidos sin unidad libre en el horizonte.")
+                        st.dataframe(pd.DataFrame(sin_asignar).rename(columns={
+                            "fila": "#", "cliente": "Cliente", "motivo": "Motivo"
+                        }).set_index("#"))
+                    col_aceptar_plan, col_descartar_plan = st.columns(2)
+                    with col_aceptar_plan:
+                        if st.button("✅ Aceptar propuesta", type="primary", key="plan_aceptar", disabled=not asignados):
+                            # Se registran en el orden planificado; si el calendario cambió desde la
+                            # propuesta, la revisión de capacidad de cada pedido vuelve a aplicarse
+                            with escritura_calendario:
+                                calendar, indices = calendario_para_escribir()
+                                cambios = []
+                                reporte = agregar_pedidos(calendar, units, asignados, indices=indices, cambios=cambios)
+                                if cambios:
+                                    save_calendar(calendar, cambios)
+                                    historial_sesion().registrar(
+                                        "agregar", f"Asignación automática de {len(cambios) // 2} pedidos", cambios)
+                            st.session_state.reporte_registro_masivo = reporte
+                            del st.session_state["propuesta_excel"]
+                            st.rerun()
+                    with col_descartar_plan:
+                        if st.button("Descartar propuesta", key="plan_descartar"):
+                            del st.session_state["propuesta_excel"]
+                            st.rerun()
+
+            st.info("Asigna unidad y fecha para cada pedido cargado y marca los que quieras registrar:")
+
+            # Solo se arma la página visible; lo asignado en cada fila se guarda por índice
+            # del pedido en la sesión, así que sobrevive a cambios de página y de búsqueda.
+            asignaciones = st.session_state.setdefault("asignaciones_excel", {})
+            unidades_opciones = list(units.keys())
+
+            col_tamano, col_pagina = st.columns(2)
+            with col_tamano:
+                tamano_pagina = st.selectbox("Pedidos por página", options=[25, 50, 100], key="excel_tamano_pagina")
+            total_paginas = max(1, math.ceil(len(df_display) / tamano_pagina))
+            with col_pagina:
+                pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1,
+                                         step=1, key="excel_pagina")
+            pagina = min(int(pagina), total_paginas)
+            df_pagina = df_display.iloc[(pagina - 1) * tamano_pagina: pagina * tamano_pagina]
+
+            # Si el Excel traía unidad o fecha de carga, prellenan la fila mientras no se edite
+            fechas_excel = {i: pd.Timestamp(fecha).date()
+                            for i, fecha in df_pagina.get("Fecha", pd.Series(dtype=object)).items() if pd.notna(fecha)}
+            unidades_excel = {i: unidad for i, unidad in df_pagina.get("Unidad", pd.Series(dtype=object)).items()
+                              if unidad in units}
+
+            vista_pagina = pd.DataFrame({
+                "Cliente": df_pagina["Cliente"],
+                "Días Retorno": df_pagina["Días Retorno"],
+                "Fecha": [asignaciones.get(i, {}).get("Fecha", fechas_excel.get(i, date.today())) for i in df_pagina.index],
+                "Unidad": [asignaciones.get(i, {}).get("Unidad", unidades_excel.get(i, unidades_opciones[0]))
+                           for i in df_pagina.index],
+                "Registrar": [asignaciones.get(i, {}).get("Registrar", False) for i in df_pagina.index],
+            }, index=df_pagina.index)
+
+            editado = st.data_editor(
+                vista_pagina,
+                key=f"editor_excel_{hash(tuple(df_pagina.index))}",
+                disabled=["Cliente", "Días Retorno"],
+                column_config={
+                    "Fecha": st.column_config.DateColumn("Fecha pedido", required=True),
+                    "Unidad": st.column_config.SelectboxColumn("Unidad", options=unidades_opciones, required=True),
+                    "Registrar": st.column_config.CheckboxColumn("➕ Registrar"),
+                },
+            )
+            for index, fila in editado.iterrows():
+                asignaciones[index] = {"Fecha": fila["Fecha"], "Unidad": fila["Unidad"], "Registrar": bool(fila["Registrar"])}
+
+            marcados = [i for i, asignacion in asignaciones.items()
+                        if asignacion["Registrar"] and i in df_actual_pedidos.index]
+            if st.button(f"➕ Registrar pedidos marcados ({len(marcados)})", type="primary", key="btn_registrar_marcados",
+                         disabled=not marcados):
+                pedidos_lote = [{
+                    "fila": i + 1,
+                    "cliente": df_actual_pedidos.at[i, "Cliente"],
+                    "unidad": asignaciones[i]["Unidad"],
+                    "fecha_pedido": pd.Timestamp(asignaciones[i]["Fecha"]).date(),
+                    "dias_retorno": df_actual_pedidos.at[i, "Días Retorno"]
+                } for i in marcados]
+                with escritura_calendario:
+                    calendar, indices = calendario_para_escribir()
+                    cambios = []
+                    reporte = agregar_pedidos(calendar, units, pedidos_lote, indices=indices, cambios=cambios,
+                                              permitir_sobrecupo=permitir_sobrecupo)
+                    if cambios:
+                        save_calendar(calendar, cambios)
+                        historial_sesion().registrar("agregar", f"Registro de {len(cambios) // 2} pedidos marcados",
+                                                     cambios)
+                # Los registrados se desmarcan; los rechazados quedan marcados para corregirlos
+                for i, resultado in zip(marcados, reporte):
+                    if resultado["ok"]:
+                        asignaciones[i]["Registrar"] = False
+                # Se descartan las ediciones pendientes de la tabla para que no vuelvan a marcar lo registrado
+                for clave in [clave for clave in st.session_state if str(clave).startswith("editor_excel_")]:
+                    del st.session_state[clave]
+                st.session_state.reporte_registro_masivo = reporte
                 st.rerun()
 
-        st.info("Asigna unidad y fecha para cada pedido cargado:")
-        for index, row in df_display.iterrows():
-            st.markdown("---")
-            cliente = row["Cliente"]
-            dias_retorno = row["Días Retorno"]
+            if st.session_state.get("reporte_registro_masivo"):
+                reporte = st.session_state.reporte_registro_masivo
+                registrados = sum(1 for r in reporte if r["ok"])
+                st.success(f"✅ {registrados} de {len(reporte)} pedidos registrados.")
+                st.dataframe(pd.DataFrame(reporte).drop(columns="id", errors="ignore").rename(columns={
+                    "fila": "#", "cliente": "Cliente", "unidad": "Unidad", "ok": "Registrado", "mensaje": "Detalle"
+                }).set_index("#"))
+        elif pedidos_excel_df is not None and pedidos_excel_df.empty:
+            st.info("El archivo Excel cargado no contiene pedidos válidos.")
 
-            col1, col2, col3, col4 = st.columns(4)
+
+# 🗓️ Calendario - Lógica de unidades en tránsito corregida
+@st.fragment
+def pestana_calendario():
+    with diagnostico.fragmento("tab.Calendario", historial_sesion().sesion):
+        units = load_units()
+        calendar, indices = datos_calendario()
+
+        st.subheader("📆 Calendario de Pedidos")
+
+        with st.expander("📤 Exportar pedidos (CSV, Parquet o Excel)"):
+            st.caption("Una fila por pedido con su retorno: fecha de carga, fecha de retorno calculada, unidad, "
+                       "cliente, días de retorno configurados y calculados, y el día en que quedó el retorno.")
+            col1, col2, col3 = st.columns([1, 1, 1])
             with col1:
-                st.write(f"🧾 **Cliente:** {cliente}")
+                export_desde = st.date_input("Cargas desde", value=None, key="export_desde")
             with col2:
-                fecha_pedido = st.date_input(f"Fecha pedido #{index + 1}", value=date.today(), key=f"fecha_{index}")
+                export_hasta = st.date_input("Cargas hasta", value=None, key="export_hasta")
             with col3:
-                unidad = st.selectbox(f"Unidad #{index + 1}", options=list(units.keys()), key=f"unidad_{index}")
-            with col4:
-                confirmar = st.button("➕ Registrar pedido", key=f"btn_{index}")
-                if confirmar:
-                    ok, mensaje = agregar_pedido(calendar, units, cliente, unidad, fecha_pedido, dias_retorno)
-                    if ok:
-                        st.success(mensaje)
-                        save_units(units)
-                        save_calendar(calendar)
-                        st.rerun()
-                    else:
-                        st.error(mensaje)
-    elif pedidos_excel_df is not None and pedidos_excel_df.empty:
-        st.info("El archivo Excel cargado no contiene pedidos válidos.")
+                export_formato = st.selectbox("Formato", exportacion.FORMATOS, key="export_formato")
+            export_unidades = st.multiselect("Unidades (vacío = todas)", list(units.keys()), key="export_unidades")
+            if st.button("Generar archivo", key="export_btn"):
+                # Se escribe por bloques en memoria y sin archivos temporales; el botón de descarga sirve los bytes
+                st.session_state.pop("exportacion", None)
+                salida = io.BytesIO()
+                try:
+                    filas = exportacion.exportar(salida, export_formato, export_desde, export_hasta, export_unidades)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    st.session_state.exportacion = {"datos": salida.getvalue(), "formato": export_formato,
+                                                    "filas": filas}
+            generado = st.session_state.get("exportacion")
+            if generado:
+                st.download_button(f"⬇️ Descargar ({generado['filas']} pedidos)", generado["datos"],
+                                       file_name=f"pedidos.{generado['formato']}", key="export_descargar")
+
+        if isinstance(calendar, dict):
+            st.markdown("---")
+            fecha_seleccionada = st.date_input("Seleccionar fecha específica:", value=None,
+                                               help="Deja en blanco para ver los días alrededor de la fecha central.")
+            cliente_calendario = st.text_input("🔍 Filtrar por cliente:", "", key="calendario_cliente",
+                                               help="Sin acentos ni mayúsculas; tolera errores de dedo.")
+            st.markdown("---")
 
-# 🗓️ Calendario - Lógica de unidades en tránsito corregida
-with tabs[2]:
-    st.subheader("📆 Calendario de Pedidos")
+            # --- Ventana de fechas: hoy ± unos días, con paginación hacia atrás/adelante ---
+            # Solo se consultan los días de la ventana (búsqueda directa en `calendar` e índice
+            # de tránsito), nunca todo el historial.
+            if "calendario_centro" not in st.session_state:
+                st.session_state.calendario_centro = date.today()
+
+            col_radio, col_anteriores, col_hoy, col_siguientes = st.columns([2, 1, 1, 1])
+            with col_radio:
+                radio_ventana = st.selectbox("Días alrededor de la fecha central", options=[3, 7, 14, 30], index=0,
+                                             key="calendario_radio")
+            ancho_ventana = 2 * radio_ventana + 1
+            with col_anteriores:
+                if st.button("◀ Anteriores", key="calendario_anteriores"):
+                    st.session_state.calendario_centro -= timedelta(days=ancho_ventana)
+            with col_hoy:
+                if st.button("📍 Hoy", key="calendario_hoy"):
+                    st.session_state.calendario_centro = date.today()
+            with col_siguientes:
+                if st.button("Siguientes ▶", key="calendario_siguientes"):
+                    st.session_state.calendario_centro += timedelta(days=ancho_ventana)
+
+            centro = st.session_state.calendario_centro
+            if fecha_seleccionada:
+                desde_ventana = hasta_ventana = fecha_seleccionada
+            else:
+                desde_ventana = centro - timedelta(days=radio_ventana)
+                hasta_ventana = centro + timedelta(days=radio_ventana)
+                st.caption(f"Mostrando del {desde_ventana.strftime('%d/%m/%Y')} al {hasta_ventana.strftime('%d/%m/%Y')}.")
 
-    if isinstance(calendar, dict):
-        st.markdown("---")
-        fecha_seleccionada = st.date_input("Seleccionar fecha específica:", value=None,
-                                           help="Deja en blanco para ver todos los días con eventos.")
-        st.markdown("---")
+            found_results_calendar = False
 
-        all_dates = sorted(list(calendar.keys()))
-        found_results_calendar = False
-
-        # Determinar qué fechas mostrar, incluyendo días con unidades en tránsito
-        in_transit_dates = set()
-        for fecha_cal_str, eventos_dia in calendar.items():
-            fecha_cal_dt = datetime.strptime(fecha_cal_str, "%Y-%m-%d").date()
-            for evento in eventos_dia:
-                if evento.get("tipo_evento") == "entrega":
-                    fecha_pedido_dt = datetime.strptime(evento["fecha_pedido"], "%Y-%m-%d").date()
-                    dias_retorno = evento.get('dias_retorno_calculados', evento['dias_retorno'])
-                    fecha_retorno_estimada = fecha_pedido_dt + timedelta(days=dias_retorno)
-
-                    # El tránsito empieza el día siguiente a la carga
-                    current_date = fecha_pedido_dt + timedelta(days=1)
-                    while current_date < fecha_retorno_estimada:
-                        in_transit_dates.add(current_date.strftime("%Y-%m-%d"))
-                        current_date += timedelta(days=1)
-
-        dates_to_display = sorted(list(set(all_dates) | in_transit_dates))
-        if fecha_seleccionada:
-            dates_to_display = [fecha_seleccionada.strftime("%Y-%m-%d")]
-
-        for fecha_str in dates_to_display:
-            eventos = calendar.get(fecha_str, [])
-            fecha_dt = datetime.strptime(fecha_str, "%Y-%m-%d").date()
-
-            filtered_entregas = [e for e in eventos if e.get("tipo_evento") == "entrega"]
-            filtered_retornos = [e for e in eventos if e.get("tipo_evento") == "retorno"]
-
-            # --- NUEVO: Calcular y obtener lista de unidades en tránsito para este día (con lógica corregida) ---
-            unidades_en_transito_lista = []
-            for fecha_cal_str_all, eventos_cal_dia_all in calendar.items():
-                for evento in eventos_cal_dia_all:
-                    if evento.get("tipo_evento") == "entrega":
-                        fecha_pedido_dt = datetime.strptime(evento["fecha_pedido"], "%Y-%m-%d").date()
-                        dias_retorno = evento.get('dias_retorno_calculados', evento['dias_retorno'])
-                        fecha_retorno_estimada = fecha_pedido_dt + timedelta(days=dias_retorno)
-
-                        # El tránsito comienza el día siguiente a la carga
-                        if fecha_pedido_dt < fecha_dt < fecha_retorno_estimada:
-                            unidades_en_transito_lista.append(evento)
-            # --- FIN NUEVO ---
-
-            if not filtered_entregas and not filtered_retornos and not unidades_en_transito_lista and fecha_str not in calendar:
-                if fecha_seleccionada and fecha_str == fecha_seleccionada.strftime("%Y-%m-%d"):
-                    pass
-                else:
+            dates_to_display = [
+                (desde_ventana + timedelta(days=i)).strftime("%Y-%m-%d")
+                for i in range((hasta_ventana - desde_ventana).days + 1)
+            ]
+
+            # Filtro por cliente: el índice de clientes da los ids de sus pedidos y el índice
+            # de pedidos sus fechas, así que no se recorre ninguna fecha del calendario
+            ids_filtro = None
+            if cliente_calendario:
+                indice_clientes_calendario = obtener_derivado("calendar", "indice_clientes",
+                                                              IndiceClientes.desde_calendario)
+                coincidencias = indice_clientes_calendario.buscar_nombres(cliente_calendario)
+                ids_filtro = set(indice_clientes_calendario.pedidos_de(cliente_calendario))
+                fechas_filtro = set()
+                for pedido_id in ids_filtro:
+                    if indices.pedidos.entrega(pedido_id):
+                        fechas_filtro.add(indices.pedidos.entrega(pedido_id)[0])
+                    fechas_filtro.update(fecha for fecha, _ in indices.pedidos.retornos(pedido_id))
+                if fecha_seleccionada:
+                    fechas_filtro &= {fecha_seleccionada.strftime("%Y-%m-%d")}
+                dates_to_display = sorted(fechas_filtro, reverse=True)[:MAX_FECHAS_FILTRO_CLIENTE]
+                if coincidencias:
+                    st.caption(f"Clientes: {', '.join(coincidencias[:10])}{'…' if len(coincidencias) > 10 else ''}. "
+                               f"Mostrando {len(dates_to_display)} de {len(fechas_filtro)} fechas, de la más reciente "
+                               f"a la más antigua.")
+
+            for fecha_str in dates_to_display:
+                eventos = calendar.get(fecha_str, [])
+                fecha_dt = date.fromisoformat(fecha_str)
+
+                filtered_entregas = [e for e in eventos if e.get("tipo_evento") == "entrega"
+                                     and (ids_filtro is None or e.get("id") in ids_filtro)]
+                filtered_retornos = [e for e in eventos if e.get("tipo_evento") == "retorno"
+                                     and (ids_filtro is None or id_entrega_de_retorno(e) in ids_filtro)]
+
+                # --- NUEVO: Calcular y obtener lista de unidades en tránsito para este día (con lógica corregida) ---
+                # El tránsito comienza el día siguiente a la carga
+                unidades_en_transito_lista = [e for e in indices.transito.en_transito(fecha_dt)
+                                              if ids_filtro is None or e.get("id") in ids_filtro]
+                # --- FIN NUEVO ---
+
+                if not filtered_entregas and not filtered_retornos and not unidades_en_transito_lista and fecha_str not in calendar:
+                    if fecha_seleccionada and fecha_str == fecha_seleccionada.strftime("%Y-%m-%d"):
+                        pass
+                    else:
+                        continue
+
+                found_results_calendar = True
+
+                st.markdown(f"### 📅 {fecha_str}")
+
+                # --- NUEVO: Mostrar el detalle de las unidades en tránsito ---
+                st.info(f"🚚 **Unidades en tránsito:** {len(unidades_en_transito_lista)} en total.")
+                if unidades_en_transito_lista:
+                    with st.expander("Ver detalle de unidades en tránsito"):
+                        for evento_transito in unidades_en_transito_lista:
+                            st.markdown(
+                                f"**{evento_transito['unidad']}** — Cliente: {evento_transito['cliente']} (Cargado el: {evento_transito['fecha_pedido']})")
+                # --- FIN NUEVO ---
+
+                # El detalle (botones, edición) solo se arma si se pide: hoy o la fecha elegida vienen abiertos
+                ver_detalle = st.toggle(
+                    f"Ver cargas y retornos ({len(filtered_entregas)} ⬆️ / {len(filtered_retornos)} ⬇️)",
+                    value=bool(fecha_seleccionada) or fecha_dt == date.today(),
+                    key=f"detalle_dia_{fecha_str}"
+                )
+                if not ver_detalle:
                     continue
 
-            found_results_calendar = True
-
-            st.markdown(f"### 📅 {fecha_str}")
-
-            # --- NUEVO: Mostrar el detalle de las unidades en tránsito ---
-            st.info(f"🚚 **Unidades en tránsito:** {len(unidades_en_transito_lista)} en total.")
-            if unidades_en_transito_lista:
-                with st.expander("Ver detalle de unidades en tránsito"):
-                    for evento_transito in unidades_en_transito_lista:
-                        st.markdown(
-                            f"**{evento_transito['unidad']}** — Cliente: {evento_transito['cliente']} (Cargado el: {evento_transito['fecha_pedido']})")
-            # --- FIN NUEVO ---
-
-            col_cargas, col_retornos = st.columns(2)
-
-            with col_cargas:
-                st.markdown(f"#### ⬆️ Cargas / Salidas ({len(filtered_entregas)})")
-                if not filtered_entregas:
-                    st.info("No hay cargas para este día.")
-                for i, evento in enumerate(filtered_entregas):
-                    emoji = "💎" if evento["cliente"].lower() in ["plastisaro", "plastinorte"] else "🚛"
-                    fecha_carga_dt = datetime.strptime(evento['fecha_pedido'], "%Y-%m-%d").date()
-                    dias_para_calculo = evento.get('dias_retorno_calculados', evento['dias_retorno'])
-                    fecha_retorno_calculada = fecha_carga_dt + timedelta(days=dias_para_calculo)
-
-                    st.success(
-                        f"{emoji} **{evento['cliente']}** — {evento['unidad']} | "
-                        f"🚚 Carga: {fecha_carga_dt.strftime('%d/%m/%Y')} → Retorno: {fecha_retorno_calculada.strftime('%d/%m/%Y')}"
-                    )
-                    delete_edit_col1, delete_edit_col2 = st.columns(2)
-                    with delete_edit_col1:
-                        if st.button(f"🗑️ Eliminar {evento['cliente'][:10]}...",
-                                     key=f"del_btn_{evento['id']}_{i}_{fecha_str}"):
-                            ok, msg = eliminar_pedido(calendar, units, evento['id'])
-                            if ok:
-                                st.success(msg)
-                                save_units(units)
-                                save_calendar(calendar)
-                                st.rerun()
-                            else:
-                                st.error(msg)
-                    with delete_edit_col2:
-                        with st.expander(f"Editar días ({evento['cliente'][:10]})", expanded=False):
-                            nuevos_dias = st.number_input(
-                                f"Nuevos días retorno para {evento['cliente']}",
-                                value=evento['dias_retorno'],
-                                min_value=1,
-                                key=f"dias_input_{evento['id']}_{i}_{fecha_str}"
-                            )
-                            if st.button(f"Guardar edición", key=f"save_edit_btn_{evento['id']}_{i}_{fecha_str}"):
-                                ok, msg = editar_dias_retorno(calendar, units, evento['id'], nuevos_dias)
+                col_cargas, col_retornos = st.columns(2)
+
+                with col_cargas:
+                    st.markdown(f"#### ⬆️ Cargas / Salidas ({len(filtered_entregas)})")
+                    if not filtered_entregas:
+                        st.info("No hay cargas para este día.")
+                    for i, evento in enumerate(filtered_entregas):
+                        emoji = "💎" if evento["cliente"].lower() in ["plastisaro", "plastinorte"] else "🚛"
+                        fecha_carga_dt = datetime.strptime(evento['fecha_pedido'], "%Y-%m-%d").date()
+                        dias_para_calculo = evento.get('dias_retorno_calculados', evento['dias_retorno'])
+                        fecha_retorno_calculada = fecha_carga_dt + timedelta(days=dias_para_calculo)
+
+                        st.success(
+                            f"{emoji} **{evento['cliente']}** — {evento['unidad']} | "
+                            f"🚚 Carga: {fecha_carga_dt.strftime('%d/%m/%Y')} → Retorno: {fecha_retorno_calculada.strftime('%d/%m/%Y')}"
+                        )
+                        delete_edit_col1, delete_edit_col2 = st.columns(2)
+                        with delete_edit_col1:
+                            if st.button(f"🗑️ Eliminar {evento['cliente'][:10]}...",
+                                         key=f"del_btn_{evento['id']}_{i}_{fecha_str}"):
+                                with escritura_calendario:
+                                    calendar, indices = calendario_para_escribir()
+                                    cambios = []
+                                    ok, msg = eliminar_pedido(calendar, units, evento['id'], indices=indices,
+                                                              cambios=cambios)
+                                    if ok:
+                                        save_calendar(calendar, cambios)
+                                        historial_sesion().registrar(
+                                            "eliminar", f"Eliminar pedido de {evento['cliente']} ({evento['unidad']}, "
+                                                        f"{fecha_carga_dt.strftime('%d/%m/%Y')})", cambios)
                                 if ok:
                                     st.success(msg)
-                                    save_calendar(calendar)
                                     st.rerun()
                                 else:
                                     st.error(msg)
-                    st.markdown("---")
-
-            with col_retornos:
-                st.markdown(f"#### ⬇️ Retornos / Entradas ({len(filtered_retornos)})")
-                if not filtered_retornos:
-                    st.info("No hay retornos para este día.")
-                for evento in filtered_retornos:
-                    cliente_retorno = evento.get("cliente_asociado", "Desconocido")
-                    fecha_pedido_retorno_str = evento.get("fecha_pedido_asociado", "Fecha desconocida")
-
-                    try:
-                        fecha_pedido_dt = datetime.strptime(fecha_pedido_retorno_str, "%Y-%m-%d").date()
-                        fecha_pedido_formateada = fecha_pedido_dt.strftime('%d/%m/%Y')
-                    except (ValueError, TypeError):
-                        fecha_pedido_formateada = "Fecha no válida"
-
-                    st.info(
-                        f"🔁 Retorno de unidad: **{evento['unidad']}** | "
-                        f"Pedido: {cliente_retorno} (Carga: {fecha_pedido_formateada})"
-                    )
-                    st.markdown("---")
+                        with delete_edit_col2:
+                            with st.expander(f"Editar días ({evento['cliente'][:10]})", expanded=False):
+                                nuevos_dias = st.number_input(
+                                    f"Nuevos días retorno para {evento['cliente']}",
+                                    # Pedidos de 0 días guardados antes de exigir al menos 1 no rompen el editor
+                                    value=max(int(evento['dias_retorno']), 1),
+                                    min_value=1,
+                                    key=f"dias_input_{evento['id']}_{i}_{fecha_str}"
+                                )
+                                if st.button(f"Guardar edición", key=f"save_edit_btn_{evento['id']}_{i}_{fecha_str}"):
+                                    with escritura_calendario:
+                                        calendar, indices = calendario_para_escribir()
+                                        cambios = []
+                                        ok, msg = editar_dias_retorno(calendar, units, evento['id'], nuevos_dias,
+                                                                      indices=indices, cambios=cambios)
+                                        if ok:
+                                            save_calendar(calendar, cambios)
+                                            historial_sesion().registrar(
+                                                "editar_dias", f"Días de retorno de {evento['cliente']} "
+                                                               f"({fecha_carga_dt.strftime('%d/%m/%Y')}) a {nuevos_dias}",
+                                                cambios)
+                                    if ok:
+                                        st.success(msg)
+                                        st.rerun()
+                                    else:
+                                        st.error(msg)
+                        st.markdown("---")
+
+                with col_retornos:
+                    st.markdown(f"#### ⬇️ Retornos / Entradas ({len(filtered_retornos)})")
+                    if not filtered_retornos:
+                        st.info("No hay retornos para este día.")
+                    for evento in filtered_retornos:
+                        cliente_retorno = evento.get("cliente_asociado", "Desconocido")
+                        fecha_pedido_retorno_str = evento.get("fecha_pedido_asociado", "Fecha desconocida")
+
+                        try:
+                            fecha_pedido_dt = datetime.strptime(fecha_pedido_retorno_str, "%Y-%m-%d").date()
+                            fecha_pedido_formateada = fecha_pedido_dt.strftime('%d/%m/%Y')
+                        except (ValueError, TypeError):
+                            fecha_pedido_formateada = "Fecha no válida"
+
+                        st.info(
+                            f"🔁 Retorno de unidad: **{evento['unidad']}** | "
+                            f"Pedido: {cliente_retorno} (Carga: {fecha_pedido_formateada})"
+                        )
+                        st.markdown("---")
+
+            if not found_results_calendar and cliente_calendario:
+                st.info(f"No hay eventos de clientes que coincidan con '{cliente_calendario}'.")
+            elif not found_results_calendar and not fecha_seleccionada:
+                st.info("No hay eventos en estas fechas. Usa ◀ / ▶ para moverte o registra pedidos para verlos aquí.")
+            elif not found_results_calendar and fecha_seleccionada:
+                st.info(
+                    f"No hay eventos (cargas, retornos o en tránsito) registrados para el {fecha_seleccionada.strftime('%d/%m/%Y')}.")
 
-        if not found_results_calendar and not fecha_seleccionada:
-            st.info("El calendario está vacío. Registra pedidos para verlos aquí.")
-        elif not found_results_calendar and fecha_seleccionada:
-            st.info(
-                f"No hay eventos (cargas, retornos o en tránsito) registrados para el {fecha_seleccionada.strftime('%d/%m/%Y')}.")
+        else:
+            st.error("❌ El calendario no tiene el formato correcto.")
+            st.write(calendar)
 
-    else:
-        st.error("❌ El calendario no tiene el formato correcto.")
-        st.write(calendar)
 
 # 🧹 Limpieza - (Sin cambios en esta sección)
-with tabs[3]:
-    with st.expander("🧼 Limpieza de datos (Expandir para ver opciones)"):
-        st.warning("Esta acción eliminará todos los pedidos y unidades. No se puede deshacer.")
-
-        if 'confirm_clean' not in st.session_state:
-            st.session_state.confirm_clean = False
-
-        st.session_state.confirm_clean = st.checkbox("Estoy seguro de querer limpiar todos los datos",
-                                                     key="clean_confirm_checkbox")
-
-        if st.button("⚠️ Limpiar todo", type="primary", disabled=not st.session_state.confirm_clean):
-            if st.session_state.confirm_clean:
-                units_path = os.path.join("data", "units.json")
-                calendar_path = os.path.join("data", "calendar.json")
+@st.fragment
+def pestana_limpieza():
+    with diagnostico.fragmento("tab.Limpieza", historial_sesion().sesion):
+        with st.expander("🧼 Limpieza de datos (Expandir para ver opciones)"):
+            st.warning("Esta acción eliminará todos los pedidos y unidades. No se puede deshacer.")
+
+            if 'confirm_clean' not in st.session_state:
+                st.session_state.confirm_clean = False
+
+            st.session_state.confirm_clean = st.checkbox("Estoy seguro de querer limpiar todos los datos",
+                                                         key="clean_confirm_checkbox")
+
+            if st.button("⚠️ Limpiar todo", type="primary", disabled=not st.session_state.confirm_clean):
+                if st.session_state.confirm_clean:
+                    unidades_nuevas = {
+                        "Tráiler 53": 0,
+                        "Tráiler 48": 0,
+                        "Torton": 0,
+                        "Interplanta": 0
+                    }
+
+                    hoy = datetime.today().date()
+                    calendario_nuevo = {
+                        str(hoy + timedelta(days=i)): []
+                        for i in range(7)
+                    }
 
-                unidades_nuevas = {
-                    "Tráiler 53": 0,
-                    "Tráiler 48": 0,
-                    "Torton": 0,
-                    "Interplanta": 0
-                }
-
-                hoy = datetime.today().date()
-                calendario_nuevo = {
-                    str(hoy + timedelta(days=i)): []
-                    for i in range(7)
-                }
-
-                try:
-                    with open(units_path, "w", encoding="utf-8") as f:
-                        json.dump(unidades_nuevas, f, indent=2)
-
-                    with open(calendar_path, "w", encoding="utf-8") as f:
-                        json.dump(calendario_nuevo, f, indent=2)
-
-                    if os.path.exists(PEDIDOS_EXCEL_PATH):
-                        os.remove(PEDIDOS_EXCEL_PATH)
+                    try:
+                        with escritura_calendario:
+                            save_units(unidades_nuevas)
+                            save_calendar(calendario_nuevo)
+                            delete_pedidos_excel()
+                            # Sin `cambios` no hay inversa: la limpieza no se deshace, pero queda en la auditoría
+                            historial = historial_sesion()
+                            historial.olvidar()
+                            registrar_auditoria(historial.usuario, historial.sesion, "limpiar",
+                                                "Limpieza de todos los datos")
+
+                        st.success("🚿 Datos limpiados correctamente.")
+                        st.write("📁 Unidades reiniciadas:", unidades_nuevas)
+                        st.write("📅 Calendario reiniciado:", calendario_nuevo)
 
-                    st.success("🚿 Datos limpiados correctamente.")
-                    st.write("📁 Unidades reiniciadas:", unidades_nuevas)
-                    st.write("📅 Calendario reiniciado:", calendario_nuevo)
+                        st.rerun()
 
-                    st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Error al limpiar los datos: {e}")
+                        st.write("Por favor, verifica los permisos de los archivos o el formato de los datos.")
+                else:
+                    st.warning("Por favor, marca la casilla 'Estoy seguro' para confirmar la limpieza.")
+
+
+# 📊 Analítica - Uso por unidad y por cliente en un rango de fechas
+@st.fragment
+def pestana_analitica():
+    with diagnostico.fragmento("tab.Analitica", historial_sesion().sesion):
+        st.subheader("📊 Uso de unidades y clientes")
+        units = load_units()
+        _, indices = datos_calendario()
+        analitica = indices.analitica
+
+        hoy = date.today()
+        col1, col2, col3 = st.columns([1, 1, 1])
+        with col1:
+            desde = st.date_input("Desde", value=hoy - timedelta(days=90), key="analitica_desde")
+        with col2:
+            hasta = st.date_input("Hasta", value=hoy, key="analitica_hasta")
+        with col3:
+            por = st.radio("Agrupar por", ["Unidad", "Cliente"], horizontal=True, key="analitica_por")
+        if hasta < desde:
+            st.warning("La fecha final es anterior a la inicial.")
+            return
+
+        filas = analitica.resumen(desde, hasta, por=por.lower(), units=units)
+        if not filas:
+            st.info("No hay cargas, retornos ni unidades fuera en el rango seleccionado.")
+            return
+        resumen = pd.DataFrame([{
+            por: fila["clave"],
+            "Cargas": fila["cargas"],
+            "Retornos": fila["retornos"],
+            "Días-unidad fuera": fila["dias_unidad"],
+            "Fuera por día (prom.)": round(fila["fuera_promedio"], 2),
+            "Días retorno configurados (prom.)": None if fila["dias_configurados_promedio"] is None
+            else round(fila["dias_configurados_promedio"], 2),
+            "Días retorno reales (prom.)": None if fila["dias_reales_promedio"] is None
+            else round(fila["dias_reales_promedio"], 2),
+            **({"Utilización %": None if fila.get("utilizacion") is None else round(fila["utilizacion"], 1)}
+               if por == "Unidad" else {}),
+        } for fila in filas]).sort_values("Cargas", ascending=False).set_index(por)
+        st.dataframe(resumen, use_container_width=True)
+        st.caption("Días reales: con el día extra de las cargas en sábado. Utilización: días-unidad fuera "
+                   "contra las unidades configuradas por los días del rango.")
+
+        if por == "Unidad":
+            st.markdown("**Utilización semanal %**")
+            semanal = {}
+            for unidad in units:
+                if units[unidad]:
+                    for fila in analitica.serie(unidad, desde, hasta, paso=7, units=units):
+                        semanal.setdefault(fila["desde"], {})[unidad] = round(fila["utilizacion"], 1)
+            if semanal:
+                st.line_chart(pd.DataFrame.from_dict(semanal, orient="index").sort_index())
+        else:
+            cliente = st.selectbox("Cliente", resumen.index.tolist(), key="analitica_cliente")
+            if cliente:
+                semanal = pd.DataFrame(analitica.serie(cliente, desde, hasta, paso=7, por="cliente"))
+                st.markdown(f"**Cargas y retornos por semana de {cliente}**")
+                st.bar_chart(semanal.set_index("desde")[["cargas", "retornos"]])
+
+
+# ⏱️ Diagnóstico - Tiempos de los últimos reruns (pestaña visible solo con REYMA_DIAGNOSTICO=1)
+def pestana_diagnostico():
+    st.subheader("⏱️ Tiempos por rerun")
+    reruns = diagnostico.historial(historial_sesion().sesion)
+    if not reruns:
+        st.info("Aún no hay reruns medidos. Interactúa con la app y vuelve a esta pestaña.")
+    else:
+        filas = []
+        for rerun in reruns:
+            fila = {"Rerun": rerun["fecha"], "Total (ms)": round(rerun["total"] * 1000, 1),
+                    "Interrumpido": rerun["interrumpido"], "Solo pestaña": rerun.get("fragmento") or ""}
+            for nombre, medicion in rerun["tiempos"].items():
+                fila[nombre] = round(medicion["segundos"] * 1000, 1)
+            filas.append(fila)
+        st.caption(f"Últimos {len(reruns)} reruns terminados de esta sesión, en milisegundos (tiempos inclusivos). "
+                   f"Registro completo en {diagnostico.METRICAS_PATH}.")
+        st.dataframe(pd.DataFrame(filas).set_index("Rerun"))
+
+        ultimo = reruns[-1]
+        st.markdown("**Último rerun**")
+        desglose = pd.DataFrame([
+            {"Sección": nombre, "ms": round(medicion["segundos"] * 1000, 2), "Llamadas": medicion["llamadas"]}
+            for nombre, medicion in ultimo["tiempos"].items()
+        ])
+        if not desglose.empty:
+            desglose = desglose.sort_values("ms", ascending=False).set_index("Sección")
+            st.bar_chart(desglose["ms"])
+            st.dataframe(desglose)
+
+
+nombres_tabs = ["📦 Unidades disponibles", "📥 Cargar pedidos", "🗓️ Calendario", "📊 Analítica", "🧹 Limpieza"]
+if diagnostico.ACTIVO:
+    nombres_tabs.append("⏱️ Diagnóstico")
+tabs = st.tabs(nombres_tabs)
 
-                except Exception as e:
-                    st.error(f"❌ Error al limpiar los datos: {e}")
-                    st.write("Por favor, verifica los permisos de los archivos o el formato de los datos.")
-            else:
-                st.warning("Por favor, marca la casilla 'Estoy seguro' para confirmar la limpieza.")
\ No newline at end of file
+with tabs[0]:
+    pestana_unidades()
+with tabs[1]:
+    pestana_cargar_pedidos()
+with tabs[2]:
+    pestana_calendario()
+with tabs[3]:
+    pestana_analitica()
+with tabs[4]:
+    pestana_limpieza()
+if diagnostico.ACTIVO:
+    with tabs[5]:
+        pestana_diagnostico()
+
+diagnostico.terminar_rerun()
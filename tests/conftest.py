@@ -0,0 +1,57 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import storage, storage_particionado  # noqa: E402
+from utils.calendar_logic import agregar_pedido  # noqa: E402
+
+UNIDADES = {"Tráiler 53": 3, "Torton": 2}
+INICIO = date(2025, 1, 6)
+
+
+def calendario_de_prueba(pedidos=12, dias_retorno=(1, 3, 2, 5)):
+    """
+    Calendario armado con agregar_pedido (entregas y retornos con ids reales).
+    Devuelve (calendar, ids de las entregas en orden de registro).
+    """
+    calendar, cambios = {}, []
+    for i in range(pedidos):
+        unidad = list(UNIDADES)[i % len(UNIDADES)]
+        agregar_pedido(calendar, UNIDADES, f"Cliente {i % 4}", unidad, INICIO + timedelta(days=i // 3),
+                       dias_retorno[i % len(dias_retorno)], cambios=cambios, permitir_sobrecupo=True)
+    return calendar, [cambio["evento"]["id"] for cambio in cambios if cambio["evento"]["tipo_evento"] == "entrega"]
+
+
+@pytest.fixture
+def unidades():
+    return dict(UNIDADES)
+
+
+@pytest.fixture
+def calendario():
+    return calendario_de_prueba()
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    """
+    utils.storage sobre una carpeta data/ temporal y sin nada en caché. Se elige el backend
+    llamando al fixture: almacen("json"), almacen("particionado"), almacen("diario") o almacen("sqlite").
+    """
+    monkeypatch.chdir(tmp_path)
+    for modulo, nombre in ((storage, "_cache"), (storage, "_cache_derivados"), (storage, "_versiones"),
+                           (storage, "_base"), (storage_particionado, "_huellas"),
+                           (storage_particionado, "_leidas")):
+        monkeypatch.setattr(modulo, nombre, {})
+
+    def _usar(backend="json"):
+        monkeypatch.setattr(storage, "STORAGE_BACKEND", "json" if backend == "particionado" else backend)
+        os.makedirs("data", exist_ok=True)
+        if backend == "particionado":
+            os.makedirs(storage_particionado.CALENDARIO_DIR)
+        return storage
+    return _usar
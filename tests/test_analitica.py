@@ -0,0 +1,77 @@
+import random
+from datetime import date
+
+from utils.analitica import AnaliticaUso, Fenwick, FenwickRango
+from utils.calendar_logic import agregar_pedido, editar_dias_retorno, eliminar_pedido
+from utils.indices import IndicesCalendario
+
+from conftest import INICIO
+
+
+def test_fenwick_coincide_con_una_lista():
+    rng = random.Random(3)
+    valores = [0] * 50
+    puntos = {i: rng.randint(-5, 5) for i in rng.sample(range(50), 20)}
+    for i, valor in puntos.items():
+        valores[i] = valor
+    fenwick = Fenwick.desde_puntos(puntos)
+    for _ in range(200):
+        i = rng.randrange(50)
+        valor = rng.randint(-3, 3)
+        fenwick.sumar(i, valor)
+        valores[i] += valor
+        posicion = rng.randint(0, 50)
+        assert fenwick.prefijo(posicion) == sum(valores[:posicion])
+
+
+def test_fenwick_por_rango_coincide_con_una_lista():
+    rng = random.Random(5)
+    valores = [0] * 40
+    diferencias = {}
+    for _ in range(10):
+        desde = rng.randrange(39)
+        hasta = rng.randint(desde + 1, 40)
+        valor = rng.randint(-2, 2)
+        diferencias[desde] = diferencias.get(desde, 0) + valor
+        diferencias[hasta] = diferencias.get(hasta, 0) - valor
+        for i in range(desde, hasta):
+            valores[i] += valor
+    fenwick = FenwickRango.desde_diferencias(diferencias)
+    for _ in range(100):
+        desde = rng.randrange(39)
+        hasta = rng.randint(desde + 1, 40)
+        valor = rng.randint(-2, 2)
+        fenwick.sumar_rango(desde, hasta, valor)
+        for i in range(desde, hasta):
+            valores[i] += valor
+        posicion = rng.randint(0, 40)
+        assert fenwick.prefijo(posicion) == sum(valores[:posicion])
+
+
+def test_mantenida_con_los_ganchos_coincide_con_rearmarla(calendario, unidades):
+    calendar, ids = calendario
+    indices = IndicesCalendario.desde_calendario(calendar)
+    desde, hasta = date(2025, 1, 1), date(2025, 2, 28)
+    indices.analitica.resumen(desde, hasta)  # armada antes de los cambios
+
+    eliminar_pedido(calendar, unidades, ids[1], indices)
+    editar_dias_retorno(calendar, unidades, ids[2], 7, indices)
+    agregar_pedido(calendar, unidades, "Cliente nuevo", "Torton", INICIO, 4, indices, permitir_sobrecupo=True)
+
+    rearmada = AnaliticaUso.desde_calendario(calendar)
+    for por in ("unidad", "cliente"):
+        assert sorted(indices.analitica.resumen(desde, hasta, por, unidades), key=lambda f: f["clave"]) == \
+            sorted(rearmada.resumen(desde, hasta, por, unidades), key=lambda f: f["clave"])
+    assert indices.analitica.serie("Torton", desde, hasta, paso=7, units=unidades) == \
+        rearmada.serie("Torton", desde, hasta, paso=7, units=unidades)
+
+
+def test_resumen_cuenta_cargas_retornos_y_dias_fuera():
+    calendar = {}
+    agregar_pedido(calendar, {"Torton": 2}, "Ácme", "Torton", date(2025, 1, 6), 3, permitir_sobrecupo=True)
+    analitica = AnaliticaUso.desde_calendario(calendar)
+
+    [fila] = analitica.resumen(date(2025, 1, 6), date(2025, 1, 15), units={"Torton": 2})
+    assert (fila["clave"], fila["cargas"], fila["retornos"], fila["dias_unidad"]) == ("Torton", 1, 1, 3)
+    assert fila["utilizacion"] == 100 * 3 / (2 * 10)
+    assert analitica.resumen(date(2025, 2, 1), date(2025, 2, 28)) == []
@@ -0,0 +1,54 @@
+from utils.busqueda import IndiceClientes
+from utils.calendar_logic import agregar_pedido
+from utils.texto import normalizar_texto
+
+from conftest import INICIO, calendario_de_prueba
+
+CLIENTES = ["PDS Cancún", "Plastisaro", "Cancún Centro", "Ácme Industrial", "Beta"]
+
+
+def test_normalizar_texto():
+    assert normalizar_texto("  Cancún   CENTRO ") == "cancun centro"
+    assert normalizar_texto("Ñandú") == "nandu"
+
+
+def test_exacto_luego_prefijo_luego_palabra():
+    indice = IndiceClientes(CLIENTES + ["Cancún"])
+
+    assert indice.buscar_nombres("CANCUN") == ["Cancún", "Cancún Centro", "PDS Cancún"]
+    assert indice.buscar("cancun")[0][1] >= 3.0
+
+
+def test_tolera_errores_de_dedo():
+    indice = IndiceClientes(CLIENTES)
+
+    assert indice.buscar_nombres("plastizaro") == ["Plastisaro"]
+    assert indice.buscar_nombres("zzzz") == []
+    assert indice.buscar_nombres("   ") == []
+
+
+def test_limite_y_posiciones():
+    indice = IndiceClientes(CLIENTES)
+
+    assert indice.buscar_nombres("c", limite=1) == ["Cancún Centro"]
+    assert [i for i, _ in indice.buscar("beta")] == [CLIENTES.index("Beta")]
+
+
+def test_normalizados_precalculados():
+    indice = IndiceClientes(["Ácme"], normalizados=["acme"])
+    assert indice.buscar_nombres("ACME") == ["Ácme"]
+
+
+def test_pedidos_de_los_clientes_del_calendario(unidades):
+    calendar, ids = calendario_de_prueba(pedidos=8)
+    agregar_pedido(calendar, unidades, "PDS Cancún", "Torton", INICIO, 2, permitir_sobrecupo=True)
+    indice = IndiceClientes.desde_calendario(calendar)
+
+    entregas = {e["id"]: e["cliente"] for eventos in calendar.values() for e in eventos
+                if e["tipo_evento"] == "entrega"}
+    esperados = [pedido_id for pedido_id, cliente in entregas.items() if cliente == "Cliente 1"]
+    # Cada pedido aparece por su entrega y por su retorno; sin umbral, "Cliente 0" también se parece
+    assert sorted(indice.pedidos_de("cliente 1", umbral=1.0)) == sorted(esperados * 2)
+    assert set(indice.pedidos_de("cancun")) == {pedido_id for pedido_id, cliente in entregas.items()
+                                                if cliente == "PDS Cancún"}
+    assert set(ids) <= set(indice.pedidos_de("cliente"))
@@ -0,0 +1,80 @@
+import random
+from datetime import date
+
+from utils.calendar_logic import eliminar_pedido, editar_dias_retorno
+from utils.capacidad import ArbolSegmentos, ControlCapacidad
+from utils.eventos import fecha_a_ordinal, dias_retorno_de
+from utils.indices import IndicesCalendario
+
+
+def test_arbol_de_segmentos_coincide_con_una_lista():
+    rng = random.Random(7)
+    valores = [rng.randint(-3, 3) for _ in range(37)]
+    arbol = ArbolSegmentos(list(valores))
+    for _ in range(400):
+        desde = rng.randrange(len(valores))
+        hasta = rng.randint(desde + 1, len(valores))
+        operacion = rng.random()
+        if operacion < 0.5:
+            valor = rng.randint(-2, 2)
+            arbol.sumar(desde, hasta, valor)
+            for i in range(desde, hasta):
+                valores[i] += valor
+        elif operacion < 0.8:
+            assert arbol.minimo(desde, hasta) == min(valores[desde:hasta])
+        else:
+            umbral = rng.randint(-4, 4)
+            esperado = next((i for i in range(desde, hasta) if valores[i] < umbral), None)
+            assert arbol.primera_posicion_menor(desde, hasta, umbral) == esperado
+    assert arbol.valores() == valores
+
+
+def _ocupadas_a_mano(calendar, unidad, dia):
+    return sum(
+        1 for eventos in calendar.values() for evento in eventos
+        if evento["tipo_evento"] == "entrega" and evento["unidad"] == unidad
+        and fecha_a_ordinal(evento["fecha_pedido"]) <= dia
+        < fecha_a_ordinal(evento["fecha_pedido"]) + dias_retorno_de(evento)
+    )
+
+
+def test_control_de_capacidad_sigue_altas_bajas_y_ediciones(calendario, unidades):
+    calendar, ids = calendario
+    indices = IndicesCalendario.desde_calendario(calendar)
+    eliminar_pedido(calendar, unidades, ids[0], indices)
+    editar_dias_retorno(calendar, unidades, ids[3], 8, indices)
+
+    inicio = date(2025, 1, 1).toordinal()
+    for unidad in unidades:
+        for dia in range(inicio, inicio + 30):
+            esperado = unidades[unidad] - _ocupadas_a_mano(calendar, unidad, dia)
+            assert indices.capacidad.disponibles_minimas(unidades, unidad, dia, dia + 1) == esperado
+        peor = min(unidades[unidad] - _ocupadas_a_mano(calendar, unidad, dia) for dia in range(inicio, inicio + 30))
+        assert indices.capacidad.disponibles_minimas(unidades, unidad, inicio, inicio + 30) == peor
+
+
+def test_primer_dia_sin_unidades():
+    entrega = {"unidad": "Torton", "fecha_pedido": "2025-01-06", "dias_retorno": 3, "tipo_evento": "entrega"}
+    control = ControlCapacidad.desde_calendario({"2025-01-06": [entrega]})
+    inicio = date(2025, 1, 1).toordinal()
+
+    assert control.primer_dia_sin_unidades({"Torton": 1}, "Torton", inicio, inicio + 30) == date(2025, 1, 6)
+    assert control.primer_dia_sin_unidades({"Torton": 2}, "Torton", inicio, inicio + 30) is None
+    assert control.primer_dia_sin_unidades({"Torton": 2}, "Torton", inicio, inicio + 30, cantidad=2) == \
+        date(2025, 1, 6)
+
+
+def test_ampliar_el_rango_conserva_la_ocupacion():
+    entrega = {"unidad": "Torton", "fecha_pedido": "2025-01-06", "dias_retorno": 3, "tipo_evento": "entrega"}
+    control = ControlCapacidad.desde_calendario({"2025-01-06": [entrega]})
+    lejana = dict(entrega, fecha_pedido="2031-06-01")
+    control.agregar(lejana)
+
+    units = {"Torton": 2}
+    assert control.disponibles_minimas(units, "Torton", fecha_a_ordinal("2025-01-06"),
+                                       fecha_a_ordinal("2025-01-09")) == 1
+    assert control.disponibles_minimas(units, "Torton", fecha_a_ordinal("2031-06-01"),
+                                       fecha_a_ordinal("2031-06-02")) == 1
+    control.quitar(lejana)
+    assert control.disponibles_minimas(units, "Torton", fecha_a_ordinal("2031-06-01"),
+                                       fecha_a_ordinal("2031-06-04")) == 2
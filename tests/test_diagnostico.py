@@ -0,0 +1,79 @@
+import collections
+import json
+
+import pytest
+
+from utils import diagnostico
+
+
+@pytest.fixture
+def activo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(diagnostico, "ACTIVO", True)
+    monkeypatch.setattr(diagnostico, "_historiales", collections.OrderedDict())
+    diagnostico._local.rerun = None
+    return diagnostico
+
+
+def test_sin_diagnostico_no_envuelve_nada(monkeypatch):
+    monkeypatch.setattr(diagnostico, "ACTIVO", False)
+
+    def func():
+        return 1
+
+    assert diagnostico.medido("x")(func) is func
+    assert diagnostico.seccion("x") is diagnostico.fragmento("x")
+
+
+def test_rerun_suma_tiempos_y_llamadas(activo):
+    suma = activo.medido("suma")(lambda a, b: a + b)
+    activo.iniciar_rerun()
+    assert suma(1, 2) == 3
+    suma(3, 4)
+    with activo.seccion("pestaña"):
+        pass
+    activo.terminar_rerun()
+
+    [registro] = activo.historial()
+    assert registro["tiempos"]["suma"]["llamadas"] == 2
+    assert registro["tiempos"]["pestaña"]["llamadas"] == 1
+    assert registro["interrumpido"] is False
+    with open(activo.METRICAS_PATH, encoding="utf-8") as f:
+        assert json.loads(f.readline())["tiempos"].keys() == registro["tiempos"].keys()
+
+
+def test_rerun_cortado_queda_interrumpido(activo):
+    activo.iniciar_rerun()
+    activo.iniciar_rerun()  # st.rerun() cortó el anterior
+    activo.terminar_rerun()
+
+    assert [registro["interrumpido"] for registro in activo.historial()] == [True, False]
+
+
+def test_fragmento_abre_su_propio_rerun(activo):
+    with activo.fragmento("Calendario"):
+        pass
+    with pytest.raises(RuntimeError):
+        with activo.fragmento("Calendario"):
+            raise RuntimeError
+
+    assert [(r["fragmento"], r["interrumpido"]) for r in activo.historial()] == \
+        [("Calendario", False), ("Calendario", True)]
+
+
+def test_cada_sesion_ve_solo_sus_reruns(activo, monkeypatch):
+    monkeypatch.setattr(activo, "SESIONES_EN_MEMORIA", 2)
+    for sesion in ["a", "b", "a"]:
+        activo.iniciar_rerun(sesion)
+        activo.terminar_rerun()
+    with activo.fragmento("Calendario", "b"):
+        pass
+
+    assert [r["sesion"] for r in activo.historial("a")] == ["a", "a"]
+    assert [r["fragmento"] for r in activo.historial("b")] == [None, "Calendario"]
+    assert activo.historial() == []
+
+    # Solo se recuerdan las sesiones usadas más recientemente
+    activo.iniciar_rerun("c")
+    activo.terminar_rerun()
+    assert activo.historial("a") == [] and len(activo.historial("b")) == 2
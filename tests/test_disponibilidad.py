@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+import pytest
+
+from utils.calendar_logic import agregar_pedido
+from utils.disponibilidad import columnas_calendario, pronostico_disponibilidad
+from utils.eventos import dias_retorno_de, fecha_a_ordinal
+from utils.modelo import CalendarioModelo
+
+from conftest import INICIO, calendario_de_prueba
+
+
+def _a_mano(calendar, unidad, dia):
+    """Cargas, retornos y en tránsito de `unidad` el ordinal `dia`, recorriendo los eventos."""
+    entregas = [e for eventos in calendar.values() for e in eventos
+                if e["tipo_evento"] == "entrega" and e["unidad"] == unidad]
+    cargas = sum(1 for e in entregas if fecha_a_ordinal(e["fecha_pedido"]) == dia)
+    en_transito = sum(1 for e in entregas
+                      if fecha_a_ordinal(e["fecha_pedido"]) < dia < fecha_a_ordinal(e["fecha_pedido"]) + dias_retorno_de(e))
+    retornos = sum(1 for fecha, eventos in calendar.items() for e in eventos
+                   if e["tipo_evento"] == "retorno" and e["unidad"] == unidad and fecha_a_ordinal(fecha) == dia)
+    return cargas, retornos, en_transito
+
+
+@pytest.mark.parametrize("inicio", [0, 2])
+def test_pronostico_coincide_con_los_eventos(unidades, inicio):
+    calendar, _ = calendario_de_prueba(pedidos=15)
+    # Una unidad que ya no está configurada no cuenta en ninguna fila
+    agregar_pedido(calendar, {"Interplanta": 1}, "Ácme", "Interplanta", INICIO, 2)
+    desde = INICIO + timedelta(days=inicio)
+
+    pronostico = pronostico_disponibilidad(columnas_calendario(calendar), unidades, desde, horizonte=10)
+    assert len(pronostico) == 10 * len(unidades)
+    for unidad in unidades:
+        disponibles = None
+        for k in range(10):
+            fecha = desde + timedelta(days=k)
+            cargas, retornos, en_transito = _a_mano(calendar, unidad, fecha.toordinal())
+            fila = pronostico.loc[(unidad, fecha)]
+            assert (fila["Cargas"], fila["Retornos"], fila["En Tránsito"]) == (cargas, retornos, en_transito)
+            # El primer día parte de la base menos lo que está en tránsito; los demás, del neto anterior
+            anterior = unidades[unidad] - en_transito if disponibles is None else disponibles
+            disponibles = anterior + retornos - cargas
+            assert fila["Disponibles"] == disponibles
+
+
+def test_columnas_desde_json_o_modelo(calendario):
+    calendar, ids = calendario
+    desde_json = columnas_calendario(calendar)
+    desde_modelo = columnas_calendario(CalendarioModelo.desde_json(calendar))
+
+    assert desde_json["unidades"] == desde_modelo["unidades"]
+    assert len(desde_json["entregas_unidad"]) == len(ids)
+    assert (desde_json["entregas_fin"] - desde_json["entregas_inicio"] >= 1).all()
+    assert len(desde_json["retornos_dia"]) == len(ids)
+
+
+def test_calendario_vacio(unidades):
+    pronostico = pronostico_disponibilidad(columnas_calendario({}), unidades, INICIO, horizonte=3)
+
+    assert pronostico["Cargas"].sum() == 0
+    assert pronostico.loc["Torton"]["Disponibles"].tolist() == [unidades["Torton"]] * 3
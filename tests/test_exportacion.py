@@ -0,0 +1,98 @@
+import io
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from utils import exportacion
+from utils.exportacion import bloques, filas_pedidos
+
+from conftest import INICIO, calendario_de_prueba
+
+
+def _dias(calendar):
+    return sorted(calendar.items())
+
+
+def test_una_fila_por_pedido_con_su_retorno(calendario):
+    calendar, ids = calendario
+    filas = list(filas_pedidos(_dias(calendar)))
+
+    assert sorted(fila["id"] for fila in filas) == sorted(ids)
+    assert [fila["fecha_carga"] for fila in filas] == sorted(fila["fecha_carga"] for fila in filas)
+    for fila in filas:
+        assert fila["fecha_retorno"] == fila["fecha_carga"] + timedelta(days=fila["dias_retorno_calculados"])
+        assert fila["fecha_retorno_registrada"] == fila["fecha_retorno"]
+
+
+def test_filtros_por_fecha_y_unidad(calendario):
+    calendar, _ = calendario
+    desde, hasta = INICIO + timedelta(days=1), INICIO + timedelta(days=2)
+    filas = list(filas_pedidos(_dias(calendar), desde, hasta, ["Torton"]))
+
+    esperadas = [e["id"] for fecha, eventos in sorted(calendar.items()) for e in eventos
+                 if e["tipo_evento"] == "entrega" and e["unidad"] == "Torton"
+                 and desde.isoformat() <= fecha <= hasta.isoformat()]
+    assert esperadas and sorted(fila["id"] for fila in filas) == sorted(esperadas)
+
+
+def test_retornos_sin_entrega_y_entregas_sin_retorno():
+    calendar = {
+        "2025-01-06": [{"id": "a", "tipo_evento": "entrega", "unidad": "Torton", "cliente": "Ácme",
+                        "dias_retorno": 2, "dias_retorno_calculados": 2, "fecha_pedido": "2025-01-06"}],
+        "2025-01-07": [{"id": "r", "tipo_evento": "retorno", "unidad": "Torton", "id_entrega_asociada": "viejo",
+                        "cliente_asociado": "Beta", "fecha_pedido_asociado": "2025-01-05"}],
+        "2025-01-20": [],
+    }
+    filas = list(filas_pedidos(_dias(calendar)))
+
+    assert [(fila["id"], fila["fecha_retorno_registrada"]) for fila in filas] == \
+        [("a", None), ("viejo", date(2025, 1, 7))]
+    assert filas[1]["cliente"] == "Beta" and filas[1]["dias_retorno"] is None
+
+
+def test_deja_de_leer_despues_de_hasta():
+    leidos = []
+
+    def _dias_leidos():
+        for k in range(60):
+            dia = INICIO + timedelta(days=k)
+            leidos.append(dia)
+            yield dia.isoformat(), []
+
+    assert list(filas_pedidos(_dias_leidos(), hasta=INICIO + timedelta(days=3))) == []
+    assert len(leidos) == 5
+
+
+def test_bloques():
+    assert [len(bloque) for bloque in bloques(range(7), tamano=3)] == [3, 3, 1]
+    assert list(bloques([], tamano=3)) == []
+
+
+def _leer(formato, datos):
+    if formato == "csv":
+        return pd.read_csv(io.BytesIO(datos), encoding="utf-8-sig")
+    if formato == "parquet":
+        return pd.read_parquet(io.BytesIO(datos))
+    return pd.read_excel(io.BytesIO(datos), sheet_name="Pedidos")
+
+
+@pytest.mark.parametrize("formato", exportacion.FORMATOS)
+def test_exportar_a_un_archivo_en_memoria(almacen, formato):
+    storage = almacen("json")
+    calendar, ids = calendario_de_prueba()
+    storage.save_calendar(calendar)
+
+    salida = io.BytesIO()
+    assert exportacion.exportar(salida, formato, unidades=["Tráiler 53"], tamano_bloque=2) == len(ids) // 2
+    df = _leer(formato, salida.getvalue())
+    assert list(df.columns) == exportacion.COLUMNAS
+    assert set(df["unidad"]) == {"Tráiler 53"} and len(df) == len(ids) // 2
+
+
+def test_exportar_valida_formato_y_fechas(almacen):
+    almacen("json")
+    with pytest.raises(ValueError, match="Formato"):
+        exportacion.exportar(io.BytesIO(), "json")
+    with pytest.raises(ValueError):
+        exportacion.exportar(io.BytesIO(), "csv", desde=INICIO, hasta=INICIO - timedelta(days=1))
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from utils.file_handler import leer_pedidos_excel
+
+
+def _libro(ruta, hojas):
+    """Escribe un .xlsx con {nombre de hoja: filas}."""
+    libro = openpyxl.Workbook()
+    libro.remove(libro.active)
+    for nombre, filas in hojas.items():
+        hoja = libro.create_sheet(nombre)
+        for fila in filas:
+            hoja.append(fila)
+    libro.save(ruta)
+    return ruta
+
+
+def _valores(serie):
+    return [None if pd.isna(valor) else valor for valor in serie]
+
+
+def test_encabezado_debajo_de_titulos_y_columnas_opcionales(tmp_path):
+    ruta = _libro(tmp_path / "pedidos.xlsx", {"Pedidos": [
+        ["Reporte de pedidos del ERP"],
+        [],
+        ["cliente", "dias retorno", "Tipo de unidad", "Fecha de carga", "Unidades permitidas"],
+        ["Ácme", 3, "torton", datetime(2025, 1, 6), "Torton; trailer 53"],
+        ["Beta", "2", None, "07/01/2025", None],
+        [None, None, None, None, None],
+        [123, 4.0, "Tráiler 53", None, None],
+    ]})
+    df, rechazos = leer_pedidos_excel(ruta, ["Tráiler 53", "Torton"])
+
+    assert rechazos == []
+    assert list(df.columns) == ["Cliente", "Días Retorno", "Unidad", "Fecha", "Unidades permitidas"]
+    assert df["Cliente"].tolist() == ["Ácme", "Beta", "123"]
+    assert df["Días Retorno"].tolist() == [3, 2, 4]
+    assert _valores(df["Unidad"]) == ["Torton", None, "Tráiler 53"]
+    assert _valores(df["Fecha"]) == ["2025-01-06", "2025-01-07", None]
+    assert _valores(df["Unidades permitidas"]) == ["Torton, Tráiler 53", None, None]
+
+
+@pytest.mark.parametrize("fila, motivo", [
+    ([None, 3], "Cliente vacío"),
+    (["Ácme", None], "Días Retorno vacío"),
+    (["Ácme", 0], "al menos 1"),
+    (["Ácme", -2], "al menos 1"),
+    (["Ácme", 2.5], "entero"),
+    (["Ácme", "tres"], "número"),
+    (["Ácme", 2, "Camión"], "Unidad desconocida"),
+    (["Ácme", 2, None, "mañana"], "Fecha no válida"),
+])
+def test_filas_invalidas_quedan_en_los_rechazos(tmp_path, fila, motivo):
+    ruta = _libro(tmp_path / "pedidos.xlsx", {"Pedidos": [
+        ["Cliente", "Días Retorno", "Unidad", "Fecha"],
+        ["Válido", 1],
+        fila,
+    ]})
+    df, rechazos = leer_pedidos_excel(ruta, ["Torton"])
+
+    assert df["Cliente"].tolist() == ["Válido"]
+    assert len(rechazos) == 1
+    assert rechazos[0]["Hoja"] == "Pedidos" and rechazos[0]["Fila"] == 3
+    assert motivo in rechazos[0]["Motivo"]
+
+
+def test_recorre_todas_las_hojas(tmp_path):
+    ruta = _libro(tmp_path / "pedidos.xlsx", {
+        "Enero": [["Cliente", "Días Retorno"], ["Ácme", 2]],
+        "Notas": [["Sin tabla de pedidos"]],
+        "Vacía": [],
+        "Febrero": [["Días Retorno", "Cliente"], [5, "Beta"]],
+    })
+    df, rechazos = leer_pedidos_excel(ruta)
+
+    assert df.to_dict("records") == [{"Cliente": "Ácme", "Días Retorno": 2}, {"Cliente": "Beta", "Días Retorno": 5}]
+    assert [(r["Hoja"], r["Fila"]) for r in rechazos] == [("Notas", None)]
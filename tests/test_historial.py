@@ -0,0 +1,153 @@
+import copy
+
+import pytest
+
+from utils import historial as modulo_historial
+from utils.calendar_logic import agregar_pedido, editar_dias_retorno, eliminar_pedido
+from utils.cambios import aplicar_cambios, estan_aplicados, invertir_cambios
+from utils.historial import Historial, auditoria
+from utils.indices import IndicePedidos, IndicesCalendario
+
+from conftest import INICIO
+
+
+def _operaciones(calendar, unidades, ids, indices=None):
+    """Alta, baja y edición sobre `calendar`; devuelve los cambios de las tres."""
+    cambios = []
+    agregar_pedido(calendar, unidades, "Nuevo", "Torton", INICIO, 2, indices, cambios, permitir_sobrecupo=True)
+    eliminar_pedido(calendar, unidades, ids[0], indices, cambios)
+    editar_dias_retorno(calendar, unidades, ids[1], 6, indices, cambios)
+    return cambios
+
+
+# --- Registros de cambios ---
+def test_aplicar_cambios_reproduce_la_operacion(calendario, unidades):
+    calendar, ids = calendario
+    original = copy.deepcopy(calendar)
+    cambios = _operaciones(calendar, unidades, ids)
+
+    assert aplicar_cambios(original, cambios) == calendar
+
+
+def test_aplicar_cambios_es_idempotente(calendario, unidades):
+    calendar, ids = calendario
+    cambios = _operaciones(calendar, unidades, ids)
+    despues = copy.deepcopy(calendar)
+
+    aplicar_cambios(calendar, cambios)
+    assert calendar == despues
+
+
+def test_invertir_cambios_regresa_al_original(calendario, unidades):
+    calendar, ids = calendario
+    original = copy.deepcopy(calendar)
+    cambios = _operaciones(calendar, unidades, ids)
+
+    aplicar_cambios(calendar, invertir_cambios(cambios))
+    assert {fecha: sorted(e["id"] for e in eventos) for fecha, eventos in calendar.items()} == \
+        {fecha: sorted(e["id"] for e in eventos) for fecha, eventos in original.items()}
+    fecha, pos = IndicePedidos.desde_calendario(calendar).entrega(ids[1])
+    assert calendar[fecha][pos] == next(e for e in original[fecha] if e["id"] == ids[1])
+    assert invertir_cambios(invertir_cambios(cambios)) == cambios
+
+
+def test_estan_aplicados(calendario, unidades):
+    calendar, ids = calendario
+    original = copy.deepcopy(calendar)
+    cambios = _operaciones(calendar, unidades, ids)
+
+    assert estan_aplicados(calendar, cambios)
+    assert not estan_aplicados(original, cambios)
+    assert estan_aplicados(original, invertir_cambios(cambios))
+
+    editar_dias_retorno(calendar, unidades, ids[1], 9)
+    assert not estan_aplicados(calendar, cambios)
+
+
+def test_aplicar_cambios_mantiene_los_indices(calendario, unidades):
+    calendar, ids = calendario
+    cambios = _operaciones(copy.deepcopy(calendar), unidades, ids)
+    indices = IndicesCalendario.desde_calendario(calendar)
+
+    aplicar_cambios(calendar, cambios, indices)
+    aplicar_cambios(calendar, invertir_cambios(cambios), indices)
+    reconstruido = IndicePedidos.desde_calendario(calendar)
+    for pedido_id in ids:
+        assert indices.pedidos.entrega(pedido_id) == reconstruido.entrega(pedido_id)
+        assert sorted(indices.pedidos.retornos(pedido_id)) == sorted(reconstruido.retornos(pedido_id))
+
+
+# --- Deshacer y rehacer ---
+@pytest.fixture
+def sesion(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return Historial(usuario="prueba", sesion="s1")
+
+
+def test_deshacer_y_rehacer(sesion, calendario, unidades):
+    calendar, ids = calendario
+    original = copy.deepcopy(calendar)
+    indices = IndicesCalendario.desde_calendario(calendar)
+    sesion.registrar("eliminar", "Eliminar pedido", _operaciones(calendar, unidades, ids, indices))
+    despues = copy.deepcopy(calendar)
+
+    cambios = []
+    assert sesion.deshacer(calendar, indices, cambios)[0]
+    assert sorted(e["id"] for eventos in calendar.values() for e in eventos) == \
+        sorted(e["id"] for eventos in original.values() for e in eventos)
+    assert sesion.por_deshacer() is None and sesion.por_rehacer() == "Eliminar pedido"
+    assert cambios and estan_aplicados(calendar, cambios)
+
+    assert sesion.rehacer(calendar, indices)[0]
+    assert {fecha: sorted(e["id"] for e in eventos) for fecha, eventos in calendar.items()} == \
+        {fecha: sorted(e["id"] for e in eventos) for fecha, eventos in despues.items()}
+    assert sesion.rehacer(calendar, indices) == (False, "No hay nada que rehacer.")
+
+    assert [registro["accion"] for registro in auditoria()] == ["rehacer", "deshacer", "eliminar"]
+    assert auditoria()[-1]["usuario"] == "prueba"
+
+
+def test_no_deshace_lo_que_otra_sesion_cambio(sesion, calendario, unidades):
+    calendar, ids = calendario
+    cambios = []
+    editar_dias_retorno(calendar, unidades, ids[1], 6, cambios=cambios)
+    sesion.registrar("editar", "Editar días", cambios)
+
+    editar_dias_retorno(calendar, unidades, ids[1], 8)  # otra sesión
+    ok, mensaje = sesion.deshacer(calendar)
+    assert not ok and "cambiaron" in mensaje
+    assert sesion.por_deshacer() is None and sesion.por_rehacer() is None
+
+
+def test_registrar_borra_lo_que_habia_por_rehacer(sesion, calendario, unidades):
+    calendar, ids = calendario
+    cambios = []
+    eliminar_pedido(calendar, unidades, ids[0], cambios=cambios)
+    sesion.registrar("eliminar", "Primera", cambios)
+    sesion.deshacer(calendar)
+
+    cambios = []
+    eliminar_pedido(calendar, unidades, ids[2], cambios=cambios)
+    sesion.registrar("eliminar", "Segunda", cambios)
+    assert sesion.por_rehacer() is None and sesion.por_deshacer() == "Segunda"
+
+
+def test_niveles_limitan_lo_que_se_puede_deshacer(tmp_path, monkeypatch, calendario, unidades):
+    monkeypatch.chdir(tmp_path)
+    calendar, ids = calendario
+    sesion = Historial(usuario="prueba", niveles=2)
+    for pedido_id in ids[:3]:
+        cambios = []
+        eliminar_pedido(calendar, unidades, pedido_id, cambios=cambios)
+        sesion.registrar("eliminar", pedido_id, cambios)
+
+    assert sesion.deshacer(calendar)[0] and sesion.deshacer(calendar)[0]
+    assert not sesion.deshacer(calendar)[0]
+
+
+def test_auditoria_lee_solo_el_final(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for numero in range(30):
+        modulo_historial.registrar_auditoria("prueba", "s1", "registrar", f"op {numero}")
+
+    assert [registro["descripcion"] for registro in auditoria(limite=3)] == ["op 29", "op 28", "op 27"]
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+from utils.calendar_logic import eliminar_pedido, editar_dias_retorno
+from utils.eventos import dias_retorno_de
+from utils.indices import IndicePedidos, IndiceTransito, IndicesCalendario
+
+
+def _ubicaciones(indice):
+    """(entregas, retornos) del índice, como {id: ubicación} para comparar."""
+    entregas = {pedido_id: tuple(u) for pedido_id, u in indice._entregas.items()}
+    retornos = {pedido_id: sorted(tuple(u) for u in us) for pedido_id, us in indice._retornos.items()}
+    return entregas, retornos
+
+
+def test_al_quitar_recorre_las_posiciones_del_mismo_dia():
+    calendar = {"2025-01-06": [
+        {"id": "a", "tipo_evento": "entrega"},
+        {"id": "b", "tipo_evento": "entrega"},
+        {"id": "retorno-x", "tipo_evento": "retorno", "id_entrega_asociada": "x"},
+        {"id": "c", "tipo_evento": "entrega"},
+    ], "2025-01-07": [{"id": "d", "tipo_evento": "entrega"}]}
+    indice = IndicePedidos.desde_calendario(calendar)
+
+    evento = calendar["2025-01-06"].pop(1)
+    indice.al_quitar("2025-01-06", 1, evento, calendar["2025-01-06"])
+
+    assert indice.entrega("b") is None
+    assert indice.entrega("a") == ("2025-01-06", 0)
+    assert indice.retornos("x") == [("2025-01-06", 1)]
+    assert indice.entrega("c") == ("2025-01-06", 2)
+    assert indice.entrega("d") == ("2025-01-07", 0)
+
+
+def test_al_quitar_el_ultimo_retorno_borra_el_pedido():
+    calendar = {"2025-01-06": [{"id": "retorno-x", "tipo_evento": "retorno", "pedido_id_asociado": "x"}]}
+    indice = IndicePedidos.desde_calendario(calendar)
+    assert indice.retornos("x") == [("2025-01-06", 0)]
+
+    evento = calendar["2025-01-06"].pop(0)
+    indice.al_quitar("2025-01-06", 0, evento, calendar["2025-01-06"])
+
+    assert indice.retornos("x") == []
+    assert "x" not in indice._retornos
+
+
+def test_indice_de_pedidos_coincide_con_reconstruir_tras_bajas_y_ediciones(calendario, unidades):
+    calendar, ids = calendario
+    indices = IndicesCalendario.desde_calendario(calendar)
+    for pedido_id in ids[::3]:
+        assert eliminar_pedido(calendar, unidades, pedido_id, indices)[0]
+    for pedido_id in ids[1::3]:
+        assert editar_dias_retorno(calendar, unidades, pedido_id, 4, indices)[0]
+
+    assert _ubicaciones(indices.pedidos) == _ubicaciones(IndicePedidos.desde_calendario(calendar))
+    for pedido_id in ids[1::3]:
+        fecha, pos = indices.pedidos.entrega(pedido_id)
+        assert calendar[fecha][pos]["id"] == pedido_id
+
+
+def _en_transito_a_mano(calendar, dia, unidad=None):
+    return sorted(
+        evento["id"] for eventos in calendar.values() for evento in eventos
+        if evento["tipo_evento"] == "entrega" and (unidad is None or evento["unidad"] == unidad)
+        and date.fromisoformat(evento["fecha_pedido"]) < dia
+        < date.fromisoformat(evento["fecha_pedido"]) + timedelta(days=dias_retorno_de(evento))
+    )
+
+
+def test_en_transito_coincide_con_recorrer_el_calendario(calendario, unidades):
+    calendar, ids = calendario
+    indices = IndicesCalendario.desde_calendario(calendar)
+    eliminar_pedido(calendar, unidades, ids[2], indices)
+    editar_dias_retorno(calendar, unidades, ids[4], 9, indices)
+    transito = indices.transito
+
+    dia = date(2025, 1, 5)
+    while dia <= date(2025, 1, 25):
+        assert sorted(e["id"] for e in transito.en_transito(dia)) == _en_transito_a_mano(calendar, dia)
+        assert sorted(e["id"] for e in transito.en_transito(dia, "Torton")) == \
+            _en_transito_a_mano(calendar, dia, "Torton")
+        dia += timedelta(days=1)
+
+    esperadas = sorted({
+        (date(2025, 1, 5) + timedelta(days=n)).isoformat() for n in range(40)
+        if _en_transito_a_mano(calendar, date(2025, 1, 5) + timedelta(days=n))
+    })
+    assert transito.fechas_con_transito() == esperadas
+
+
+def test_quitar_del_indice_de_transito_identifica_el_objeto():
+    a = {"id": "a", "unidad": "Torton", "fecha_pedido": "2025-01-06", "dias_retorno": 3, "tipo_evento": "entrega"}
+    b = dict(a, id="b")
+    indice = IndiceTransito()
+    indice.agregar(a)
+    indice.agregar(b)
+
+    assert indice.quitar(dict(a)) is False  # igual pero no el mismo evento
+    assert indice.quitar(b) is True
+    assert [e["id"] for e in indice.en_transito("2025-01-07")] == ["a"]
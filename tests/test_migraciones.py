@@ -0,0 +1,108 @@
+import copy
+
+import pytest
+
+from utils import migraciones
+
+
+def _datos_sin_migrar():
+    return {
+        "2025-01-06": [
+            {"id": "a", "cliente": "Ácme", "unidad": "Torton", "dias_retorno": 3, "fecha_pedido": "2025-01-06",
+             "tipo_evento": "entrega"},
+            {"id": "b", "cliente": "Beta", "unidad": "Torton", "dias_retorno": 1, "fecha_pedido": "2025-01-06",
+             "tipo_evento": "entrega"},
+        ],
+        "2025-01-07": [
+            {"id": "retorno-b", "tipo_evento": "retorno", "unidad": "Torton", "pedido_id_asociado": "b",
+             "cliente_asociado": "Beta", "fecha_pedido_asociado": "2025-01-06"},
+        ],
+        "2025-01-09": [
+            {"id": "r-viejo", "tipo_evento": "retorno", "unidad": "Torton", "cliente_asociado": "Ácme",
+             "fecha_pedido_asociado": "2025-01-06"},
+            {"id": "r-huerfano", "tipo_evento": "retorno", "unidad": "Torton", "cliente_asociado": "Nadie",
+             "fecha_pedido_asociado": "2025-01-02"},
+        ],
+    }
+
+
+def test_pasos_asocian_y_unifican_los_retornos():
+    calendar = _datos_sin_migrar()
+    cambiados, avisos = migraciones.migrar_calendario(calendar)
+
+    assert cambiados == {"retornos_sin_id": 1, "clave_unica_de_retorno": 1}
+    assert calendar["2025-01-09"][0]["id_entrega_asociada"] == "a"
+    # La clave nueva queda en la posición de la anterior
+    assert list(calendar["2025-01-07"][0]) == ["id", "tipo_evento", "unidad", "id_entrega_asociada",
+                                               "cliente_asociado", "fecha_pedido_asociado"]
+    assert len(avisos) == 1 and "Nadie" in avisos[0]
+
+
+def test_pasos_son_idempotentes():
+    calendar = _datos_sin_migrar()
+    migraciones.migrar_calendario(calendar)
+    migrado = copy.deepcopy(calendar)
+
+    cambiados, _ = migraciones.migrar_calendario(calendar)
+    assert cambiados == {"retornos_sin_id": 0, "clave_unica_de_retorno": 0}
+    assert calendar == migrado
+
+
+def test_solo_corren_los_pasos_pendientes():
+    calendar = _datos_sin_migrar()
+    cambiados, _ = migraciones.migrar_calendario(calendar, version=1)
+
+    assert cambiados == {"clave_unica_de_retorno": 1}
+    assert "id_entrega_asociada" not in calendar["2025-01-09"][0]
+
+
+def test_retorno_con_dos_claves_conserva_id_entrega_asociada():
+    calendar = {"2025-01-07": [{"id": "r", "tipo_evento": "retorno", "id_entrega_asociada": "a",
+                                "pedido_id_asociado": "otro"}]}
+    _, avisos = migraciones.migrar_calendario(calendar, version=1)
+
+    assert calendar["2025-01-07"][0] == {"id": "r", "tipo_evento": "retorno", "id_entrega_asociada": "a"}
+    assert len(avisos) == 1
+
+
+@pytest.mark.parametrize("backend", ["json", "particionado", "diario", "sqlite"])
+def test_migrar_el_backend_activo(almacen, backend):
+    storage = almacen(backend)
+    storage.save_calendar(_datos_sin_migrar())
+    version = storage.version_calendario()
+
+    simulado = migraciones.migrar(simular=True)
+    assert simulado["simulado"] and simulado["version_destino"] == migraciones.VERSION_ACTUAL
+    assert migraciones.version_esquema() == 0
+    assert storage.load_calendar() == _datos_sin_migrar()
+
+    reporte = migraciones.migrar()
+    assert [paso["eventos_cambiados"] for paso in reporte["pasos"]] == [1, 1]
+    assert migraciones.version_esquema() == migraciones.VERSION_ACTUAL
+    assert storage.version_calendario() > version
+    migrado = _datos_sin_migrar()
+    migraciones.migrar_calendario(migrado)
+    assert storage.load_calendar() == migrado
+
+    assert migraciones.migrar()["pasos"] == []
+
+
+def test_calendar_json_que_no_existe_es_un_calendario_vacio(almacen):
+    almacen("json")
+
+    reporte = migraciones.migrar()
+    assert [paso["eventos_cambiados"] for paso in reporte["pasos"]] == [0, 0]
+    assert migraciones.version_esquema() == migraciones.VERSION_ACTUAL
+
+
+@pytest.mark.parametrize("contenido", ['{"2025-01-06": [', "[1, 2, 3]"])
+def test_calendar_json_danado_da_un_error_claro(almacen, capsys, contenido):
+    almacen("json")
+    with open("data/calendar.json", "w", encoding="utf-8") as f:
+        f.write(contenido)
+
+    with pytest.raises(ValueError, match="calendar.json"):
+        migraciones.migrar()
+    assert migraciones.main([]) == 2
+    assert "calendar.json" in capsys.readouterr().err
+    assert migraciones.version_esquema() == 0
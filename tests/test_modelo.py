@@ -0,0 +1,44 @@
+from datetime import date
+
+from utils.modelo import CalendarioModelo, Entrega, Retorno
+
+
+def test_ida_y_vuelta_conserva_el_json(calendario):
+    calendar, _ = calendario
+    assert CalendarioModelo.desde_json(calendar).a_json() == calendar
+
+
+def test_ida_y_vuelta_conserva_claves_valores_raros_y_fechas_no_iso():
+    calendar = {
+        "2025-01-06": [
+            {"tipo_evento": "entrega", "id": "a", "cliente": "Ácme", "unidad": "Torton", "dias_retorno": "3",
+             "fecha_pedido": "2025-01-06", "nota": "sin ajuste"},
+            {"id": "retorno-b", "tipo_evento": "retorno", "unidad": "Torton", "pedido_id_asociado": "b",
+             "cliente_asociado": "Ácme", "fecha_pedido_asociado": "2025-01-03"},
+            {"tipo_evento": "mantenimiento", "unidad": "Torton"},
+        ],
+        "2025-1-7": [{"tipo_evento": "entrega", "id": "c"}],
+    }
+    convertido = CalendarioModelo.desde_json(calendar).a_json()
+
+    assert convertido == calendar
+    for fecha_str, eventos in calendar.items():
+        assert [list(evento) for evento in convertido[fecha_str]] == [list(evento) for evento in eventos]
+
+
+def test_tipos_compactos():
+    calendar = {"2025-01-06": [
+        {"id": "a", "cliente": "Ácme", "unidad": "Torton", "dias_retorno": 2, "dias_retorno_calculados": 3,
+         "fecha_pedido": "2025-01-06", "tipo_evento": "entrega"},
+        {"id": "retorno-z", "tipo_evento": "retorno", "unidad": "Torton", "id_entrega_asociada": "z",
+         "cliente_asociado": "Ácme", "fecha_pedido_asociado": "2025-01-02"},
+    ]}
+    modelo = CalendarioModelo.desde_json(calendar, unidades=["Tráiler 53", "Torton"])
+    entrega, retorno = modelo.dias[date(2025, 1, 6).toordinal()]
+
+    assert isinstance(entrega, Entrega) and isinstance(retorno, Retorno)
+    assert entrega.unidad == retorno.unidad == 1
+    assert entrega.cliente == retorno.cliente
+    assert entrega.fecha_retorno == date(2025, 1, 9).toordinal()
+    assert retorno.id_entrega == "z"
+    assert list(modelo.intervalos()) == [(1, date(2025, 1, 6).toordinal(), date(2025, 1, 9).toordinal())]
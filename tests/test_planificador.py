@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from utils.calendar_logic import agregar_pedidos
+from utils.disponibilidad import columnas_calendario
+from utils.planificador import pedidos_desde_excel, planificar
+
+from conftest import INICIO, calendario_de_prueba
+
+
+def _pedido(cliente="Ácme", dias_retorno=2, unidades=None, fecha_minima=None, fecha_limite=None):
+    return {"fila": 1, "cliente": cliente, "dias_retorno": dias_retorno, "unidades": unidades,
+            "fecha_minima": fecha_minima, "fecha_limite": fecha_limite}
+
+
+def test_pedidos_desde_excel():
+    df = pd.DataFrame({
+        "Cliente": ["Ácme", "Beta", "Gama"],
+        "Días Retorno": [2, 3, 1],
+        "Unidad": ["Torton", None, "Torton"],
+        "Unidades permitidas": [None, None, "Torton, Tráiler 53"],
+        "Fecha": ["2025-01-07", None, None],
+        "Fecha límite": [None, "2025-01-10", None],
+    })
+    pedidos = pedidos_desde_excel(df)
+
+    assert [p["fila"] for p in pedidos] == [1, 2, 3]
+    assert [p["unidades"] for p in pedidos] == [["Torton"], None, ["Torton", "Tráiler 53"]]
+    assert pedidos[0]["fecha_minima"] == date(2025, 1, 7) and pedidos[0]["fecha_limite"] is None
+    assert pedidos[1]["fecha_minima"] is None and pedidos[1]["fecha_limite"] == date(2025, 1, 10)
+
+
+def test_asigna_sin_sobrecupo(unidades):
+    calendar, _ = calendario_de_prueba(pedidos=6)
+    pedidos = [_pedido(cliente=f"Cliente {i}", dias_retorno=1 + i % 3) for i in range(12)]
+
+    asignados, sin_asignar = planificar(pedidos, unidades, columnas_calendario(calendar), INICIO)
+    assert sin_asignar == [] and len(asignados) == 12
+
+    # Registrados en el orden planificado, todos pasan la revisión de capacidad
+    reporte = agregar_pedidos(calendar, unidades, asignados)
+    assert all(fila["ok"] for fila in reporte), [fila["mensaje"] for fila in reporte if not fila["ok"]]
+
+
+def test_respeta_unidades_y_ventana(unidades):
+    minima = INICIO + timedelta(days=2)
+    pedidos = [_pedido(unidades=["Torton"]) for _ in range(3)] + [_pedido(fecha_minima=minima)]
+
+    asignados, _ = planificar(pedidos, unidades, columnas_calendario({}), INICIO)
+    por_cliente = sorted((a["fecha_pedido"], a["unidad"]) for a in asignados[:3])
+    assert por_cliente == [(INICIO, "Torton"), (INICIO, "Torton"), (INICIO + timedelta(days=2), "Torton")]
+    assert asignados[3]["fecha_pedido"] == minima
+
+
+def test_carga_en_sabado_suma_un_dia(unidades):
+    sabado = date(2025, 1, 11)
+    asignados, _ = planificar([_pedido(dias_retorno=1)], unidades, columnas_calendario({}), sabado)
+
+    assert asignados[0]["fecha_pedido"] == sabado
+    assert asignados[0]["dias_retorno_calculados"] == 2
+
+
+def test_motivos_de_los_sin_asignar(unidades):
+    pedidos = [
+        _pedido(cliente="Fuera", fecha_minima=INICIO + timedelta(days=30)),
+        _pedido(cliente="Al revés", fecha_minima=INICIO + timedelta(days=5), fecha_limite=INICIO + timedelta(days=3)),
+        _pedido(cliente="Lejos y al revés", fecha_minima=INICIO + timedelta(days=30),
+                fecha_limite=INICIO + timedelta(days=20)),
+        _pedido(cliente="Sin unidad", unidades=["Camión"]),
+    ]
+    asignados, sin_asignar = planificar(pedidos, unidades, columnas_calendario({}), INICIO, horizonte=14)
+
+    assert asignados == []
+    motivos = {fila["cliente"]: fila["motivo"] for fila in sin_asignar}
+    assert "fuera del horizonte" in motivos["Fuera"] and "2025-01-19" in motivos["Fuera"]
+    assert "fecha límite" in motivos["Al revés"]
+    assert "fecha límite" in motivos["Lejos y al revés"]
+    assert "Camión" in motivos["Sin unidad"]
+
+
+def test_sin_unidades_libres_en_el_horizonte(unidades):
+    pedidos = [_pedido(cliente=str(i), dias_retorno=5, unidades=["Torton"]) for i in range(3)]
+    asignados, sin_asignar = planificar(pedidos, unidades, columnas_calendario({}), INICIO, horizonte=3)
+
+    assert len(asignados) == 2
+    assert [fila["cliente"] for fila in sin_asignar] == ["2"]
+    assert "horizonte" in sin_asignar[0]["motivo"]
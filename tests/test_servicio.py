@@ -0,0 +1,150 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from utils import servicio
+
+
+@pytest.fixture
+def servicio_local(almacen, unidades):
+    storage = almacen("json")
+    storage.save_units(unidades)
+    return storage
+
+
+def _pedido(**campos):
+    return dict({"cliente": "Ácme", "unidad": "Torton", "fecha_pedido": "2025-01-06", "dias_retorno": 2}, **campos)
+
+
+def _entregas(storage):
+    return [evento for eventos in storage.load_calendar().values() for evento in eventos
+            if evento["tipo_evento"] == "entrega"]
+
+
+def test_registrar_lote_con_una_sola_escritura(servicio_local):
+    reporte = servicio.registrar([_pedido(), _pedido(cliente="Beta", fecha_pedido="2025-01-07")])
+
+    assert [fila["ok"] for fila in reporte] == [True, True]
+    assert sorted(e["id"] for e in _entregas(servicio_local)) == sorted(fila["id"] for fila in reporte)
+    assert servicio_local.version_calendario() == 1
+
+
+@pytest.mark.parametrize("pedido", [
+    _pedido(cliente=None),
+    _pedido(cliente=123),
+    _pedido(cliente="   "),
+    _pedido(unidad="NoExiste"),
+    _pedido(unidad=None),
+    _pedido(fecha_pedido="06/01/2025"),
+    _pedido(dias_retorno=0),
+    _pedido(dias_retorno=-5),
+    _pedido(dias_retorno=2.5),
+    _pedido(dias_retorno=True),
+    _pedido(dias_retorno="tres"),
+    "no es un pedido",
+    ["Ácme", "Torton"],
+    None,
+])
+def test_registrar_reporta_filas_invalidas_sin_guardarlas(servicio_local, pedido):
+    reporte = servicio.registrar([_pedido(cliente="Válido"), pedido], permitir_sobrecupo=True)
+
+    assert reporte[0]["ok"] is True
+    assert reporte[1]["ok"] is False and reporte[1]["mensaje"].startswith("Pedido inválido")
+    assert reporte[1]["fila"] == 1
+    assert [e["cliente"] for e in _entregas(servicio_local)] == ["Válido"]
+
+
+def test_registrar_rechaza_sobrecupo(servicio_local):
+    reporte = servicio.registrar([_pedido(), _pedido(), _pedido()])
+
+    assert [fila["ok"] for fila in reporte] == [True, True, False]
+    assert "Sobrecupo" in reporte[2]["mensaje"]
+
+
+def test_eliminar_y_editar_dias(servicio_local):
+    pedido_id = servicio.registrar([_pedido()])[0]["id"]
+
+    reporte = servicio.editar_dias([{"id": pedido_id, "dias_retorno": 4}, {"id": pedido_id, "dias_retorno": 0},
+                                    "no es un pedido"])
+    assert [fila["ok"] for fila in reporte] == [True, False, False]
+    assert _entregas(servicio_local)[0]["dias_retorno"] == 4
+
+    reporte = servicio.eliminar([pedido_id, pedido_id, {"id": pedido_id}])
+    assert [fila["ok"] for fila in reporte] == [True, False, False]
+    assert _entregas(servicio_local) == []
+
+
+def test_disponibilidad_y_exportar(servicio_local, unidades):
+    servicio.registrar([_pedido(dias_retorno=3)])
+
+    filas = servicio.disponibilidad("2025-01-06", "2025-01-10")
+    torton = {fila["fecha"]: fila for fila in filas if fila["unidad"] == "Torton"}
+    assert torton["2025-01-06"]["cargas"] == 1
+    assert torton["2025-01-07"]["disponibles"] == unidades["Torton"] - 1
+    assert torton["2025-01-09"]["retornos"] == 1
+
+    exportado = servicio.exportar("2025-01-06", "2025-01-06")
+    assert list(exportado) == ["2025-01-06"]
+    exportado["2025-01-06"][0]["cliente"] = "cambiado"
+    assert _entregas(servicio_local)[0]["cliente"] == "Ácme"
+
+    with pytest.raises(ValueError):
+        servicio.disponibilidad("2025-01-10", "2025-01-06")
+
+
+@pytest.fixture
+def servidor(servicio_local, monkeypatch):
+    monkeypatch.setattr(servicio._Manejador, "log_message", lambda *args: None)
+    http = ThreadingHTTPServer(("127.0.0.1", 0), servicio._Manejador)
+    hilo = threading.Thread(target=http.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{http.server_address[1]}"
+    http.shutdown()
+    http.server_close()
+
+
+def _pedir(url, cuerpo=None):
+    datos = json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else None
+    peticion = urllib.request.Request(url, data=datos, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(peticion) as respuesta:
+            return respuesta.status, json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_servicio_http(servidor):
+    assert _pedir(f"{servidor}/salud") == (200, {"ok": True})
+
+    estado, cuerpo = _pedir(f"{servidor}/pedidos", {"pedidos": [_pedido(), "no es un pedido", _pedido(cliente=7)]})
+    assert estado == 200
+    assert (cuerpo["total"], cuerpo["ok"]) == (3, 1)
+
+    assert _pedir(f"{servidor}/pedidos", {"pedidos": "no es una lista"})[0] == 400
+    assert _pedir(f"{servidor}/pedidos/eliminar", {"ids": "abc"})[0] == 400
+    assert _pedir(f"{servidor}/disponibilidad?desde=2025-01-06")[0] == 400
+    assert _pedir(f"{servidor}/no-existe")[0] == 404
+
+    estado, cuerpo = _pedir(f"{servidor}/exportar?desde=2025-01-06&hasta=2025-01-06")
+    assert estado == 200 and [e["cliente"] for e in cuerpo["2025-01-06"]] == ["Ácme"]
+
+
+def test_cli(servicio_local, tmp_path, capsys):
+    lote = tmp_path / "pedidos.json"
+    lote.write_text(json.dumps([_pedido(), 5, _pedido(unidad="NoExiste")]), encoding="utf-8")
+
+    assert servicio.main(["registrar-lote", str(lote), "--sobrecupo"]) == 1
+    salida = json.loads(capsys.readouterr().out)
+    assert [fila["ok"] for fila in salida["resultados"]] == [True, False, False]
+
+    lote.write_text(json.dumps({"cliente": "Ácme"}), encoding="utf-8")
+    assert servicio.main(["registrar-lote", str(lote)]) == 2
+    assert "lista" in capsys.readouterr().err
+
+    assert servicio.main(["registrar", "--cliente", "Beta", "--unidad", "Torton", "--fecha", "2025-01-07",
+                          "--dias", "1"]) == 0
+    assert len(_entregas(servicio_local)) == 2
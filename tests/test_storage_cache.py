@@ -0,0 +1,128 @@
+import copy
+import json
+import os
+from datetime import date
+
+import pytest
+
+from utils import storage_particionado
+from utils.calendar_logic import agregar_pedido
+from utils.indices import IndicesCalendario
+
+from conftest import INICIO, calendario_de_prueba
+
+
+def test_load_devuelve_lo_mismo_mientras_el_archivo_no_cambie(almacen):
+    storage = almacen("json")
+    storage.save_units({"Torton": 2})
+    unidades = storage.load_units()
+    assert storage.load_units() is unidades
+
+    with open(storage.UNITS_PATH, "w", encoding="utf-8") as f:
+        json.dump({"Torton": 12, "Interplanta": 1}, f)
+    assert storage.load_units() == {"Torton": 12, "Interplanta": 1}
+
+
+def test_save_invalida_la_cache_y_los_derivados(almacen):
+    storage = almacen("json")
+    storage.save_units({"Torton": 0})
+    construidos = []
+
+    def _construir(unidades):
+        construidos.append(dict(unidades))
+        return sum(unidades.values())
+
+    assert storage.obtener_derivado("units", "total", _construir) == 0
+    assert storage.obtener_derivado("units", "total", _construir) == 0
+    assert len(construidos) == 1
+
+    storage.save_units({"Torton": 2, "Tráiler 53": 5})
+    assert storage.obtener_derivado("units", "total", _construir) == 7
+    assert len(construidos) == 2
+
+
+def test_save_con_cambios_conserva_calendario_e_indices_en_cache(almacen, unidades):
+    storage = almacen("json")
+    storage.save_calendar(calendario_de_prueba()[0])
+
+    calendar = storage.load_calendar()
+    indices = storage.obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario)
+    cambios = []
+    agregar_pedido(calendar, unidades, "Nuevo", "Torton", INICIO, 2, indices, cambios, permitir_sobrecupo=True)
+
+    assert storage.save_calendar(calendar, cambios) is False
+    assert storage.load_calendar() is calendar
+    assert storage.obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario) is indices
+
+    # Un derivado que no es incremental se rearma con el calendario guardado
+    assert storage.obtener_derivado("calendar", "fechas", sorted) == sorted(calendar)
+
+
+def test_save_sin_cambios_descarta_los_indices(almacen):
+    storage = almacen("json")
+    storage.save_calendar(calendario_de_prueba()[0])
+    indices = storage.obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario)
+
+    storage.save_calendar({})
+    assert storage.load_calendar() == {}
+    assert storage.obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario) is not indices
+    assert os.path.exists(storage.CALENDAR_VERSION_PATH)
+
+
+@pytest.mark.parametrize("backend", ["json", "particionado", "diario", "sqlite"])
+def test_cada_backend_conserva_los_indices_al_guardar_al_dia(almacen, unidades, backend):
+    storage = almacen(backend)
+    storage.save_calendar(calendario_de_prueba()[0])
+
+    for _ in range(2):
+        calendar = storage.load_calendar()
+        indices = storage.obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario)
+        cambios = []
+        agregar_pedido(calendar, unidades, "Nuevo", "Torton", INICIO, 2, indices, cambios, permitir_sobrecupo=True)
+        assert storage.save_calendar(calendar, cambios) is False
+        assert storage.load_calendar() is calendar
+        assert storage.obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario) is indices
+
+    storage._invalidar("calendar")
+    releido = storage.load_calendar()
+    assert releido is not calendar
+    assert sorted(e["id"] for eventos in releido.values() for e in eventos) == \
+        sorted(e["id"] for eventos in calendar.values() for e in eventos)
+
+
+def _particionado_de_dos_meses(almacen, unidades):
+    storage = almacen("particionado")
+    calendar, _ = calendario_de_prueba(pedidos=6)
+    agregar_pedido(calendar, unidades, "Febrero", "Torton", date(2025, 2, 3), 2, permitir_sobrecupo=True)
+    storage.save_calendar(calendar)
+    return storage
+
+
+def test_particiones_sin_cambios_no_se_releen_ni_se_copian(almacen, unidades):
+    storage = _particionado_de_dos_meses(almacen, unidades)
+    cargado = storage.load_calendar()
+
+    # Otra sesión guarda un pedido en febrero: al recargar solo se relee ese mes
+    otra, cambios = copy.deepcopy(cargado), []
+    agregar_pedido(otra, unidades, "Otra", "Torton", date(2025, 2, 4), 1, cambios=cambios, permitir_sobrecupo=True)
+    storage.save_calendar(otra, cambios)
+
+    recargado = storage.load_calendar()
+    assert recargado is not cargado
+    assert recargado["2025-01-06"] is cargado["2025-01-06"]
+    assert [e["cliente"] for e in recargado["2025-02-04"] if e["tipo_evento"] == "entrega"] == ["Otra"]
+
+
+def test_guardado_fallido_no_deja_cambios_en_los_meses_retenidos(almacen, unidades, monkeypatch):
+    storage = _particionado_de_dos_meses(almacen, unidades)
+    calendar = storage.load_calendar()
+    cambios = []
+    agregar_pedido(calendar, unidades, "Sin guardar", "Torton", INICIO, 2, cambios=cambios, permitir_sobrecupo=True)
+
+    def _falla(*args, **kwargs):
+        raise OSError("disco lleno")
+    with monkeypatch.context() as parche, pytest.raises(OSError):
+        parche.setattr(storage_particionado, "_escribir", _falla)
+        storage.save_calendar(calendar, cambios)
+
+    assert "Sin guardar" not in {e.get("cliente") for eventos in storage.load_calendar().values() for e in eventos}
@@ -0,0 +1,65 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import storage_columnar
+
+
+def _pedidos():
+    return pd.DataFrame({
+        "Cliente": ["PDS Cancún", "Ácme", "PDS Cancún", None],
+        "Días Retorno": [2, 3, 1, 4],
+        "Unidad": ["Torton", None, "Tráiler 53", "Torton"],
+    })
+
+
+def test_guardar_y_cargar_por_columnas(almacen):
+    storage = almacen("json")
+    storage.save_pedidos_excel(_pedidos())
+
+    df = storage.load_pedidos_excel()
+    assert list(df.columns) == ["Cliente", "Días Retorno", "Unidad"]
+    assert isinstance(df["Cliente"].dtype, pd.CategoricalDtype)
+    assert [None if pd.isna(v) else v for v in df["Cliente"]] == ["PDS Cancún", "Ácme", "PDS Cancún", None]
+    assert df["Días Retorno"].tolist() == [2, 3, 1, 4]
+    assert [None if pd.isna(v) else v for v in df["Unidad"]] == ["Torton", None, "Tráiler 53", "Torton"]
+    # Los arreglos se leen con memoria mapeada, sin copiarlos
+    assert isinstance(storage_columnar._cargar_npy("columna_1.npy"), np.memmap)
+
+
+def test_clientes_normalizados_alineados_con_las_categorias(almacen):
+    storage = almacen("json")
+    storage.save_pedidos_excel(_pedidos())
+    df = storage.load_pedidos_excel()
+
+    normalizados = storage.clientes_normalizados(df)
+    assert list(normalizados) == ["pds cancun", "acme"]
+    assert len(normalizados) == len(df["Cliente"].cat.categories)
+
+
+def test_un_excel_nuevo_retira_las_columnas_del_anterior(almacen):
+    storage = almacen("json")
+    storage.save_pedidos_excel(_pedidos())
+    storage.save_pedidos_excel(pd.DataFrame({"Días Retorno": [5]}))
+
+    archivos = sorted(nombre for nombre in os.listdir(storage_columnar.PEDIDOS_EXCEL_DIR) if nombre.endswith(".npy"))
+    assert archivos == ["columna_0.npy"]
+    assert storage.load_pedidos_excel().to_dict("records") == [{"Días Retorno": 5}]
+
+
+def test_lee_el_json_anterior_y_lo_retira_al_guardar(almacen):
+    storage = almacen("json")
+    with open(storage.PEDIDOS_EXCEL_PATH, "w", encoding="utf-8") as f:
+        json.dump([{"Cliente": "Ácme", "Días Retorno": 2}], f)
+
+    df = storage.load_pedidos_excel()
+    assert df["Cliente"].tolist() == ["Ácme"]
+
+    storage.save_pedidos_excel(df)
+    assert not os.path.exists(storage.PEDIDOS_EXCEL_PATH)
+    assert storage.load_pedidos_excel()["Cliente"].tolist() == ["Ácme"]
+
+    storage.delete_pedidos_excel()
+    assert storage.load_pedidos_excel().empty
@@ -0,0 +1,93 @@
+import copy
+import threading
+
+import pytest
+
+from utils.calendar_logic import agregar_pedido, editar_dias_retorno, eliminar_pedido
+from utils.cambios import aplicar_cambios
+from utils.indices import IndicesCalendario
+
+from conftest import INICIO, calendario_de_prueba
+
+BACKENDS = ["json", "particionado", "diario", "sqlite"]
+
+
+def _por_dia(calendar):
+    """El calendario sin depender del orden de los eventos dentro de cada día."""
+    return {fecha: sorted(eventos, key=lambda evento: (evento["tipo_evento"], evento["id"]))
+            for fecha, eventos in calendar.items()}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_guardar_sobre_una_version_vieja_reaplica_los_cambios(almacen, unidades, backend):
+    storage = almacen(backend)
+    inicial, ids = calendario_de_prueba(pedidos=6)
+    storage.save_calendar(inicial)
+
+    # Dos sesiones cargan la misma versión; la otra guarda primero
+    calendar = storage.load_calendar()
+    indices = IndicesCalendario.desde_calendario(calendar)
+    otra = copy.deepcopy(calendar)
+    cambios_otra = []
+    agregar_pedido(otra, unidades, "Otra sesión", "Torton", INICIO, 2, cambios=cambios_otra, permitir_sobrecupo=True)
+    editar_dias_retorno(otra, unidades, ids[1], 6, cambios=cambios_otra)
+    storage.save_calendar(otra, cambios_otra)
+
+    cambios = []
+    agregar_pedido(calendar, unidades, "Esta sesión", "Tráiler 53", INICIO, 3, indices, cambios,
+                   permitir_sobrecupo=True)
+    eliminar_pedido(calendar, unidades, ids[0], indices, cambios)
+    assert storage.save_calendar(calendar, cambios) is True
+
+    esperado = aplicar_cambios(aplicar_cambios(copy.deepcopy(inicial), cambios_otra), cambios)
+    assert _por_dia(storage.load_calendar()) == _por_dia(esperado)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_guardar_al_dia_no_reaplica(almacen, unidades, backend):
+    storage = almacen(backend)
+    storage.save_calendar(calendario_de_prueba(pedidos=3)[0])
+
+    calendar = storage.load_calendar()
+    cambios = []
+    agregar_pedido(calendar, unidades, "Única", "Torton", INICIO, 1, cambios=cambios, permitir_sobrecupo=True)
+    assert storage.save_calendar(calendar, cambios) is False
+    assert _por_dia(storage.load_calendar()) == _por_dia(calendar)
+
+
+@pytest.mark.parametrize("backend", ["json", "particionado", "diario"])
+def test_releer_no_devuelve_lo_modificado_en_memoria(almacen, unidades, backend):
+    storage = almacen(backend)
+    inicial, ids = calendario_de_prueba(pedidos=6)
+    storage.save_calendar(inicial)
+
+    calendar = storage.load_calendar()
+    eliminar_pedido(calendar, unidades, ids[0], cambios=[])
+    agregar_pedido(calendar, unidades, "Sin guardar", "Torton", INICIO, 2, permitir_sobrecupo=True)
+
+    assert _por_dia(storage._leer_calendario()) == _por_dia(inicial)
+
+
+def test_hilos_que_escriben_con_el_candado_no_pierden_pedidos(almacen, unidades):
+    storage = almacen("json")
+    storage.save_calendar({})
+
+    def _sesion(numero):
+        for _ in range(10):
+            with storage.escritura_calendario:
+                calendar = storage.load_calendar()
+                indices = storage.obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario)
+                cambios = []
+                agregar_pedido(calendar, unidades, f"Sesión {numero}", "Torton", INICIO, 2, indices, cambios,
+                               permitir_sobrecupo=True)
+                storage.save_calendar(calendar, cambios)
+
+    hilos = [threading.Thread(target=_sesion, args=(numero,)) for numero in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    entregas = [evento for evento in storage.load_calendar()[INICIO.isoformat()]
+                if evento["tipo_evento"] == "entrega"]
+    assert len(entregas) == 40
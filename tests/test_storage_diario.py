@@ -0,0 +1,77 @@
+import json
+import os
+
+from utils import storage_diario
+from utils.calendar_logic import agregar_pedido, eliminar_pedido
+
+from conftest import INICIO, calendario_de_prueba
+
+
+def _foto():
+    with open(storage_diario.CALENDAR_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _lineas():
+    with open(storage_diario.DIARIO_PATH, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_cambios_van_al_registro_y_se_reaplican_sobre_la_foto(almacen, unidades):
+    storage = almacen("diario")
+    inicial, ids = calendario_de_prueba(pedidos=6)
+    storage.save_calendar(inicial)
+    assert _foto() == inicial and _lineas() == []
+
+    calendar = storage.load_calendar()
+    cambios = []
+    agregar_pedido(calendar, unidades, "Nuevo", "Torton", INICIO, 2, cambios=cambios, permitir_sobrecupo=True)
+    eliminar_pedido(calendar, unidades, ids[0], cambios=cambios)
+    storage.save_calendar(calendar, cambios)
+
+    assert _foto() == inicial
+    assert [json.loads(linea) for linea in _lineas()] == cambios
+    assert storage_diario.load_calendar() == calendar
+
+
+def test_compacta_al_llegar_al_umbral(almacen, unidades, monkeypatch):
+    monkeypatch.setattr(storage_diario, "UMBRAL_COMPACTACION", 4)
+    storage = almacen("diario")
+    storage.save_calendar({})
+
+    for cliente in ["Ácme", "Beta"]:
+        calendar = storage.load_calendar()
+        cambios = []
+        agregar_pedido(calendar, unidades, cliente, "Torton", INICIO, 2, cambios=cambios, permitir_sobrecupo=True)
+        storage.save_calendar(calendar, cambios)
+    # Dos pedidos son cuatro líneas (entrega y retorno): se consolidan en la foto
+    assert _lineas() == []
+    assert _foto() == calendar
+    assert storage.load_calendar() == calendar
+
+
+def test_linea_cortada_se_descarta_y_no_se_pega_a_la_siguiente(almacen, unidades):
+    storage = almacen("diario")
+    storage.save_calendar({})
+    with open(storage_diario.DIARIO_PATH, "a", encoding="utf-8") as f:
+        f.write('{"op":"insertar","fecha":"2025-01-06","eve')
+
+    assert storage_diario.load_calendar() == {}
+    calendar, cambios = {}, []
+    agregar_pedido(calendar, unidades, "Ácme", "Torton", INICIO, 1, cambios=cambios, permitir_sobrecupo=True)
+    storage_diario.save_calendar(calendar, cambios)
+
+    assert len(_lineas()) == 1 + len(cambios)
+    assert storage_diario.load_calendar() == calendar
+
+
+def test_compactar_sin_datos_conserva_lo_registrado(almacen, unidades):
+    storage = almacen("diario")
+    storage.save_calendar({})
+    calendar, cambios = {}, []
+    agregar_pedido(calendar, unidades, "Ácme", "Torton", INICIO, 3, cambios=cambios, permitir_sobrecupo=True)
+    storage_diario.save_calendar(calendar, cambios)
+
+    storage_diario.compactar()
+    assert _foto() == calendar
+    assert os.path.getsize(storage_diario.DIARIO_PATH) == 0
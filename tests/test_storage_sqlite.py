@@ -0,0 +1,65 @@
+import json
+
+import pandas as pd
+
+from utils import storage_sqlite
+from utils.calendar_logic import agregar_pedido, editar_dias_retorno, eliminar_pedido
+
+from conftest import INICIO, calendario_de_prueba
+
+
+def test_unidades(almacen):
+    storage = almacen("sqlite")
+    assert storage.load_units() == storage_sqlite.UNIDADES_INICIALES
+
+    storage.save_units({"Torton": 4, "Tráiler 53": 1})
+    assert storage.load_units()["Torton"] == 4
+
+
+def test_cambios_fila_por_fila_y_consultas_por_fecha(almacen, unidades):
+    storage = almacen("sqlite")
+    calendar, ids = calendario_de_prueba(pedidos=6)
+    storage.save_calendar(calendar)
+
+    calendar = storage.load_calendar()
+    cambios = []
+    agregar_pedido(calendar, unidades, "Nuevo", "Torton", INICIO, 2, cambios=cambios, permitir_sobrecupo=True)
+    eliminar_pedido(calendar, unidades, ids[0], cambios=cambios)
+    editar_dias_retorno(calendar, unidades, ids[1], 4, cambios=cambios)
+    storage.save_calendar(calendar, cambios)
+    assert storage_sqlite.version_calendario() == 2
+
+    guardado = storage_sqlite.load_calendar()
+    assert guardado == {fecha: calendar[fecha] for fecha in sorted(calendar)}
+    assert storage_sqlite.load_calendar_rango("2025-01-07", "2025-01-08") == \
+        {fecha: eventos for fecha, eventos in guardado.items() if "2025-01-07" <= fecha <= "2025-01-08"}
+    assert list(storage_sqlite.iterar_dias("2025-01-08")) == \
+        [(fecha, eventos) for fecha, eventos in guardado.items() if fecha >= "2025-01-08"]
+
+
+def test_pedidos_excel(almacen):
+    storage = almacen("sqlite")
+    df = pd.DataFrame({"Cliente": ["Ácme", "Beta"], "Días Retorno": [2, 3]})
+    storage.save_pedidos_excel(df)
+
+    cargado = storage.load_pedidos_excel()
+    assert cargado["Cliente"].tolist() == ["Ácme", "Beta"]
+    assert cargado["Días Retorno"].tolist() == [2, 3]
+    storage.delete_pedidos_excel()
+    assert storage_sqlite.load_pedidos_excel().empty
+
+
+def test_importar_desde_json(almacen):
+    almacen("sqlite")
+    calendar, _ = calendario_de_prueba(pedidos=4)
+    with open("data/units.json", "w", encoding="utf-8") as f:
+        json.dump({"Torton": 2}, f)
+    with open("data/calendar.json", "w", encoding="utf-8") as f:
+        json.dump(calendar, f)
+    with open("data/pedidos_excel_guardados.json", "w", encoding="utf-8") as f:
+        json.dump([{"Cliente": "Ácme", "Días Retorno": 2}], f)
+
+    resumen = storage_sqlite.importar_desde_json("data/units.json", "data/calendar.json",
+                                                 "data/pedidos_excel_guardados.json")
+    assert resumen == {"unidades": 1, "eventos": 8, "pedidos_excel": 1}
+    assert storage_sqlite.load_calendar() == {fecha: calendar[fecha] for fecha in sorted(calendar)}
@@ -0,0 +1,290 @@
+import heapq
+from datetime import date, timedelta
+
+from utils.eventos import dias_retorno_de, fecha_a_ordinal
+
+# --- Analítica de uso por unidad y por cliente ---
+# Agregados diarios que se mantienen al día con cada alta, baja o edición (es otro miembro
+# de IndicesCalendario): cargas, retornos, unidades fuera (de la carga al día anterior al
+# retorno, como la capacidad) y días de retorno configurados y reales (con el ajuste de sábado).
+# Cada métrica es un árbol de Fenwick sobre los días, así que tanto el cambio de un pedido
+# como el total de cualquier rango de fechas cuestan O(log días), sin importar lo largo del rango.
+
+ORIGEN = date(2000, 1, 1).toordinal()
+TAMANO = 1 << 16  # días cubiertos desde ORIGEN (hasta 2179); los eventos fuera se ignoran
+
+
+class Fenwick:
+    """Árbol de Fenwick disperso (solo guarda los nodos tocados): suma en un punto y de un prefijo."""
+
+    __slots__ = ("_arbol",)
+
+    def __init__(self):
+        self._arbol = {}
+
+    @classmethod
+    def desde_puntos(cls, puntos):
+        """Árbol con los valores {posición: valor}, armado de abajo hacia arriba sin una suma por punto."""
+        fenwick = cls()
+        arbol = fenwick._arbol
+        for posicion, valor in puntos.items():
+            if valor and posicion < TAMANO:
+                arbol[posicion + 1] = valor
+        # Cada nodo ya tiene su valor completo cuando sale de la cola (sus hijos son menores)
+        cola = list(arbol)
+        heapq.heapify(cola)
+        while cola:
+            i = heapq.heappop(cola)
+            padre = i + (i & -i)
+            if padre <= TAMANO:
+                if padre not in arbol:
+                    arbol[padre] = 0
+                    heapq.heappush(cola, padre)
+                arbol[padre] += arbol[i]
+        return fenwick
+
+    def sumar(self, posicion, valor):
+        arbol = self._arbol
+        i = posicion + 1
+        while i <= TAMANO:
+            arbol[i] = arbol.get(i, 0) + valor
+            i += i & -i
+
+    def prefijo(self, posicion):
+        """Suma de las posiciones [0, posicion)."""
+        arbol = self._arbol
+        total = 0
+        i = posicion
+        while i > 0:
+            total += arbol.get(i, 0)
+            i -= i & -i
+        return total
+
+
+class FenwickRango:
+    """Suma de un valor a todo un rango y suma de un rango, con dos árboles de Fenwick."""
+
+    __slots__ = ("_pendientes", "_ponderados")
+
+    def __init__(self, pendientes=None, ponderados=None):
+        self._pendientes = pendientes or Fenwick()
+        self._ponderados = ponderados or Fenwick()
+
+    @classmethod
+    def desde_diferencias(cls, diferencias):
+        """`diferencias` {posición: cambio} como en un arreglo de diferencias (+v al inicio, -v al fin)."""
+        return cls(Fenwick.desde_puntos(diferencias),
+                   Fenwick.desde_puntos({i: valor * i for i, valor in diferencias.items()}))
+
+    def sumar_rango(self, desde, hasta, valor):
+        """Suma `valor` a cada posición de [desde, hasta)."""
+        self._pendientes.sumar(desde, valor)
+        self._pendientes.sumar(hasta, -valor)
+        self._ponderados.sumar(desde, valor * desde)
+        self._ponderados.sumar(hasta, -valor * hasta)
+
+    def prefijo(self, posicion):
+        """Suma de los valores de las posiciones [0, posicion)."""
+        return self._pendientes.prefijo(posicion) * posicion - self._ponderados.prefijo(posicion)
+
+
+class Serie:
+    """Métricas diarias de una unidad o de un cliente."""
+
+    __slots__ = ("cargas", "retornos", "dias_configurados", "dias_reales", "fuera")
+
+    def __init__(self, cargas=None, retornos=None, dias_configurados=None, dias_reales=None, fuera=None):
+        self.cargas = cargas or Fenwick()
+        self.retornos = retornos or Fenwick()
+        self.dias_configurados = dias_configurados or Fenwick()  # sumados en el día de carga
+        self.dias_reales = dias_reales or Fenwick()
+        self.fuera = fuera or FenwickRango()  # unidades fuera por día
+
+    def totales(self, desde, hasta):
+        """Totales de las posiciones [desde, hasta)."""
+        return {
+            "cargas": self.cargas.prefijo(hasta) - self.cargas.prefijo(desde),
+            "retornos": self.retornos.prefijo(hasta) - self.retornos.prefijo(desde),
+            "dias_configurados": self.dias_configurados.prefijo(hasta) - self.dias_configurados.prefijo(desde),
+            "dias_reales": self.dias_reales.prefijo(hasta) - self.dias_reales.prefijo(desde),
+            "dias_unidad": self.fuera.prefijo(hasta) - self.fuera.prefijo(desde),
+        }
+
+
+def _entrega(evento):
+    """(unidad, cliente, posición de carga, posición de retorno, días configurados, días reales) o None."""
+    try:
+        inicio = fecha_a_ordinal(evento["fecha_pedido"]) - ORIGEN
+        reales = int(dias_retorno_de(evento))
+        configurados = int(evento["dias_retorno"])
+        unidad = evento["unidad"]
+    except (KeyError, TypeError, ValueError):
+        return None
+    fin = inicio + max(reales, 0)
+    if unidad is None or inicio < 0 or fin > TAMANO:
+        return None
+    return unidad, evento.get("cliente"), inicio, fin, configurados, reales
+
+
+def _retorno(fecha_str, evento):
+    """(unidad, cliente, posición del día) o None."""
+    try:
+        dia = fecha_a_ordinal(fecha_str) - ORIGEN
+    except (TypeError, ValueError):
+        return None
+    if evento.get("unidad") is None or not 0 <= dia < TAMANO:
+        return None
+    return evento["unidad"], evento.get("cliente_asociado"), dia
+
+
+class AnaliticaUso:
+    """
+    Agregados por unidad (`unidades`) y por cliente (`clientes`). Se arma la primera vez que
+    se consulta, a partir del calendario con el que se creó; desde entonces los ganchos
+    al_insertar/al_quitar/al_actualizar de IndicesCalendario lo mantienen al día.
+    """
+
+    def __init__(self, calendar=None):
+        self._calendar = calendar
+        self._armada = calendar is None
+        self.unidades = {}  # nombre -> Serie
+        self.clientes = {}
+
+    @classmethod
+    def desde_calendario(cls, calendar):
+        return cls(calendar)
+
+    def _armar(self):
+        if self._armada:
+            return
+        self._armada = True
+        puntos = {}  # (por, clave) -> {métrica: {posición: valor}}
+
+        def _sumar(por, clave, metrica, posicion, valor):
+            metricas = puntos.setdefault((por, clave), {})
+            valores = metricas.setdefault(metrica, {})
+            valores[posicion] = valores.get(posicion, 0) + valor
+
+        for fecha_str, eventos in self._calendar.items():
+            for evento in eventos:
+                if evento.get("tipo_evento") == "entrega":
+                    datos = _entrega(evento)
+                    if datos is None:
+                        continue
+                    unidad, cliente, inicio, fin, configurados, reales = datos
+                    for por, clave in (("unidad", unidad), ("cliente", cliente)):
+                        if clave is None:
+                            continue
+                        _sumar(por, clave, "cargas", inicio, 1)
+                        _sumar(por, clave, "dias_configurados", inicio, configurados)
+                        _sumar(por, clave, "dias_reales", inicio, reales)
+                        if fin > inicio:
+                            _sumar(por, clave, "fuera", inicio, 1)
+                            _sumar(por, clave, "fuera", fin, -1)
+                elif evento.get("tipo_evento") == "retorno":
+                    datos = _retorno(fecha_str, evento)
+                    if datos is None:
+                        continue
+                    unidad, cliente, dia = datos
+                    for por, clave in (("unidad", unidad), ("cliente", cliente)):
+                        if clave is not None:
+                            _sumar(por, clave, "retornos", dia, 1)
+
+        for (por, clave), metricas in puntos.items():
+            serie = Serie(**{metrica: Fenwick.desde_puntos(metricas[metrica])
+                             for metrica in ("cargas", "retornos", "dias_configurados", "dias_reales")
+                             if metrica in metricas},
+                          fuera=FenwickRango.desde_diferencias(metricas.get("fuera", {})))
+            (self.unidades if por == "unidad" else self.clientes)[clave] = serie
+        self._calendar = None
+
+    def _series(self, unidad, cliente):
+        if unidad is not None:
+            yield self.unidades.setdefault(unidad, Serie())
+        if cliente is not None:
+            yield self.clientes.setdefault(cliente, Serie())
+
+    def _cambiar(self, fecha_str, evento, signo):
+        if not self._armada:
+            return  # al armarse se leerá el calendario ya con este cambio
+        if evento.get("tipo_evento") == "entrega":
+            datos = _entrega(evento)
+            if datos is None:
+                return
+            unidad, cliente, inicio, fin, configurados, reales = datos
+            for serie in self._series(unidad, cliente):
+                serie.cargas.sumar(inicio, signo)
+                serie.dias_configurados.sumar(inicio, signo * configurados)
+                serie.dias_reales.sumar(inicio, signo * reales)
+                if fin > inicio:
+                    serie.fuera.sumar_rango(inicio, fin, signo)
+        elif evento.get("tipo_evento") == "retorno":
+            datos = _retorno(fecha_str, evento)
+            if datos is None:
+                return
+            unidad, cliente, dia = datos
+            for serie in self._series(unidad, cliente):
+                serie.retornos.sumar(dia, signo)
+
+    def al_insertar(self, fecha_str, pos, evento):
+        self._cambiar(fecha_str, evento, 1)
+
+    def al_quitar(self, fecha_str, pos, evento, eventos_restantes):
+        self._cambiar(fecha_str, evento, -1)
+
+    def al_actualizar(self, fecha_str, pos, anterior, evento):
+        self._cambiar(fecha_str, anterior, -1)
+        self._cambiar(fecha_str, evento, 1)
+
+    # --- Consultas: `desde` y `hasta` son fechas incluidas; cada total cuesta O(log días) ---
+    def resumen(self, desde, hasta, por="unidad", units=None):
+        """
+        Una fila por unidad (por="unidad") o por cliente (por="cliente") con lo de [desde, hasta]:
+        cargas, retornos, días-unidad fuera, unidades fuera en promedio por día, promedios de días
+        de retorno configurados y reales de lo cargado en el rango y, por unidad con `units`,
+        utilización % contra la base configurada.
+        """
+        self._armar()
+        inicio, fin = desde.toordinal() - ORIGEN, hasta.toordinal() - ORIGEN + 1
+        dias = max(fin - inicio, 1)
+        filas = []
+        for clave, serie in (self.unidades if por == "unidad" else self.clientes).items():
+            totales = serie.totales(inicio, fin)
+            if not any(totales.values()):
+                continue
+            fila = {
+                "clave": clave,
+                "cargas": totales["cargas"],
+                "retornos": totales["retornos"],
+                "dias_unidad": totales["dias_unidad"],
+                "fuera_promedio": totales["dias_unidad"] / dias,
+                "dias_configurados_promedio": totales["dias_configurados"] / totales["cargas"] if totales["cargas"] else None,
+                "dias_reales_promedio": totales["dias_reales"] / totales["cargas"] if totales["cargas"] else None,
+            }
+            if por == "unidad" and units is not None:
+                base = units.get(clave, 0)
+                fila["utilizacion"] = 100 * totales["dias_unidad"] / (base * dias) if base else None
+            filas.append(fila)
+        return filas
+
+    def serie(self, clave, desde, hasta, paso=1, por="unidad", units=None):
+        """
+        Totales de `clave` en tramos de `paso` días entre `desde` y `hasta` (p. ej. paso=7 por
+        semana): una fila por tramo con "desde", cargas, retornos, fuera_promedio y utilización.
+        """
+        self._armar()
+        serie = (self.unidades if por == "unidad" else self.clientes).get(clave, Serie())
+        base = units.get(clave, 0) if units is not None and por == "unidad" else 0
+        filas = []
+        dia = desde
+        while dia <= hasta:
+            ultimo = min(dia + timedelta(days=paso - 1), hasta)
+            inicio, fin = dia.toordinal() - ORIGEN, ultimo.toordinal() - ORIGEN + 1
+            totales = serie.totales(inicio, fin)
+            fila = {"desde": dia, "cargas": totales["cargas"], "retornos": totales["retornos"],
+                    "fuera_promedio": totales["dias_unidad"] / (fin - inicio)}
+            if base:
+                fila["utilizacion"] = 100 * totales["dias_unidad"] / (base * (fin - inicio))
+            filas.append(fila)
+            dia = ultimo + timedelta(days=1)
+        return filas
@@ -0,0 +1,61 @@
+import contextlib
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def escribir_json_atomico(path, data, indent=2):
+    """
+    Escribe `data` como JSON en un archivo temporal del mismo directorio, lo sincroniza
+    a disco y lo renombra sobre `path`. Un corte a mitad de escritura deja intacto el
+    archivo anterior en lugar de uno truncado.
+    """
+    dir_name = os.path.dirname(path) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=dir_name)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def bloqueo(path, compartido=False):
+    """
+    Candado entre procesos (y entre hilos) sobre el archivo `path`, que se crea vacío si
+    no existe. `compartido=True` permite varios lectores a la vez; el exclusivo espera a
+    que no quede nadie. En Windows todos los candados son exclusivos.
+    """
+    dir_name = os.path.dirname(path) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if compartido else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK se rinde tras ~10 s; se sigue esperando
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,110 @@
+import bisect
+
+from utils.modelo import CalendarioModelo
+from utils.texto import normalizar_texto
+
+# --- Índice de búsqueda de clientes ---
+# Se arma una vez por versión de los datos sobre los clientes distintos (no por fila):
+#   - claves normalizadas ordenadas, para encontrar por prefijo con bisect;
+#   - palabras de cada cliente ordenadas, para "cancun" -> "PDS Cancún";
+#   - trigramas, para tolerar errores de dedo ("plastizaro" -> "Plastisaro").
+# Puntaje: exacto 3, prefijo del nombre 2, prefijo de una palabra 1.5, parecido por
+# trigramas su coeficiente de Dice (0 a 1). El parecido también desempata dentro de cada nivel.
+
+UMBRAL_PARECIDO = 0.35
+
+
+def _trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _rango_prefijo(ordenadas, prefijo):
+    """Posiciones [inicio, fin) de las entradas de `ordenadas` que empiezan con `prefijo`."""
+    inicio = bisect.bisect_left(ordenadas, (prefijo,))
+    fin = bisect.bisect_left(ordenadas, (prefijo + "\U0010ffff",))
+    return inicio, fin
+
+
+class IndiceClientes:
+    """
+    Índice sobre una lista de nombres de cliente. `buscar` devuelve las posiciones de esa
+    lista (p. ej. códigos de categoría) ordenadas por puntaje.
+    """
+
+    def __init__(self, nombres, normalizados=None):
+        self.nombres = list(nombres)
+        self.normalizados = [str(n) for n in normalizados] if normalizados is not None \
+            else [normalizar_texto(nombre) for nombre in self.nombres]
+        self._claves = sorted((clave, i) for i, clave in enumerate(self.normalizados))
+        self._palabras = sorted((palabra, i) for i, clave in enumerate(self.normalizados) for palabra in clave.split())
+        self._trigramas = {}
+        self._cantidad_trigramas = []
+        for i, clave in enumerate(self.normalizados):
+            gramas = _trigramas(clave)
+            self._cantidad_trigramas.append(len(gramas))
+            for grama in gramas:
+                self._trigramas.setdefault(grama, []).append(i)
+        self.pedidos = None  # uso opcional: ids de pedido por posición (ver desde_calendario)
+
+    @classmethod
+    def desde_calendario(cls, calendar):
+        """
+        Índice sobre los clientes del calendario, con los ids de pedido de cada uno
+        (de entregas y de retornos), para ubicar sus eventos sin recorrer las fechas.
+        Acepta el calendario JSON o un `CalendarioModelo` ya construido.
+        """
+        modelo = calendar if isinstance(calendar, CalendarioModelo) else CalendarioModelo.desde_json(calendar)
+        indice = cls(modelo.clientes.nombres)
+        indice.pedidos = [[] for _ in indice.nombres]
+        for entrega in modelo.entregas():
+            if entrega.cliente is not None and entrega.id is not None:
+                indice.pedidos[entrega.cliente].append(entrega.id)
+        for _, retorno in modelo.retornos():
+            if retorno.cliente is not None and retorno.id_entrega is not None:
+                indice.pedidos[retorno.cliente].append(retorno.id_entrega)
+        return indice
+
+    def _parecidos(self, consulta):
+        gramas = _trigramas(consulta)
+        comunes = {}
+        for grama in gramas:
+            for i in self._trigramas.get(grama, ()):
+                comunes[i] = comunes.get(i, 0) + 1
+        return {i: 2 * n / (len(gramas) + self._cantidad_trigramas[i]) for i, n in comunes.items()}
+
+    def buscar(self, consulta, limite=None, umbral=UMBRAL_PARECIDO):
+        """Lista de (posición, puntaje) de los clientes que coinciden con `consulta`, de mejor a peor."""
+        consulta = normalizar_texto(consulta)
+        if not consulta:
+            return []
+
+        puntajes = {}
+        inicio, fin = _rango_prefijo(self._claves, consulta)
+        for clave, i in self._claves[inicio:fin]:
+            puntajes[i] = 3.0 if clave == consulta else 2.0
+        primera_palabra = consulta.split()[0]
+        inicio, fin = _rango_prefijo(self._palabras, primera_palabra)
+        for _, i in self._palabras[inicio:fin]:
+            if consulta in self.normalizados[i]:
+                puntajes[i] = max(puntajes.get(i, 0), 1.5)
+
+        parecidos = self._parecidos(consulta) if len(consulta) >= 3 else {}
+        for i, parecido in parecidos.items():
+            if i in puntajes:
+                puntajes[i] += parecido / 10
+            elif parecido >= umbral:
+                puntajes[i] = parecido
+
+        resultados = sorted(puntajes.items(), key=lambda par: (-par[1], self.normalizados[par[0]]))
+        return resultados[:limite] if limite else resultados
+
+    def buscar_nombres(self, consulta, limite=None, umbral=UMBRAL_PARECIDO):
+        return [self.nombres[i] for i, _ in self.buscar(consulta, limite, umbral)]
+
+    def pedidos_de(self, consulta, umbral=UMBRAL_PARECIDO):
+        """Ids de pedido de los clientes que coinciden (requiere un índice `desde_calendario`)."""
+        ids = []
+        for i, _ in self.buscar(consulta, umbral=umbral):
+            ids.extend(self.pedidos[i])
+        return ids
@@ -1,17 +1,91 @@
+import uuid
 from datetime import datetime, timedelta
 
-def agregar_pedido(calendar, units, cliente, unidad, fecha_pedido, dias_retorno):
-    fecha_str = fecha_pedido.strftime("%Y-%m-%d")
+from utils.cambios import cambio_insertar, cambio_quitar, cambio_actualizar
+from utils.diagnostico import medido
+from utils.indices import IndiceTransito, IndicesCalendario
 
-    # Generar un ID único para el pedido (útil para eliminar)
-    pedido_id = f"{cliente}-{unidad}-{fecha_pedido.strftime('%Y%m%d%H%M%S')}"
 
+# --- Primitivas sobre el calendario: mantienen los índices al día y anotan los cambios ---
+def _insertar_evento(calendar, fecha_str, evento, indices, cambios):
+    eventos = calendar.setdefault(fecha_str, [])
+    eventos.append(evento)
+    if indices is not None:
+        indices.al_insertar(fecha_str, len(eventos) - 1, evento)
+    if cambios is not None:
+        cambios.append(cambio_insertar(fecha_str, evento))
+
+
+def _quitar_evento(calendar, fecha_str, pos, indices, cambios):
+    eventos = calendar[fecha_str]
+    evento = eventos.pop(pos)
+    if indices is not None:
+        indices.al_quitar(fecha_str, pos, evento, eventos)
+    if not eventos:
+        del calendar[fecha_str]
+    if cambios is not None:
+        cambios.append(cambio_quitar(fecha_str, evento))
+    return evento
+
+
+def _indices_o_construir(calendar, indices):
+    # Sin índice persistente se arma uno al vuelo (equivale al recorrido de antes)
+    if indices is None:
+        return IndicesCalendario.desde_calendario(calendar)
+    return indices
+
+
+def calcular_dias_retorno(fecha_pedido, dias_retorno):
+    """Días de retorno efectivos: una carga en sábado con retorno de 2 días o menos suma un día."""
     # --- INICIO: Lógica para ajustar días de retorno si la carga es en sábado y dias_retorno <= 2 ---
     dias_retorno_ajustados = dias_retorno
     if dias_retorno <= 2:
         if fecha_pedido.weekday() == 5:  # Sábado
             dias_retorno_ajustados += 1
     # --- FIN: Lógica para ajustar días de retorno si la carga es en sábado y dias_retorno <= 2 ---
+    return dias_retorno_ajustados
+
+
+@medido("calendar_logic.verificar_capacidad")
+def verificar_capacidad(calendar, units, unidad, fecha_pedido, dias_retorno, indices=None, cantidad=1):
+    """
+    Comprueba que queden `cantidad` unidades libres de `unidad` todos los días que
+    duraría el viaje (de la carga al día anterior al retorno), contra la base de `units`.
+    Consulta el árbol de capacidad de los índices: O(log días), sin recorrer el calendario.
+    """
+    indices = _indices_o_construir(calendar, indices)
+    inicio = fecha_pedido.toordinal()
+    fin = inicio + max(calcular_dias_retorno(fecha_pedido, dias_retorno), 1)
+
+    dia_sin_unidades = indices.capacidad.primer_dia_sin_unidades(units, unidad, inicio, fin, cantidad)
+    if dia_sin_unidades is None:
+        return True, f"Hay unidades {unidad} disponibles para todo el viaje."
+    libres = indices.capacidad.disponibles_minimas(units, unidad, inicio, fin)
+    return False, (f"Sobrecupo: no hay {unidad} disponibles el {dia_sin_unidades.strftime('%d/%m/%Y')} "
+                   f"(quedarían {libres - cantidad} de {units.get(unidad, 0)}).")
+
+
+@medido("calendar_logic.agregar_pedido")
+def agregar_pedido(calendar, units, cliente, unidad, fecha_pedido, dias_retorno, indices=None, cambios=None,
+                   permitir_sobrecupo=False):
+    """
+    Registra la entrega y su retorno. Si se pasa una lista `cambios`, se le agregan
+    los eventos insertados para que el almacenamiento guarde solo eso.
+    Rechaza el pedido si deja a la unidad sin disponibles algún día del viaje,
+    salvo que se indique `permitir_sobrecupo`.
+    """
+    if not permitir_sobrecupo:
+        indices = _indices_o_construir(calendar, indices)
+        ok, mensaje = verificar_capacidad(calendar, units, unidad, fecha_pedido, dias_retorno, indices)
+        if not ok:
+            return False, mensaje
+
+    fecha_str = fecha_pedido.strftime("%Y-%m-%d")
+
+    # Generar un ID único para el pedido (útil para eliminar)
+    pedido_id = str(uuid.uuid4())
+
+    dias_retorno_ajustados = calcular_dias_retorno(fecha_pedido, dias_retorno)
 
     # Registrar el pedido de ENTREGA (o carga)
     pedido = {
@@ -24,103 +98,148 @@ def agregar_pedido(calendar, units, cliente, unidad, fecha_pedido, dias_retorno)
         "tipo_evento": "entrega"
     }
 
-    calendar.setdefault(fecha_str, []).append(pedido)
+    _insertar_evento(calendar, fecha_str, pedido, indices, cambios)
 
     # Calcular y registrar retorno usando los días ajustados
     fecha_retorno = fecha_pedido + timedelta(days=dias_retorno_ajustados)
     retorno_str = fecha_retorno.strftime("%Y-%m-%d")
-    calendar.setdefault(retorno_str, []).append({
+    _insertar_evento(calendar, retorno_str, {
         "id": f"retorno-{pedido_id}",
         "tipo_evento": "retorno",
         "unidad": unidad,
-        "pedido_id_asociado": pedido_id,
+        "id_entrega_asociada": pedido_id,
         "cliente_asociado": cliente,
         "fecha_pedido_asociado": fecha_str
-    })
+    }, indices, cambios)
 
     return True, f"Pedido registrado para {cliente} con unidad {unidad}. Retorno en {dias_retorno_ajustados} días."
 
 
-def eliminar_pedido(calendar, units, pedido_id_a_eliminar):
+@medido("calendar_logic.agregar_pedidos")
+def agregar_pedidos(calendar, units, pedidos, indices=None, cambios=None, permitir_sobrecupo=False):
+    """
+    Registra varios pedidos de una vez. `pedidos` es una lista de diccionarios con
+    "cliente", "unidad", "fecha_pedido" (date) y "dias_retorno". Cada pedido pasa la
+    misma revisión de capacidad que `agregar_pedido`, contando los ya aceptados del lote.
+    Todos los cambios quedan en `cambios` para guardarlos con un solo save_calendar.
+
+    Devuelve un reporte por pedido: {"fila", "cliente", "unidad", "ok", "mensaje", "id"},
+    con el id del pedido registrado (None si no se registró).
+    """
+    indices = _indices_o_construir(calendar, indices)
+    reporte = []
+    for fila, pedido in enumerate(pedidos):
+        insertados = []
+        try:
+            ok, mensaje = agregar_pedido(
+                calendar, units, pedido["cliente"], pedido["unidad"], pedido["fecha_pedido"],
+                int(pedido["dias_retorno"]), indices=indices, cambios=insertados,
+                permitir_sobrecupo=permitir_sobrecupo
+            )
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            ok, mensaje = False, f"Pedido inválido: {e}"
+        if cambios is not None:
+            cambios.extend(insertados)
+        reporte.append({
+            "fila": pedido.get("fila", fila),
+            "cliente": pedido.get("cliente"),
+            "unidad": pedido.get("unidad"),
+            "ok": ok,
+            "mensaje": mensaje,
+            "id": insertados[0]["evento"]["id"] if insertados else None
+        })
+    return reporte
+
+
+@medido("calendar_logic.eliminar_pedido")
+def eliminar_pedido(calendar, units, pedido_id_a_eliminar, indices=None, cambios=None):
     """
     Elimina un pedido y su evento de retorno asociado del calendario.
+    Usa el índice de pedidos para ir directo a las fechas y posiciones afectadas.
     """
-    unidad_liberada = None
-    pedido_encontrado = False
-
-    for fecha_str, eventos in list(calendar.items()):
-        eventos_filtrados = []
-        for evento in eventos:
-            if evento.get("id") == pedido_id_a_eliminar and evento.get("tipo_evento") == "entrega":
-                unidad_liberada = evento["unidad"]
-                pedido_encontrado = True
-            elif evento.get("tipo_evento") == "retorno" and evento.get("pedido_id_asociado") == pedido_id_a_eliminar:
-                pass
-            else:
-                eventos_filtrados.append(evento)
-
-        calendar[fecha_str] = eventos_filtrados
-
-        if not calendar[fecha_str]:
-            del calendar[fecha_str]
-
-    if pedido_encontrado and unidad_liberada:
+    indices = _indices_o_construir(calendar, indices)
+
+    # Los retornos se quitan aunque la entrega ya no exista (retornos huérfanos)
+    while indices.pedidos.retornos(pedido_id_a_eliminar):
+        _quitar_evento(calendar, *indices.pedidos.retornos(pedido_id_a_eliminar)[-1], indices, cambios)
+
+    ubicacion = indices.pedidos.entrega(pedido_id_a_eliminar)
+    if ubicacion:
+        _quitar_evento(calendar, *ubicacion, indices, cambios)
         return True, f"Pedido {pedido_id_a_eliminar} y su retorno eliminados."
     else:
         return False, f"Pedido {pedido_id_a_eliminar} no encontrado o ya eliminado."
 
 
-def editar_dias_retorno(calendar, units, pedido_id_a_editar, nuevos_dias_retorno):
+@medido("calendar_logic.editar_dias_retorno")
+def editar_dias_retorno(calendar, units, pedido_id_a_editar, nuevos_dias_retorno, indices=None, cambios=None):
     """
     Edita los días de retorno de un pedido, ajusta su evento de retorno en el calendario.
     """
-    pedido_original = None
-    for fecha_str, eventos in calendar.items():
-        for evento in eventos:
-            if evento.get("id") == pedido_id_a_editar and evento.get("tipo_evento") == "entrega":
-                pedido_original = evento
-                break
-        if pedido_original:
-            break
-
-    if not pedido_original:
+    indices = _indices_o_construir(calendar, indices)
+
+    ubicacion = indices.pedidos.entrega(pedido_id_a_editar)
+    if not ubicacion:
         return False, f"Pedido {pedido_id_a_editar} no encontrado para editar."
+    fecha_entrega_str, pos_entrega = ubicacion
+    pedido_original = calendar[fecha_entrega_str][pos_entrega]
 
     fecha_carga_dt = datetime.strptime(pedido_original["fecha_pedido"], "%Y-%m-%d").date()
-    antiguos_dias_calculados = pedido_original.get("dias_retorno_calculados", pedido_original["dias_retorno"])
-    antigua_fecha_retorno_str = (fecha_carga_dt + timedelta(days=antiguos_dias_calculados)).strftime("%Y-%m-%d")
 
-    if antigua_fecha_retorno_str in calendar:
-        calendar[antigua_fecha_retorno_str] = [
-            e for e in calendar[antigua_fecha_retorno_str]
-            if not (e.get("tipo_evento") == "retorno" and e.get("pedido_id_asociado") == pedido_id_a_editar)
-        ]
-        if not calendar[antigua_fecha_retorno_str]:
-            del calendar[antigua_fecha_retorno_str]
+    # Quitar el retorno anterior, sin importar con qué clave quedó asociado
+    retorno_anterior = None
+    while indices.pedidos.retornos(pedido_id_a_editar):
+        retorno_anterior = _quitar_evento(calendar, *indices.pedidos.retornos(pedido_id_a_editar)[-1], indices,
+                                          cambios)
 
+    anterior = dict(pedido_original)
     pedido_original["dias_retorno"] = nuevos_dias_retorno
-    nuevos_dias_retorno_ajustados = nuevos_dias_retorno
-
-    if nuevos_dias_retorno <= 2:
-        if fecha_carga_dt.weekday() == 5:
-            nuevos_dias_retorno_ajustados += 1
+    nuevos_dias_retorno_ajustados = calcular_dias_retorno(fecha_carga_dt, nuevos_dias_retorno)
 
     pedido_original["dias_retorno_calculados"] = nuevos_dias_retorno_ajustados
+    indices.al_actualizar(fecha_entrega_str, pos_entrega, anterior, pedido_original)
+    if cambios is not None:
+        cambios.append(cambio_actualizar(fecha_entrega_str, anterior, pedido_original))
+
     nueva_fecha_retorno = fecha_carga_dt + timedelta(days=nuevos_dias_retorno_ajustados)
     nueva_fecha_retorno_str = nueva_fecha_retorno.strftime("%Y-%m-%d")
 
-    calendar.setdefault(nueva_fecha_retorno_str, []).append({
-        "id": f"retorno-{pedido_original['id']}",
-        "tipo_evento": "retorno",
-        "unidad": pedido_original["unidad"],
-        "pedido_id_asociado": pedido_original["id"],
-        "cliente_asociado": pedido_original["cliente"],
-        "fecha_pedido_asociado": pedido_original["fecha_pedido"]
-    })
+    # Se conserva la forma del retorno original (clave de asociación incluida)
+    if retorno_anterior is not None:
+        nuevo_retorno = dict(retorno_anterior)
+    else:
+        nuevo_retorno = {
+            "id": f"retorno-{pedido_original['id']}",
+            "tipo_evento": "retorno",
+            "unidad": pedido_original["unidad"],
+            "id_entrega_asociada": pedido_original["id"],
+            "cliente_asociado": pedido_original["cliente"],
+            "fecha_pedido_asociado": pedido_original["fecha_pedido"]
+        }
+    _insertar_evento(calendar, nueva_fecha_retorno_str, nuevo_retorno, indices, cambios)
 
     return True, f"Días de retorno para pedido {pedido_id_a_editar} actualizados a {nuevos_dias_retorno} días (calculado: {nuevos_dias_retorno_ajustados} días)."
 
 
+@medido("calendar_logic.unidades_en_transito")
+def unidades_en_transito(calendar, fecha, indice_transito=None, unidad=None):
+    """
+    Devuelve las entregas en tránsito en `fecha` (cargadas antes y con retorno posterior).
+    Si no se pasa un índice ya construido, se arma uno a partir del calendario.
+    """
+    if indice_transito is None:
+        indice_transito = IndiceTransito.desde_calendario(calendar)
+    return indice_transito.en_transito(fecha, unidad)
+
+
+@medido("calendar_logic.fechas_con_transito")
+def fechas_con_transito(calendar, indice_transito=None):
+    """Devuelve las fechas ('YYYY-MM-DD') en las que hay al menos una unidad en tránsito."""
+    if indice_transito is None:
+        indice_transito = IndiceTransito.desde_calendario(calendar)
+    return indice_transito.fechas_con_transito()
+
+
 def actualizar_disponibilidad(calendar, units, fecha_actual):
     # Esta función ahora no tiene funcionalidad, el cálculo se hace en el main.py
     pass
\ No newline at end of file
@@ -0,0 +1,114 @@
+from utils.eventos import id_pedido_de_evento
+
+# Cambios puntuales sobre el calendario. Cada alta, baja o edición de
+# `calendar_logic` se describe como una lista de estos registros para que
+# el almacenamiento escriba solo lo que cambió en lugar de todo el historial.
+#
+#   {"op": "insertar",   "fecha": "YYYY-MM-DD", "evento": {...}}
+#   {"op": "quitar",     "fecha": "YYYY-MM-DD", "evento": {...}}
+#   {"op": "actualizar", "fecha": "YYYY-MM-DD", "anterior": {...}, "evento": {...}}
+
+
+def cambio_insertar(fecha_str, evento):
+    return {"op": "insertar", "fecha": fecha_str, "evento": dict(evento)}
+
+
+def cambio_quitar(fecha_str, evento):
+    return {"op": "quitar", "fecha": fecha_str, "evento": dict(evento)}
+
+
+def cambio_actualizar(fecha_str, anterior, evento):
+    return {"op": "actualizar", "fecha": fecha_str, "anterior": dict(anterior), "evento": dict(evento)}
+
+
+def clave_evento(evento):
+    """
+    Identifica un evento dentro de su fecha: (tipo_evento, id del pedido).
+    Los retornos usan el id de su entrega, con cualquiera de las dos claves de asociación.
+    """
+    return evento.get("tipo_evento"), id_pedido_de_evento(evento)
+
+
+def _posicion(eventos, evento):
+    clave = clave_evento(evento)
+    for pos, existente in enumerate(eventos):
+        if clave[1] is not None and clave_evento(existente) == clave:
+            return pos
+        if clave[1] is None and existente == evento:
+            return pos
+    return None
+
+
+def invertir_cambios(cambios):
+    """Cambios que deshacen `cambios`: cada uno invertido, en orden contrario."""
+    inversos = []
+    for cambio in reversed(cambios):
+        if cambio["op"] == "insertar":
+            inversos.append(cambio_quitar(cambio["fecha"], cambio["evento"]))
+        elif cambio["op"] == "quitar":
+            inversos.append(cambio_insertar(cambio["fecha"], cambio["evento"]))
+        else:
+            inversos.append(cambio_actualizar(cambio["fecha"], cambio["evento"], cambio["anterior"]))
+    return inversos
+
+
+def estan_aplicados(calendar, cambios):
+    """
+    True si `calendar` muestra el resultado de `cambios`: cada evento que tocan está (o ya
+    no está) tal como quedó tras el último cambio que lo toca. Solo revisa los días afectados.
+    """
+    finales = {}  # (fecha, clave o contenido) -> (evento esperado o None, evento para ubicarlo)
+    for cambio in cambios:
+        evento = cambio["evento"]
+        clave = clave_evento(evento)
+        llave = (cambio["fecha"], clave if clave[1] is not None else repr(sorted(evento.items())))
+        finales[llave] = (None if cambio["op"] == "quitar" else evento, evento)
+    for (fecha_str, _), (esperado, evento) in finales.items():
+        eventos = calendar.get(fecha_str, [])
+        pos = _posicion(eventos, evento)
+        if esperado is None and pos is not None:
+            return False
+        if esperado is not None and (pos is None or eventos[pos] != esperado):
+            return False
+    return True
+
+
+def aplicar_cambios(calendar, cambios, indices=None):
+    """
+    Reproduce una lista de cambios sobre `calendar` (y sus índices, si se pasan).
+    Un evento que ya existe no se vuelve a insertar y uno a quitar o actualizar que
+    ya no está se ignora, así que volver a aplicar un mismo cambio no duplica nada.
+    """
+    for cambio in cambios:
+        fecha_str = cambio["fecha"]
+        if cambio["op"] == "insertar":
+            if clave_evento(cambio["evento"])[1] is not None and \
+                    _posicion(calendar.get(fecha_str, []), cambio["evento"]) is not None:
+                continue
+            eventos = calendar.setdefault(fecha_str, [])
+            eventos.append(dict(cambio["evento"]))
+            if indices is not None:
+                indices.al_insertar(fecha_str, len(eventos) - 1, eventos[-1])
+            continue
+
+        eventos = calendar.get(fecha_str, [])
+        if cambio["op"] == "quitar":
+            pos = _posicion(eventos, cambio["evento"])
+            if pos is None:
+                continue
+            evento = eventos.pop(pos)
+            if indices is not None:
+                indices.al_quitar(fecha_str, pos, evento, eventos)
+            if not eventos:
+                del calendar[fecha_str]
+        elif cambio["op"] == "actualizar":
+            pos = _posicion(eventos, cambio["anterior"])
+            if pos is None:
+                continue
+            evento = eventos[pos]
+            anterior = dict(evento)
+            evento.clear()
+            evento.update(cambio["evento"])
+            if indices is not None:
+                indices.al_actualizar(fecha_str, pos, anterior, evento)
+    return calendar
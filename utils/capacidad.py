@@ -0,0 +1,180 @@
+from datetime import date
+
+from utils.eventos import fecha_a_ordinal, dias_retorno_de
+from utils.modelo import CalendarioModelo
+
+# Días de margen alrededor de los datos al crear el árbol, para no reconstruirlo
+# con cada pedido nuevo fuera del rango conocido.
+_MARGEN_DIAS = 366
+
+
+class ArbolSegmentos:
+    """
+    Árbol de segmentos con suma en rango y mínimo en rango (propagación perezosa),
+    sobre las posiciones [0, tamano). Ambas operaciones cuestan O(log tamano).
+    """
+
+    def __init__(self, valores):
+        self.tamano = len(valores)
+        self._minimo = [0] * (4 * self.tamano)
+        self._pendiente = [0] * (4 * self.tamano)
+        self._construir(1, 0, self.tamano - 1, valores)
+
+    def _construir(self, nodo, izq, der, valores):
+        if izq == der:
+            self._minimo[nodo] = valores[izq]
+            return
+        medio = (izq + der) // 2
+        self._construir(2 * nodo, izq, medio, valores)
+        self._construir(2 * nodo + 1, medio + 1, der, valores)
+        self._minimo[nodo] = min(self._minimo[2 * nodo], self._minimo[2 * nodo + 1])
+
+    def _bajar(self, nodo):
+        pendiente = self._pendiente[nodo]
+        if pendiente:
+            for hijo in (2 * nodo, 2 * nodo + 1):
+                self._minimo[hijo] += pendiente
+                self._pendiente[hijo] += pendiente
+            self._pendiente[nodo] = 0
+
+    def sumar(self, desde, hasta, valor, nodo=1, izq=0, der=None):
+        """Suma `valor` a las posiciones [desde, hasta)."""
+        if der is None:
+            der = self.tamano - 1
+        if hasta <= izq or der < desde:
+            return
+        if desde <= izq and der < hasta:
+            self._minimo[nodo] += valor
+            self._pendiente[nodo] += valor
+            return
+        self._bajar(nodo)
+        medio = (izq + der) // 2
+        self.sumar(desde, hasta, valor, 2 * nodo, izq, medio)
+        self.sumar(desde, hasta, valor, 2 * nodo + 1, medio + 1, der)
+        self._minimo[nodo] = min(self._minimo[2 * nodo], self._minimo[2 * nodo + 1])
+
+    def minimo(self, desde, hasta, nodo=1, izq=0, der=None):
+        """Mínimo de las posiciones [desde, hasta)."""
+        if der is None:
+            der = self.tamano - 1
+        if hasta <= izq or der < desde:
+            return float("inf")
+        if desde <= izq and der < hasta:
+            return self._minimo[nodo]
+        self._bajar(nodo)
+        medio = (izq + der) // 2
+        return min(self.minimo(desde, hasta, 2 * nodo, izq, medio),
+                   self.minimo(desde, hasta, 2 * nodo + 1, medio + 1, der))
+
+    def primera_posicion_menor(self, desde, hasta, umbral, nodo=1, izq=0, der=None):
+        """Primera posición en [desde, hasta) con valor menor que `umbral`, o None."""
+        if der is None:
+            der = self.tamano - 1
+        if hasta <= izq or der < desde or self._minimo[nodo] >= umbral:
+            return None
+        if izq == der:
+            return izq
+        self._bajar(nodo)
+        medio = (izq + der) // 2
+        posicion = self.primera_posicion_menor(desde, hasta, umbral, 2 * nodo, izq, medio)
+        if posicion is None:
+            posicion = self.primera_posicion_menor(desde, hasta, umbral, 2 * nodo + 1, medio + 1, der)
+        return posicion
+
+    def valores(self):
+        """Todos los valores hoja, en orden (O(tamano)); se usa al ampliar el rango."""
+        return [self.minimo(i, i + 1) for i in range(self.tamano)]
+
+
+class ControlCapacidad:
+    """
+    Unidades comprometidas por tipo de unidad y día. Una entrega ocupa su unidad desde
+    el día de carga hasta el día anterior a su retorno: [fecha_pedido, fecha_retorno).
+
+    Cada árbol guarda la ocupación en negativo, así el mínimo del rango es el día más
+    cargado y las disponibles en el peor día son `base + mínimo`. La base se lee de
+    `units` al consultar, por lo que cambiar la configuración no obliga a reconstruir.
+    """
+
+    def __init__(self, origen, tamano):
+        self.origen = origen
+        self.tamano = tamano
+        self._arboles = {}  # unidad -> ArbolSegmentos
+
+    @classmethod
+    def desde_calendario(cls, calendar):
+        modelo = calendar if isinstance(calendar, CalendarioModelo) else CalendarioModelo.desde_json(calendar)
+        nombres = modelo.unidades.nombres
+        intervalos = [(nombres[unidad], inicio, fin) for unidad, inicio, fin in modelo.intervalos()]
+
+        if intervalos:
+            origen = min(inicio for _, inicio, _ in intervalos) - _MARGEN_DIAS
+            fin_max = max(fin for _, _, fin in intervalos) + _MARGEN_DIAS
+        else:
+            origen = date.today().toordinal() - _MARGEN_DIAS
+            fin_max = date.today().toordinal() + _MARGEN_DIAS
+
+        # Ocupación inicial con arreglos de diferencias; el árbol se construye en O(días)
+        tamano = fin_max - origen
+        diferencias = {}
+        for unidad, inicio, fin in intervalos:
+            fila = diferencias.setdefault(unidad, [0] * (tamano + 1))
+            fila[inicio - origen] -= 1
+            fila[fin - origen] += 1
+
+        control = cls(origen, tamano)
+        for unidad, fila in diferencias.items():
+            valores, acumulado = [], 0
+            for delta in fila[:tamano]:
+                acumulado += delta
+                valores.append(acumulado)
+            control._arboles[unidad] = ArbolSegmentos(valores)
+        return control
+
+    @staticmethod
+    def _intervalo(evento):
+        inicio = fecha_a_ordinal(evento["fecha_pedido"])
+        return evento["unidad"], inicio, inicio + dias_retorno_de(evento)
+
+    def _asegurar_rango(self, inicio, fin):
+        """Amplía los árboles si el intervalo cae fuera del rango de días cubierto."""
+        if inicio >= self.origen and fin <= self.origen + self.tamano:
+            return
+        nuevo_origen = min(self.origen, inicio - _MARGEN_DIAS)
+        nuevo_fin = max(self.origen + self.tamano, fin + _MARGEN_DIAS)
+        antes = self.origen - nuevo_origen
+        despues = nuevo_fin - (self.origen + self.tamano)
+        for unidad, arbol in self._arboles.items():
+            self._arboles[unidad] = ArbolSegmentos([0] * antes + arbol.valores() + [0] * despues)
+        self.origen, self.tamano = nuevo_origen, nuevo_fin - nuevo_origen
+
+    def _arbol(self, unidad):
+        if unidad not in self._arboles:
+            self._arboles[unidad] = ArbolSegmentos([0] * self.tamano)
+        return self._arboles[unidad]
+
+    def agregar(self, evento):
+        unidad, inicio, fin = self._intervalo(evento)
+        if fin <= inicio:
+            return
+        self._asegurar_rango(inicio, fin)
+        self._arbol(unidad).sumar(inicio - self.origen, fin - self.origen, -1)
+
+    def quitar(self, evento):
+        unidad, inicio, fin = self._intervalo(evento)
+        if fin <= inicio:
+            return
+        self._asegurar_rango(inicio, fin)
+        self._arbol(unidad).sumar(inicio - self.origen, fin - self.origen, 1)
+
+    def disponibles_minimas(self, units, unidad, inicio, fin):
+        """Menor número de unidades libres entre los ordinales [inicio, fin)."""
+        self._asegurar_rango(inicio, fin)
+        return units.get(unidad, 0) + self._arbol(unidad).minimo(inicio - self.origen, fin - self.origen)
+
+    def primer_dia_sin_unidades(self, units, unidad, inicio, fin, cantidad=1):
+        """Primer día de [inicio, fin) donde no alcanzan `cantidad` unidades libres, o None."""
+        self._asegurar_rango(inicio, fin)
+        umbral = cantidad - units.get(unidad, 0)
+        posicion = self._arbol(unidad).primera_posicion_menor(inicio - self.origen, fin - self.origen, umbral)
+        return None if posicion is None else date.fromordinal(self.origen + posicion)
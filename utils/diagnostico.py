@@ -0,0 +1,148 @@
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# --- Diagnóstico de tiempos por rerun (opcional) ---
+# Se activa con REYMA_DIAGNOSTICO=1. Apagado, `medido` devuelve la función tal cual y
+# `seccion` un contexto vacío compartido, así que el costo es prácticamente nulo.
+# Encendido, cada rerun acumula tiempo y número de llamadas por nombre (p. ej.
+# "storage.load_calendar" o "tab.Calendario"), se guardan los últimos RERUNS_EN_MEMORIA
+# de cada sesión para su pestaña "⏱️ Diagnóstico" (cada sesión ve solo los suyos; se
+# recuerdan las SESIONES_EN_MEMORIA más recientes) y cada rerun se agrega como una línea
+# a METRICAS_PATH, con su sesión. Los tiempos son inclusivos: una carga dentro de una
+# pestaña cuenta en ambas.
+ACTIVO = os.environ.get("REYMA_DIAGNOSTICO", "").lower() in ("1", "true", "si", "sí")
+RERUNS_EN_MEMORIA = int(os.environ.get("REYMA_DIAGNOSTICO_RERUNS", "20"))
+SESIONES_EN_MEMORIA = 50
+METRICAS_PATH = os.path.join("data", "metricas.jsonl")
+
+_historiales = collections.OrderedDict()  # sesión -> últimos reruns, la usada más recientemente al final
+_bloqueo = threading.Lock()
+_local = threading.local()  # rerun en curso de cada hilo de Streamlit
+_SIN_MEDICION = contextlib.nullcontext()
+
+
+def _registrar(nombre, segundos):
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return
+    acumulado = rerun["tiempos"].setdefault(nombre, [0.0, 0])
+    acumulado[0] += segundos
+    acumulado[1] += 1
+
+
+def medido(nombre):
+    """Decorador: suma el tiempo de cada llamada a `nombre` en el rerun en curso."""
+    def decorador(func):
+        if not ACTIVO:
+            return func
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _registrar(nombre, time.perf_counter() - inicio)
+        return envoltura
+    return decorador
+
+
+@contextlib.contextmanager
+def _seccion_medida(nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(nombre, time.perf_counter() - inicio)
+
+
+def seccion(nombre):
+    """Contexto para medir un bloque de main.py (una pestaña, la carga inicial...)."""
+    if not ACTIVO:
+        return _SIN_MEDICION
+    return _seccion_medida(nombre)
+
+
+@contextlib.contextmanager
+def _fragmento_medido(nombre, sesion):
+    propio = getattr(_local, "rerun", None) is None
+    if propio:
+        iniciar_rerun(sesion)
+        _local.rerun["fragmento"] = nombre
+    try:
+        with _seccion_medida(nombre):
+            yield
+    except BaseException:
+        if propio:
+            terminar_rerun(interrumpido=True)
+        raise
+    if propio:
+        terminar_rerun()
+
+
+def fragmento(nombre, sesion=None):
+    """
+    Como `seccion`, para el cuerpo de un `st.fragment`. Cuando un widget del fragmento
+    vuelve a ejecutar solo esa pestaña, main.py no corre completo: el fragmento abre y
+    cierra su propio rerun (marcado con "fragmento") de la `sesion` para que también quede medido.
+    """
+    if not ACTIVO:
+        return _SIN_MEDICION
+    return _fragmento_medido(nombre, sesion)
+
+
+def iniciar_rerun(sesion=None):
+    """
+    Abre la medición de un rerun de `sesion` (la de Streamlit; None fuera de la app).
+    Si el anterior se cortó (st.rerun, st.stop) se cierra como interrumpido.
+    """
+    if not ACTIVO:
+        return
+    if getattr(_local, "rerun", None) is not None:
+        terminar_rerun(interrumpido=True)
+    _local.rerun = {"inicio": time.perf_counter(), "fecha": datetime.now().isoformat(timespec="milliseconds"),
+                    "sesion": sesion, "tiempos": {}}
+
+
+def terminar_rerun(interrumpido=False):
+    """Cierra el rerun en curso: lo guarda en el historial en memoria y en el registro JSONL."""
+    rerun = getattr(_local, "rerun", None)
+    if not ACTIVO or rerun is None:
+        return
+    _local.rerun = None
+    registro = {
+        "fecha": rerun["fecha"],
+        "sesion": rerun["sesion"],
+        "total": time.perf_counter() - rerun["inicio"],
+        "interrumpido": interrumpido,
+        "fragmento": rerun.get("fragmento"),
+        "tiempos": {nombre: {"segundos": segundos, "llamadas": llamadas}
+                    for nombre, (segundos, llamadas) in rerun["tiempos"].items()},
+    }
+    with _bloqueo:
+        if rerun["sesion"] not in _historiales:
+            _historiales[rerun["sesion"]] = collections.deque(maxlen=RERUNS_EN_MEMORIA)
+            while len(_historiales) > SESIONES_EN_MEMORIA:
+                _historiales.popitem(last=False)
+        _historiales.move_to_end(rerun["sesion"])
+        _historiales[rerun["sesion"]].append(registro)
+        try:
+            dir_name = os.path.dirname(METRICAS_PATH)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            with open(METRICAS_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError:
+            pass  # El diagnóstico nunca debe tumbar la app
+
+
+def historial(sesion=None):
+    """Últimos reruns terminados de `sesion`, del más antiguo al más reciente."""
+    with _bloqueo:
+        return list(_historiales.get(sesion, ()))
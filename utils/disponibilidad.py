@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.modelo import CalendarioModelo
+
+
+def columnas_calendario(calendar):
+    """
+    Pasa el calendario a arreglos columnares, una sola vez por versión del calendario:
+    entregas (unidad, ordinal de carga, ordinal de retorno) y retornos (unidad, ordinal del día).
+    Acepta el calendario JSON o un `CalendarioModelo` ya construido.
+    """
+    modelo = calendar if isinstance(calendar, CalendarioModelo) else CalendarioModelo.desde_json(calendar)
+    intervalos = np.array(list(modelo.intervalos()), dtype=np.int64).reshape(-1, 3)
+    retornos = np.array([(-1 if retorno.unidad is None else retorno.unidad, dia)
+                         for dia, retorno in modelo.retornos()], dtype=np.int64).reshape(-1, 2)
+
+    # Las unidades viajan como códigos del catálogo del modelo; sus nombres van aparte
+    return {
+        "unidades": list(modelo.unidades.nombres),
+        "entregas_unidad": intervalos[:, 0],
+        "entregas_inicio": intervalos[:, 1],
+        "entregas_fin": intervalos[:, 2],
+        "retornos_unidad": retornos[:, 0],
+        "retornos_dia": retornos[:, 1],
+    }
+
+
+def pronostico_disponibilidad(columnas, units, desde, horizonte=7):
+    """
+    Cargas, retornos, unidades en tránsito y disponibles netas por unidad para
+    `horizonte` días a partir de `desde`, con arreglos de diferencias y sumas acumuladas.
+
+    Misma regla que el resumen de hoy y mañana: en tránsito están las cargadas antes
+    del día que aún no regresan; el neto del primer día es base - tránsito + retornos -
+    cargas, y cada día siguiente suma sus retornos y resta sus cargas al neto anterior.
+
+    Devuelve un DataFrame con índice (Unidad, Fecha).
+    """
+    unidades = list(units.keys())
+    codigo = {unidad: i for i, unidad in enumerate(unidades)}
+    d0 = desde.toordinal()
+    n_unidades = len(unidades)
+
+    # Del código del catálogo del calendario al renglón de la unidad configurada (-1 si no está)
+    traduccion = np.array([codigo.get(nombre, -1) for nombre in columnas["unidades"]] + [-1], dtype=np.int64)
+
+    def _codigos(codigos_catalogo):
+        return traduccion[codigos_catalogo]
+
+    # Cargas por día: conteo directo de las entregas que caen en el horizonte
+    cargas = np.zeros((n_unidades, horizonte), dtype=np.int64)
+    u = _codigos(columnas["entregas_unidad"])
+    k = columnas["entregas_inicio"] - d0
+    dentro = (u >= 0) & (k >= 0) & (k < horizonte)
+    np.add.at(cargas, (u[dentro], k[dentro]), 1)
+
+    # Retornos por día
+    retornos = np.zeros((n_unidades, horizonte), dtype=np.int64)
+    ur = _codigos(columnas["retornos_unidad"])
+    kr = columnas["retornos_dia"] - d0
+    dentro = (ur >= 0) & (kr >= 0) & (kr < horizonte)
+    np.add.at(retornos, (ur[dentro], kr[dentro]), 1)
+
+    # En tránsito: +1 el día siguiente a la carga, -1 el día del retorno, recortado al horizonte
+    diferencias = np.zeros((n_unidades, horizonte + 1), dtype=np.int64)
+    inicio = np.clip(columnas["entregas_inicio"] + 1 - d0, 0, horizonte)
+    fin = np.clip(columnas["entregas_fin"] - d0, 0, horizonte)
+    dentro = (u >= 0) & (inicio < fin)
+    np.add.at(diferencias, (u[dentro], inicio[dentro]), 1)
+    np.add.at(diferencias, (u[dentro], fin[dentro]), -1)
+    en_transito = np.cumsum(diferencias, axis=1)[:, :horizonte]
+
+    base = np.array([units[unidad] for unidad in unidades], dtype=np.int64).reshape(-1, 1)
+    disponibles = base - en_transito[:, :1] + np.cumsum(retornos - cargas, axis=1)
+
+    fechas = [desde + timedelta(days=i) for i in range(horizonte)]
+    indice = pd.MultiIndex.from_product([unidades, fechas], names=["Unidad", "Fecha"])
+    return pd.DataFrame({
+        "Cargas": cargas.ravel(),
+        "Retornos": retornos.ravel(),
+        "En Tránsito": en_transito.ravel(),
+        "Disponibles": disponibles.ravel(),
+    }, index=indice)
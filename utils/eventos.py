@@ -0,0 +1,30 @@
+from datetime import date
+
+
+# --- Utilidades de fechas y eventos ---
+def fecha_a_ordinal(fecha):
+    """Convierte una fecha (date o 'YYYY-MM-DD') a su ordinal entero."""
+    if isinstance(fecha, str):
+        return date.fromisoformat(fecha).toordinal()
+    return fecha.toordinal()
+
+
+def dias_retorno_de(evento):
+    """Días efectivos de retorno de una entrega (con el ajuste de sábado si existe)."""
+    return evento.get("dias_retorno_calculados", evento["dias_retorno"])
+
+
+def id_entrega_de_retorno(evento):
+    """
+    Id de la entrega a la que pertenece un retorno. La clave es `id_entrega_asociada`;
+    también se acepta `pedido_id_asociado`, la que escribía la app antes de la migración
+    de esquema v2 (`python -m utils.migraciones`), para leer datos aún sin migrar.
+    """
+    return evento.get("id_entrega_asociada") or evento.get("pedido_id_asociado")
+
+
+def id_pedido_de_evento(evento):
+    """Id del pedido al que pertenece un evento, sea entrega o retorno."""
+    if evento.get("tipo_evento") == "retorno":
+        return id_entrega_de_retorno(evento)
+    return evento.get("id")
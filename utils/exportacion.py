@@ -0,0 +1,182 @@
+import csv
+import io
+from collections import deque
+from datetime import date, timedelta
+
+from utils.eventos import id_entrega_de_retorno
+from utils.storage import iterar_calendario
+
+# --- Exportación del calendario a un archivo plano ---
+# Una fila por pedido: la entrega con su retorno unido por id. Los días se recorren en orden
+# (utils.storage.iterar_calendario, un mes o un cursor a la vez) y cada pedido se escribe en
+# cuanto se ve su retorno o pasa la fecha en que debía estar. En memoria solo quedan los
+# pedidos en tránsito y un bloque de filas, así que un historial de varios años no crece la RAM.
+#
+#   exportar("pedidos.csv", "csv", desde=date(2025, 1, 1), hasta=date(2025, 12, 31), unidades=["Torton"])
+
+FORMATOS = ("csv", "parquet", "xlsx")
+TAMANO_BLOQUE = 5000  # filas por bloque escrito
+
+COLUMNAS = ["id", "fecha_carga", "fecha_retorno", "unidad", "cliente", "dias_retorno",
+            "dias_retorno_calculados", "fecha_retorno_registrada"]
+# fecha_retorno: carga + dias_retorno_calculados. fecha_retorno_registrada: día del evento de
+# retorno unido por id (vacía si no existe). Un retorno sin entrega sale en su propia fila,
+# con la fecha de carga que trae (fecha_pedido_asociado) y sin días de retorno.
+
+
+def _fecha(fecha_str):
+    try:
+        return date.fromisoformat(str(fecha_str))
+    except ValueError:
+        return None
+
+
+def filas_pedidos(dias, desde=None, hasta=None, unidades=None):
+    """
+    Filas (dict con COLUMNAS) a partir de `dias`, pares (fecha, eventos) en orden de fecha,
+    con carga entre `desde` y `hasta` (date, inclusive) y unidad en `unidades`. Salen en orden
+    de fecha de carga. `dias` debe empezar en `desde` o antes; se deja de leer en cuanto pasó
+    `hasta` y ya no queda ningún pedido esperando su retorno.
+    """
+    unidades = set(unidades) if unidades else None
+    pendientes = {}  # id -> fila que espera su retorno
+    cola = deque()  # [fila, resuelta] en orden de carga
+
+    def _incluir(fecha_carga, unidad):
+        return (fecha_carga is not None and (desde is None or fecha_carga >= desde)
+                and (hasta is None or fecha_carga <= hasta) and (unidades is None or unidad in unidades))
+
+    for fecha_str, eventos in dias:
+        dia = _fecha(fecha_str)
+        if dia is None:
+            continue
+        if hasta is not None and dia > hasta and not pendientes:
+            break
+
+        # Primero las entregas: un viaje de 0 días tiene su retorno el mismo día
+        for evento in eventos:
+            if evento.get("tipo_evento") != "entrega" or not _incluir(dia, evento.get("unidad")):
+                continue
+            calculados = evento.get("dias_retorno_calculados", evento.get("dias_retorno"))
+            fila = {
+                "id": evento.get("id"),
+                "fecha_carga": dia,
+                "fecha_retorno": dia + timedelta(days=int(calculados)) if calculados is not None else None,
+                "unidad": evento.get("unidad"),
+                "cliente": evento.get("cliente"),
+                "dias_retorno": evento.get("dias_retorno"),
+                "dias_retorno_calculados": calculados,
+                "fecha_retorno_registrada": None,
+            }
+            entrada = [fila, fila["id"] is None or fila["fecha_retorno"] is None]
+            cola.append(entrada)
+            if not entrada[1]:
+                pendientes[fila["id"]] = entrada
+
+        for evento in eventos:
+            if evento.get("tipo_evento") != "retorno":
+                continue
+            entrada = pendientes.pop(id_entrega_de_retorno(evento), None)
+            if entrada is not None:
+                entrada[0]["fecha_retorno_registrada"] = dia
+                entrada[1] = True
+                continue
+            fecha_carga = _fecha(evento.get("fecha_pedido_asociado"))
+            if _incluir(fecha_carga, evento.get("unidad")):
+                cola.append([{"id": id_entrega_de_retorno(evento), "fecha_carga": fecha_carga,
+                              "fecha_retorno": None, "unidad": evento.get("unidad"),
+                              "cliente": evento.get("cliente_asociado"), "dias_retorno": None,
+                              "dias_retorno_calculados": None, "fecha_retorno_registrada": dia}, True])
+
+        # Lo que debía volver hasta hoy y no volvió ya no va a encontrar su retorno
+        while cola and (cola[0][1] or cola[0][0]["fecha_retorno"] <= dia):
+            fila, _ = cola.popleft()
+            pendientes.pop(fila["id"], None)
+            yield fila
+
+    for fila, _ in cola:
+        yield fila
+
+
+def bloques(filas, tamano=TAMANO_BLOQUE):
+    """Listas de hasta `tamano` filas."""
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def escribir_csv(bloques_filas, destino):
+    """CSV en UTF-8 con BOM (para que Excel respete los acentos); `destino` es una ruta o un archivo binario."""
+    abierto = open(destino, "wb") if isinstance(destino, str) else None
+    salida = io.TextIOWrapper(abierto or destino, encoding="utf-8-sig", newline="")
+    try:
+        escritor = csv.DictWriter(salida, fieldnames=COLUMNAS)
+        escritor.writeheader()
+        for bloque in bloques_filas:
+            escritor.writerows(bloque)
+    finally:
+        salida.flush()
+        if abierto:
+            salida.close()
+        else:
+            salida.detach()  # el archivo del llamador queda abierto
+
+
+def escribir_parquet(bloques_filas, destino):
+    """Parquet con un grupo de filas por bloque (requiere pyarrow, el mismo que usa pandas)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([
+        ("id", pa.string()), ("fecha_carga", pa.date32()), ("fecha_retorno", pa.date32()),
+        ("unidad", pa.string()), ("cliente", pa.string()), ("dias_retorno", pa.int64()),
+        ("dias_retorno_calculados", pa.int64()), ("fecha_retorno_registrada", pa.date32()),
+    ])
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for bloque in bloques_filas:
+            escritor.write_table(pa.Table.from_pylist(bloque, schema=esquema))
+
+
+def escribir_xlsx(bloques_filas, destino):
+    """Excel con openpyxl en modo de solo escritura: las filas se vuelcan sin armar la hoja en memoria."""
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Pedidos")
+    hoja.append(COLUMNAS)
+    for bloque in bloques_filas:
+        for fila in bloque:
+            hoja.append([fila[columna] for columna in COLUMNAS])
+    libro.save(destino)
+
+
+_ESCRITORES = {"csv": escribir_csv, "parquet": escribir_parquet, "xlsx": escribir_xlsx}
+
+
+def exportar(destino, formato="csv", desde=None, hasta=None, unidades=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Escribe en `destino` (ruta o archivo binario) los pedidos del calendario guardado en
+    `formato` ("csv", "parquet" o "xlsx"), con los filtros de `filas_pedidos`. Devuelve
+    cuántas filas se escribieron.
+    """
+    if formato not in _ESCRITORES:
+        raise ValueError(f"Formato no soportado: {formato!r} (usa {', '.join(FORMATOS)})")
+    if desde is not None and hasta is not None and hasta < desde:
+        raise ValueError("hasta es anterior a desde")
+    total = 0
+
+    def _contados(bloques_filas):
+        nonlocal total
+        for bloque in bloques_filas:
+            total += len(bloque)
+            yield bloque
+
+    dias = iterar_calendario(desde.isoformat() if desde is not None else None)
+    filas = filas_pedidos(dias, desde, hasta, unidades)
+    _ESCRITORES[formato](_contados(bloques(filas, tamano_bloque)), destino)
+    return total
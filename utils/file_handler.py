@@ -1,34 +1,217 @@
+from datetime import date, datetime
+
+import openpyxl
 import pandas as pd
 import streamlit as st
 
+from utils.texto import normalizar_texto
+
 COLUMNS_REQUERIDAS = ["Cliente", "Días Retorno"]
 
+# Columnas opcionales: si vienen en el Excel, prellenan la unidad y la fecha de carga
+# del registro; las dos últimas acotan la asignación automática (utils.planificador).
+# Se aceptan varios nombres de encabezado para cada una.
+COLUMNAS_OPCIONALES = {
+    "Unidad": ["Unidad", "Tipo de unidad"],
+    "Fecha": ["Fecha", "Fecha de carga", "Fecha carga", "Fecha pedido"],
+    "Unidades permitidas": ["Unidades permitidas", "Unidades posibles"],
+    "Fecha límite": ["Fecha límite", "Fecha limite", "Cargar antes de"],
+}
 
-def cargar_excel():
-    st.subheader("📁 Carga de archivo Excel")
+# Separadores aceptados en "Unidades permitidas" ("Torton, Tráiler 48")
+_SEPARADORES_UNIDADES = [";", "/", "|"]
 
-    archivo = st.file_uploader("Selecciona el archivo .xlsx con pedidos", type=["xlsx"])
+FORMATOS_FECHA = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y"]
 
-    if archivo:
+# Los reportes del ERP traen títulos arriba de la tabla: el encabezado se busca en estas primeras filas
+FILAS_BUSQUEDA_ENCABEZADO = 30
+
+_ENCABEZADOS = {normalizar_texto(nombre): nombre for nombre in COLUMNS_REQUERIDAS}
+for _columna, _alias in COLUMNAS_OPCIONALES.items():
+    _ENCABEZADOS.update({normalizar_texto(nombre): _columna for nombre in _alias})
+
+
+def _ubicar_columnas(fila):
+    """Posición de cada columna conocida dentro de una fila de encabezados, o None si faltan las requeridas."""
+    posiciones = {}
+    for posicion, valor in enumerate(fila):
+        if valor is None:
+            continue
+        columna = _ENCABEZADOS.get(normalizar_texto(valor))
+        if columna and columna not in posiciones:
+            posiciones[columna] = posicion
+    if all(columna in posiciones for columna in COLUMNS_REQUERIDAS):
+        return posiciones
+    return None
+
+
+def _cliente(valor):
+    if valor is None:
+        raise ValueError("Cliente vacío")
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    texto = str(valor).strip()
+    if not texto:
+        raise ValueError("Cliente vacío")
+    return texto
+
+
+def _dias_retorno(valor):
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        raise ValueError("Días Retorno vacío")
+    if isinstance(valor, bool):
+        raise ValueError(f"Días Retorno no es un número entero: {valor!r}")
+    if isinstance(valor, str):
         try:
-            df = pd.read_excel(archivo)
+            valor = float(valor.strip().replace(",", "."))
+        except ValueError:
+            raise ValueError(f"Días Retorno no es un número: {valor!r}")
+    if isinstance(valor, float):
+        if not valor.is_integer():
+            raise ValueError(f"Días Retorno no es un número entero: {valor}")
+        valor = int(valor)
+    if not isinstance(valor, int):
+        raise ValueError(f"Días Retorno no es un número: {valor!r}")
+    if valor < 1:
+        # La app no edita pedidos de 0 días (el editor pide al menos 1): se rechazan desde aquí
+        raise ValueError(f"Días Retorno debe ser al menos 1: {valor}")
+    return valor
+
+
+def _unidad(valor, unidades_por_nombre):
+    if valor is None or not str(valor).strip():
+        return None
+    unidad = str(valor).strip()
+    if unidades_por_nombre is not None:
+        # Se acepta la unidad escrita con otras mayúsculas o sin acentos
+        unidad = unidades_por_nombre.get(normalizar_texto(unidad))
+        if unidad is None:
+            raise ValueError(f"Unidad desconocida: {str(valor).strip()!r}")
+    return unidad
+
+
+def _unidades(valor, unidades_por_nombre):
+    """Varias unidades separadas por comas (o ; / |), como texto "A, B" ya validado, o None si está vacía."""
+    if valor is None or not str(valor).strip():
+        return None
+    texto = str(valor)
+    for separador in _SEPARADORES_UNIDADES:
+        texto = texto.replace(separador, ",")
+    unidades = []
+    for nombre in texto.split(","):
+        unidad = _unidad(nombre, unidades_por_nombre)
+        if unidad is not None and unidad not in unidades:
+            unidades.append(unidad)
+    return ", ".join(unidades) or None
 
-            # Validación de columnas
-            if not all(col in df.columns for col in COLUMNS_REQUERIDAS):
-                st.error(f"❌ El archivo debe contener las columnas: {', '.join(COLUMNS_REQUERIDAS)}")
-                return None
 
-            # Limpieza de valores nulos y tipos
-            df = df[COLUMNS_REQUERIDAS].dropna()
-            df["Días Retorno"] = df["Días Retorno"].astype(int)
-            df["Cliente"] = df["Cliente"].astype(str)
+def _fecha(valor):
+    """Fecha de carga como 'YYYY-MM-DD' (así se guarda en JSON), o None si la celda está vacía."""
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, str):
+        for formato in FORMATOS_FECHA:
+            try:
+                return datetime.strptime(valor.strip(), formato).date().isoformat()
+            except ValueError:
+                continue
+    raise ValueError(f"Fecha no válida: {valor!r}")
 
-            st.success("✅ Archivo cargado correctamente")
-            return df
 
+def leer_pedidos_excel(archivo, unidades_validas=None):
+    """
+    Lee los pedidos de un .xlsx fila por fila (openpyxl en modo read_only), sin cargar
+    el libro completo en memoria. Recorre todas las hojas: en cada una busca la fila de
+    encabezados con 'Cliente' y 'Días Retorno' entre las primeras FILAS_BUSQUEDA_ENCABEZADO
+    y después lee solo hasta la última columna conocida.
+
+    Devuelve (DataFrame de pedidos válidos, lista de rechazos). Cada rechazo es
+    {"Hoja", "Fila", "Motivo"} con el número de fila tal como se ve en Excel. Las filas
+    completamente vacías se ignoran sin contarse como rechazo.
+    """
+    pedidos = {columna: [] for columna in COLUMNS_REQUERIDAS + list(COLUMNAS_OPCIONALES)}
+    opcionales_presentes = set()
+    rechazos = []
+    unidades_por_nombre = None
+    if unidades_validas is not None:
+        unidades_por_nombre = {normalizar_texto(nombre): nombre for nombre in unidades_validas}
+
+    libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        for hoja in libro.worksheets:
+            posiciones, fila_encabezado, hoja_vacia = None, None, True
+            for numero_fila, fila in enumerate(hoja.iter_rows(max_row=FILAS_BUSQUEDA_ENCABEZADO, values_only=True),
+                                               start=1):
+                hoja_vacia = hoja_vacia and all(valor is None for valor in fila)
+                posiciones = _ubicar_columnas(fila)
+                if posiciones is not None:
+                    fila_encabezado = numero_fila
+                    break
+            if posiciones is None:
+                if not hoja_vacia:
+                    rechazos.append({"Hoja": hoja.title, "Fila": None,
+                                     "Motivo": f"Hoja sin encabezados {', '.join(COLUMNS_REQUERIDAS)}"})
+                continue
+            opcionales_presentes.update(c for c in COLUMNAS_OPCIONALES if c in posiciones)
+
+            filas = hoja.iter_rows(min_row=fila_encabezado + 1, max_col=max(posiciones.values()) + 1,
+                                   values_only=True)
+            for numero_fila, fila in enumerate(filas, start=fila_encabezado + 1):
+                valores = {columna: fila[posicion] if posicion < len(fila) else None
+                           for columna, posicion in posiciones.items()}
+                if all(valor is None or (isinstance(valor, str) and not valor.strip()) for valor in valores.values()):
+                    continue
+                try:
+                    cliente = _cliente(valores["Cliente"])
+                    dias_retorno = _dias_retorno(valores["Días Retorno"])
+                    unidad = _unidad(valores.get("Unidad"), unidades_por_nombre)
+                    fecha = _fecha(valores.get("Fecha"))
+                    permitidas = _unidades(valores.get("Unidades permitidas"), unidades_por_nombre)
+                    fecha_limite = _fecha(valores.get("Fecha límite"))
+                except ValueError as e:
+                    rechazos.append({"Hoja": hoja.title, "Fila": numero_fila, "Motivo": str(e)})
+                    continue
+                pedidos["Cliente"].append(cliente)
+                pedidos["Días Retorno"].append(dias_retorno)
+                pedidos["Unidad"].append(unidad)
+                pedidos["Fecha"].append(fecha)
+                pedidos["Unidades permitidas"].append(permitidas)
+                pedidos["Fecha límite"].append(fecha_limite)
+    finally:
+        libro.close()
+
+    columnas = COLUMNS_REQUERIDAS + [c for c in COLUMNAS_OPCIONALES if c in opcionales_presentes]
+    return pd.DataFrame({columna: pedidos[columna] for columna in columnas}), rechazos
+
+
+def cargar_excel(unidades_validas=None):
+    st.subheader("📁 Carga de archivo Excel")
+
+    archivo = st.file_uploader("Selecciona el archivo .xlsx con pedidos", type=["xlsx"])
+
+    if archivo:
+        try:
+            df, rechazos = leer_pedidos_excel(archivo, unidades_validas)
         except Exception as e:
             st.error(f"Error al leer el archivo: {e}")
             return None
+
+        if rechazos:
+            st.warning(f"⚠️ {len(rechazos)} filas u hojas no se pudieron leer y se omitieron.")
+            with st.expander("Ver filas rechazadas"):
+                st.dataframe(pd.DataFrame(rechazos))
+
+        if df.empty:
+            st.error(f"❌ El archivo debe contener las columnas: {', '.join(COLUMNS_REQUERIDAS)}, "
+                     f"con al menos un pedido válido.")
+            return None
+
+        st.success(f"✅ Archivo cargado correctamente: {len(df)} pedidos.")
+        return df
     else:
         st.info("Sube un archivo para continuar.")
-        return None
\ No newline at end of file
+        return None
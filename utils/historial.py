@@ -0,0 +1,149 @@
+import collections
+import getpass
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from utils.cambios import aplicar_cambios, estan_aplicados, invertir_cambios
+from utils.eventos import id_pedido_de_evento
+
+# --- Deshacer/rehacer y auditoría ---
+# Cada operación guardada (registrar, eliminar, editar días) queda como la lista de `cambios`
+# que ya produce calendar_logic: los eventos quitados van completos y las ediciones traen
+# su "anterior". Su inversa se arma al vuelo (`invertir_cambios`), así que deshacer o
+# rehacer cuesta lo que mide la operación, no lo que mide el calendario, y nunca hace
+# falta una copia del calendario.
+#
+# Las pilas son por sesión (Historial en st.session_state). Antes de deshacer se revisa que
+# el calendario siga como lo dejó la operación; si otra sesión ya la pisó, no se deshace.
+# Cada operación, deshacer y rehacer se agrega a AUDITORIA_PATH con quién y cuándo.
+AUDITORIA_PATH = os.path.join("data", "auditoria.jsonl")
+NIVELES = int(os.environ.get("REYMA_NIVELES_DESHACER", "50"))  # operaciones por sesión que se pueden deshacer
+
+_bloqueo = threading.Lock()
+
+
+def usuario_del_sistema():
+    """Usuario para la auditoría fuera de la app: REYMA_USUARIO o el usuario del sistema operativo."""
+    try:
+        return os.environ.get("REYMA_USUARIO") or getpass.getuser()
+    except (KeyError, OSError):
+        return "desconocido"
+
+
+def _pedidos(cambios):
+    """Ids de pedido que tocan los cambios, sin repetir y en orden."""
+    ids = {}
+    for cambio in cambios:
+        pedido_id = id_pedido_de_evento(cambio["evento"])
+        if pedido_id is not None:
+            ids[pedido_id] = None
+    return list(ids)
+
+
+def registrar_auditoria(usuario, sesion, accion, descripcion, cambios=None):
+    """Agrega una línea a la auditoría. Un error al escribirla no detiene la operación ya guardada."""
+    registro = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "usuario": usuario,
+        "sesion": sesion,
+        "accion": accion,
+        "descripcion": descripcion,
+        "pedidos": _pedidos(cambios or []),
+        "cambios": cambios or [],
+    }
+    with _bloqueo:
+        try:
+            dir_name = os.path.dirname(AUDITORIA_PATH)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            with open(AUDITORIA_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+    return registro
+
+
+def auditoria(limite=50):
+    """Últimas `limite` líneas de la auditoría, de la más reciente a la más antigua (lee solo el final)."""
+    if not os.path.exists(AUDITORIA_PATH):
+        return []
+    with open(AUDITORIA_PATH, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        posicion = f.tell()
+        contenido = b""
+        while posicion > 0 and contenido.count(b"\n") <= limite:
+            paso = min(64 * 1024, posicion)
+            posicion -= paso
+            f.seek(posicion)
+            contenido = f.read(paso) + contenido
+    registros = []
+    for linea in reversed(contenido.splitlines()[-limite:] if limite else []):
+        try:
+            registros.append(json.loads(linea))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue  # línea cortada a la mitad, o el inicio parcial del bloque leído
+    return registros
+
+
+class Historial:
+    """
+    Pilas de deshacer y rehacer de una sesión. `registrar` se llama después de guardar una
+    operación; `deshacer` y `rehacer` funcionan como las de calendar_logic: modifican
+    `calendar` (y `indices`) y agregan a `cambios` lo que el llamador debe guardar.
+    """
+
+    def __init__(self, usuario=None, sesion=None, niveles=NIVELES):
+        self.usuario = usuario or usuario_del_sistema()
+        self.sesion = sesion or uuid.uuid4().hex[:8]
+        self._deshacer = collections.deque(maxlen=niveles)
+        self._rehacer = []
+
+    def registrar(self, accion, descripcion, cambios):
+        """Guarda una operación ya escrita en el calendario. Borra lo que hubiera por rehacer."""
+        if not cambios:
+            return
+        operacion = {"accion": accion, "descripcion": descripcion, "cambios": list(cambios)}
+        self._deshacer.append(operacion)
+        self._rehacer.clear()
+        registrar_auditoria(self.usuario, self.sesion, accion, descripcion, operacion["cambios"])
+
+    def olvidar(self):
+        """Vacía las pilas (p. ej. tras limpiar todos los datos, que no se puede deshacer)."""
+        self._deshacer.clear()
+        self._rehacer.clear()
+
+    def por_deshacer(self):
+        """Descripción de la operación que desharía `deshacer`, o None."""
+        return self._deshacer[-1]["descripcion"] if self._deshacer else None
+
+    def por_rehacer(self):
+        return self._rehacer[-1]["descripcion"] if self._rehacer else None
+
+    def _mover(self, origen, destino, cambios_esperados, cambios_a_aplicar, accion, calendar, indices, cambios):
+        operacion = origen.pop()
+        if not estan_aplicados(calendar, cambios_esperados):
+            return False, (f"No se puede {accion} «{operacion['descripcion']}»: esos pedidos cambiaron después "
+                           f"(otra sesión o el servicio). Se quitó del historial.")
+        aplicar_cambios(calendar, cambios_a_aplicar, indices)
+        if cambios is not None:
+            cambios.extend(cambios_a_aplicar)
+        destino.append(operacion)
+        registrar_auditoria(self.usuario, self.sesion, accion, operacion["descripcion"], cambios_a_aplicar)
+        return True, f"{'Deshecho' if accion == 'deshacer' else 'Rehecho'}: {operacion['descripcion']}."
+
+    def deshacer(self, calendar, indices=None, cambios=None):
+        if not self._deshacer:
+            return False, "No hay nada que deshacer."
+        operacion = self._deshacer[-1]
+        return self._mover(self._deshacer, self._rehacer, operacion["cambios"], invertir_cambios(operacion["cambios"]),
+                           "deshacer", calendar, indices, cambios)
+
+    def rehacer(self, calendar, indices=None, cambios=None):
+        if not self._rehacer:
+            return False, "No hay nada que rehacer."
+        operacion = self._rehacer[-1]
+        return self._mover(self._rehacer, self._deshacer, invertir_cambios(operacion["cambios"]), operacion["cambios"],
+                           "rehacer", calendar, indices, cambios)
@@ -0,0 +1,225 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from utils.analitica import AnaliticaUso
+from utils.capacidad import ControlCapacidad
+from utils.eventos import fecha_a_ordinal, dias_retorno_de, id_pedido_de_evento
+
+
+# --- Índice de intervalos de tránsito ---
+class IndiceTransito:
+    """
+    Índice de intervalos carga → retorno de las entregas, separado por tipo de unidad.
+
+    Un pedido está en tránsito los días estrictamente entre su carga y su retorno
+    estimado (fecha_pedido < D < fecha_retorno). Por cada unidad se guardan los
+    intervalos ordenados por día de inicio junto con la duración más larga vista,
+    así que una consulta por fecha solo recorre, vía bisect, los pedidos que
+    pudieron salir dentro de esa ventana: O(log n + k) con viajes de pocos días.
+    """
+
+    def __init__(self):
+        self._inicios = {}  # unidad -> [ordinal de carga, ...] ordenado
+        self._entradas = {}  # unidad -> [(ordinal de retorno, evento), ...] paralelo a _inicios
+        self._duracion_max = {}  # unidad -> días del viaje más largo
+        self._fechas_cache = None
+
+    @classmethod
+    def desde_calendario(cls, calendar):
+        """Construye el índice recorriendo una sola vez las entregas del calendario."""
+        indice = cls()
+        por_unidad = {}
+        for eventos in calendar.values():
+            for evento in eventos:
+                if evento.get("tipo_evento") != "entrega":
+                    continue
+                inicio = fecha_a_ordinal(evento["fecha_pedido"])
+                fin = inicio + dias_retorno_de(evento)
+                por_unidad.setdefault(evento["unidad"], []).append((inicio, fin, evento))
+
+        for unidad, intervalos in por_unidad.items():
+            intervalos.sort(key=lambda intervalo: intervalo[0])
+            indice._inicios[unidad] = [inicio for inicio, _, _ in intervalos]
+            indice._entradas[unidad] = [(fin, evento) for _, fin, evento in intervalos]
+            indice._duracion_max[unidad] = max(fin - inicio for inicio, fin, _ in intervalos)
+        return indice
+
+    def agregar(self, evento):
+        """Registra el intervalo de una entrega."""
+        unidad = evento["unidad"]
+        inicio = fecha_a_ordinal(evento["fecha_pedido"])
+        fin = inicio + dias_retorno_de(evento)
+
+        inicios = self._inicios.setdefault(unidad, [])
+        pos = bisect_right(inicios, inicio)
+        inicios.insert(pos, inicio)
+        self._entradas.setdefault(unidad, []).insert(pos, (fin, evento))
+        self._duracion_max[unidad] = max(self._duracion_max.get(unidad, 0), fin - inicio)
+        self._fechas_cache = None
+
+    def quitar(self, evento):
+        """Elimina el intervalo de una entrega (se identifica por el objeto evento)."""
+        unidad = evento["unidad"]
+        inicios = self._inicios.get(unidad, [])
+        entradas = self._entradas.get(unidad, [])
+        inicio = fecha_a_ordinal(evento["fecha_pedido"])
+        for pos in range(bisect_left(inicios, inicio), bisect_right(inicios, inicio)):
+            if entradas[pos][1] is evento:
+                del inicios[pos]
+                del entradas[pos]
+                self._fechas_cache = None
+                return True
+        return False
+
+    def en_transito(self, fecha, unidad=None):
+        """Entregas en tránsito en `fecha`, opcionalmente solo de una unidad."""
+        dia = fecha_a_ordinal(fecha)
+        unidades = [unidad] if unidad is not None else list(self._inicios)
+        resultado = []
+        for u in unidades:
+            inicios = self._inicios.get(u)
+            if not inicios:
+                continue
+            entradas = self._entradas[u]
+            desde = bisect_right(inicios, dia - self._duracion_max[u])
+            hasta = bisect_left(inicios, dia)
+            resultado.extend(evento for fin, evento in entradas[desde:hasta] if fin > dia)
+        return resultado
+
+    def conteo_en_transito(self, fecha):
+        """Número de entregas en tránsito en `fecha` por tipo de unidad."""
+        return {unidad: len(self.en_transito(fecha, unidad)) for unidad in self._inicios}
+
+    def fechas_con_transito(self):
+        """
+        Todas las fechas ('YYYY-MM-DD') con al menos una unidad en tránsito.
+        Fusiona los intervalos ordenados y solo genera los días cubiertos.
+        """
+        if self._fechas_cache is None:
+            rangos = sorted(
+                (inicio + 1, fin)
+                for unidad, inicios in self._inicios.items()
+                for inicio, (fin, _) in zip(inicios, self._entradas[unidad])
+                if fin > inicio + 1
+            )
+            fechas = []
+            ultimo = None  # primer día aún no emitido
+            for desde, hasta in rangos:
+                if ultimo is not None and desde < ultimo:
+                    desde = ultimo
+                for dia in range(desde, hasta):
+                    fechas.append(date.fromordinal(dia).strftime("%Y-%m-%d"))
+                if ultimo is None or hasta > ultimo:
+                    ultimo = hasta
+            self._fechas_cache = fechas
+        return list(self._fechas_cache)
+
+
+# --- Índice de pedidos por id ---
+class IndicePedidos:
+    """
+    Mapea el id de cada pedido a la fecha y posición de su entrega y de sus retornos
+    dentro de `calendar[fecha]`. Las posiciones se corrigen al quitar eventos, por lo
+    que solo se toca la lista del día afectado.
+    """
+
+    def __init__(self):
+        self._entregas = {}  # id -> [fecha, posición]
+        self._retornos = {}  # id -> [[fecha, posición], ...]
+
+    @classmethod
+    def desde_calendario(cls, calendar):
+        indice = cls()
+        for fecha_str, eventos in calendar.items():
+            for pos, evento in enumerate(eventos):
+                indice.al_insertar(fecha_str, pos, evento)
+        return indice
+
+    def entrega(self, pedido_id):
+        """(fecha, posición) de la entrega del pedido, o None."""
+        ubicacion = self._entregas.get(pedido_id)
+        return tuple(ubicacion) if ubicacion else None
+
+    def retornos(self, pedido_id):
+        """Lista de (fecha, posición) de los retornos del pedido."""
+        return [tuple(ubicacion) for ubicacion in self._retornos.get(pedido_id, [])]
+
+    def al_insertar(self, fecha_str, pos, evento):
+        pedido_id = id_pedido_de_evento(evento)
+        if not pedido_id:
+            return
+        if evento.get("tipo_evento") == "retorno":
+            self._retornos.setdefault(pedido_id, []).append([fecha_str, pos])
+        elif evento.get("tipo_evento") == "entrega":
+            self._entregas[pedido_id] = [fecha_str, pos]
+
+    def al_quitar(self, fecha_str, pos, evento, eventos_restantes):
+        """
+        Borra la ubicación del evento quitado y recorre una posición hacia atrás
+        a los eventos que estaban después de él en el mismo día.
+        """
+        pedido_id = id_pedido_de_evento(evento)
+        if pedido_id:
+            if evento.get("tipo_evento") == "retorno":
+                ubicaciones = self._retornos.get(pedido_id, [])
+                ubicaciones[:] = [u for u in ubicaciones if u != [fecha_str, pos]]
+                if not ubicaciones:
+                    self._retornos.pop(pedido_id, None)
+            elif self._entregas.get(pedido_id) == [fecha_str, pos]:
+                del self._entregas[pedido_id]
+
+        for nueva_pos in range(pos, len(eventos_restantes)):
+            siguiente = eventos_restantes[nueva_pos]
+            siguiente_id = id_pedido_de_evento(siguiente)
+            if not siguiente_id:
+                continue
+            if siguiente.get("tipo_evento") == "retorno":
+                ubicaciones = self._retornos.get(siguiente_id, [])
+            else:
+                ubicaciones = [self._entregas[siguiente_id]] if siguiente_id in self._entregas else []
+            for ubicacion in ubicaciones:
+                if ubicacion == [fecha_str, nueva_pos + 1]:
+                    ubicacion[1] = nueva_pos
+                    break
+
+
+# --- Conjunto de índices que se mantienen junto al calendario ---
+class IndicesCalendario:
+    """
+    Agrupa los índices derivados del calendario. Se construye una vez al cargar y
+    `calendar_logic` lo mantiene al día en cada alta, baja o edición de eventos.
+    """
+
+    def __init__(self, pedidos, transito, capacidad, analitica=None):
+        self.pedidos = pedidos
+        self.transito = transito
+        self.capacidad = capacidad
+        self.analitica = analitica if analitica is not None else AnaliticaUso()
+
+    @classmethod
+    def desde_calendario(cls, calendar):
+        return cls(IndicePedidos.desde_calendario(calendar), IndiceTransito.desde_calendario(calendar),
+                   ControlCapacidad.desde_calendario(calendar), AnaliticaUso.desde_calendario(calendar))
+
+    def al_insertar(self, fecha_str, pos, evento):
+        self.pedidos.al_insertar(fecha_str, pos, evento)
+        self.analitica.al_insertar(fecha_str, pos, evento)
+        if evento.get("tipo_evento") == "entrega":
+            self.transito.agregar(evento)
+            self.capacidad.agregar(evento)
+
+    def al_quitar(self, fecha_str, pos, evento, eventos_restantes):
+        self.pedidos.al_quitar(fecha_str, pos, evento, eventos_restantes)
+        self.analitica.al_quitar(fecha_str, pos, evento, eventos_restantes)
+        if evento.get("tipo_evento") == "entrega":
+            self.transito.quitar(evento)
+            self.capacidad.quitar(evento)
+
+    def al_actualizar(self, fecha_str, pos, anterior, evento):
+        """`anterior` es una copia del evento antes de modificarlo en su lugar."""
+        self.analitica.al_actualizar(fecha_str, pos, anterior, evento)
+        if evento.get("tipo_evento") == "entrega":
+            self.transito.quitar(evento)
+            self.transito.agregar(evento)
+            self.capacidad.quitar(anterior)
+            self.capacidad.agregar(evento)
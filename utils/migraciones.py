@@ -0,0 +1,296 @@
+import heapq
+import json
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+from utils import storage, storage_diario, storage_particionado, storage_sqlite
+from utils.archivos import bloqueo, escribir_json_atomico
+from utils.eventos import id_entrega_de_retorno
+
+# --- Migraciones del esquema de los eventos del calendario ---
+# Cada paso tiene un número de versión; la versión alcanzada se guarda junto al calendario
+# (data/calendar.esquema.json, o la tabla meta en SQLite) y solo corren los pasos más nuevos.
+# Los pasos son idempotentes: repetir uno sobre datos ya migrados no cambia nada, así que
+# un corte a la mitad se arregla volviendo a correr la migración.
+#
+# Todos los pasos pendientes se aplican en una sola pasada por fecha, día por día y evento
+# por evento, sobre el mismo calendario (nunca una segunda copia). La escritura es atómica
+# por archivo: el calendar.json completo, cada mes de data/calendar/, la foto del diario, o
+# una transacción en SQLite. Al terminar sube la versión del calendario, con lo que las
+# sesiones abiertas rearman sus índices en memoria.
+#
+#   python -m utils.migraciones --simular    (reporte de lo que cambiaría, sin escribir)
+#   python -m utils.migraciones              (migra el backend activo, REYMA_STORAGE)
+ESQUEMA_PATH = os.path.join("data", "calendar.esquema.json")
+
+MAX_AVISOS = 50  # avisos que se guardan en el reporte; el resto solo se cuenta
+
+
+@dataclass(frozen=True)
+class Paso:
+    version: int
+    nombre: str
+    descripcion: str
+    # Crea el estado de una pasada y devuelve procesar(fecha, eventos, avisar) -> eventos cambiados.
+    # `eventos` llega en orden de fecha y se modifica en el lugar.
+    crear: Callable
+
+
+def _fecha_retorno(entrega):
+    try:
+        dias = int(entrega.get("dias_retorno_calculados", entrega["dias_retorno"]))
+        return (date.fromisoformat(entrega["fecha_pedido"]) + timedelta(days=dias)).isoformat()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _asociar_retornos_sin_id():
+    """
+    Retornos sin ninguna clave de asociación (datos de antes de los ids): se les busca la
+    entrega por (unidad, cliente, fecha de carga). Cada entrega se recuerda solo hasta su
+    fecha de retorno, así que lo retenido son los pedidos en tránsito, no el historial.
+    """
+    entregas = {}  # (unidad, cliente, fecha_pedido) -> id
+    vencen = []  # (fecha de retorno, clave, id)
+
+    def procesar(fecha_str, eventos, avisar):
+        while vencen and vencen[0][0] < fecha_str:
+            _, clave, pedido_id = heapq.heappop(vencen)
+            if entregas.get(clave) == pedido_id:
+                del entregas[clave]
+        for evento in eventos:
+            if evento.get("tipo_evento") == "entrega" and evento.get("id"):
+                clave = (evento.get("unidad"), evento.get("cliente"), evento.get("fecha_pedido"))
+                entregas[clave] = evento["id"]
+                retorno = _fecha_retorno(evento)
+                if retorno is not None:
+                    heapq.heappush(vencen, (retorno, clave, evento["id"]))
+
+        cambiados = 0
+        for evento in eventos:
+            if evento.get("tipo_evento") != "retorno" or id_entrega_de_retorno(evento):
+                continue
+            clave = (evento.get("unidad"), evento.get("cliente_asociado", "Desconocido"),
+                     evento.get("fecha_pedido_asociado"))
+            if clave in entregas:
+                evento["id_entrega_asociada"] = entregas[clave]
+                cambiados += 1
+            else:
+                avisar(f"{fecha_str}: no se encontró la entrega del retorno {clave}")
+        return cambiados
+
+    return procesar
+
+
+def _unificar_clave_de_retorno():
+    """
+    Los retornos quedaban con `pedido_id_asociado` (lo que escribía la app) o con
+    `id_entrega_asociada` (lo que dejaba la migración de ids). Quedan todos con
+    `id_entrega_asociada`, en la misma posición que tenía la clave anterior.
+    """
+    def procesar(fecha_str, eventos, avisar):
+        cambiados = 0
+        for i, evento in enumerate(eventos):
+            if evento.get("tipo_evento") != "retorno" or "pedido_id_asociado" not in evento:
+                continue
+            id_entrega = id_entrega_de_retorno(evento)
+            if "id_entrega_asociada" in evento:
+                if evento["pedido_id_asociado"] not in (None, id_entrega):
+                    avisar(f"{fecha_str}: retorno con dos claves distintas; se conserva id_entrega_asociada "
+                           f"{id_entrega!r} y se descarta pedido_id_asociado {evento['pedido_id_asociado']!r}")
+                del evento["pedido_id_asociado"]
+            else:
+                eventos[i] = {("id_entrega_asociada" if clave == "pedido_id_asociado" else clave): valor
+                              for clave, valor in evento.items()}
+            cambiados += 1
+        return cambiados
+
+    return procesar
+
+
+PASOS = [
+    Paso(1, "retornos_sin_id", "Asocia los retornos sin id a su entrega por unidad, cliente y fecha de carga",
+         _asociar_retornos_sin_id),
+    Paso(2, "clave_unica_de_retorno", "Deja id_entrega_asociada como única clave de asociación de los retornos",
+         _unificar_clave_de_retorno),
+]
+VERSION_ACTUAL = PASOS[-1].version
+
+
+# --- Pasada sobre los días ---
+class _Pasada:
+    """Estado de los pasos pendientes durante una pasada, con el conteo de cambios y los avisos."""
+
+    def __init__(self, pasos):
+        self.pasos = pasos
+        self._procesadores = [paso.crear() for paso in pasos]
+        self.cambiados = {paso.nombre: 0 for paso in pasos}
+        self.avisos = []
+        self.total_avisos = 0
+
+    def _avisar(self, mensaje):
+        self.total_avisos += 1
+        if len(self.avisos) < MAX_AVISOS:
+            self.avisos.append(mensaje)
+
+    def dia(self, fecha_str, eventos):
+        """Aplica todos los pasos a un día; devuelve True si cambió algo."""
+        cambio = False
+        for paso, procesar in zip(self.pasos, self._procesadores):
+            cambiados = procesar(fecha_str, eventos, self._avisar)
+            self.cambiados[paso.nombre] += cambiados
+            cambio = cambio or cambiados > 0
+        return cambio
+
+    def dias(self, calendar):
+        """Aplica los pasos a un {fecha: eventos} en orden de fecha; devuelve True si cambió algo."""
+        cambio = False
+        for fecha_str in sorted(calendar):
+            cambio = self.dia(fecha_str, calendar[fecha_str]) or cambio
+        return cambio
+
+
+def pendientes(version):
+    return [paso for paso in PASOS if paso.version > version]
+
+
+def migrar_calendario(calendar, version=0):
+    """
+    Aplica en el lugar, sobre un {fecha: eventos} en memoria, los pasos posteriores a
+    `version`. Devuelve ({nombre del paso: eventos cambiados}, avisos).
+    """
+    pasada = _Pasada(pendientes(version))
+    pasada.dias(calendar)
+    return pasada.cambiados, pasada.avisos
+
+
+# --- Versión de esquema guardada ---
+def version_esquema():
+    if storage.STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.version_esquema()
+    try:
+        with open(ESQUEMA_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return 0
+
+
+def _guardar_version_esquema(version):
+    escribir_json_atomico(ESQUEMA_PATH, {"version": version, "pasos": [paso.nombre for paso in PASOS
+                                                                        if paso.version <= version],
+                                         "migrado": datetime.now().isoformat(timespec="seconds")})
+
+
+# --- Migración del backend activo ---
+def migrar(simular=False):
+    """
+    Lleva el calendario guardado a VERSION_ACTUAL con el backend activo. Con `simular` hace
+    la misma pasada sin escribir nada. Devuelve el reporte: backend, versión de origen y de
+    destino, eventos cambiados por paso, avisos y si fue simulación.
+    """
+    backend = storage.STORAGE_BACKEND
+    if backend == "sqlite":
+        version = storage_sqlite.version_esquema()
+        pasada = _Pasada(pendientes(version))
+        if pasada.pasos:
+            storage_sqlite.transformar(pasada.dia, VERSION_ACTUAL, escribir=not simular)
+    else:
+        with bloqueo(storage.CALENDAR_LOCK_PATH):
+            version = version_esquema()
+            pasada = _Pasada(pendientes(version))
+            if pasada.pasos:
+                _migrar_archivos(backend, pasada, simular)
+
+    return {
+        "backend": backend if backend != "json" or not storage_particionado.existe() else "json (particionado)",
+        "version_origen": version,
+        "version_destino": VERSION_ACTUAL if pasada.pasos else version,
+        "pasos": [{"version": paso.version, "nombre": paso.nombre, "descripcion": paso.descripcion,
+                   "eventos_cambiados": pasada.cambiados[paso.nombre]} for paso in pasada.pasos],
+        "avisos": pasada.avisos,
+        "total_avisos": pasada.total_avisos,
+        "simulado": simular,
+    }
+
+
+def _leer_calendar_json():
+    """
+    calendar.json para migrarlo: si no existe es un calendario vacío (no hay nada que migrar);
+    si no se puede leer como {fecha: eventos}, ValueError con la ruta en vez de migrar a medias.
+    """
+    try:
+        with open(storage.CALENDAR_PATH, "r", encoding="utf-8") as f:
+            calendar = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"{storage.CALENDAR_PATH} está dañado y no se migró: {e}") from e
+    if not isinstance(calendar, dict):
+        raise ValueError(f"{storage.CALENDAR_PATH} no tiene el formato {{fecha: eventos}} y no se migró")
+    return calendar
+
+
+def _migrar_archivos(backend, pasada, simular):
+    """Pasada sobre el backend de archivos con el candado exclusivo ya tomado."""
+    if backend == "diario":
+        # La foto más su registro; al escribir se compacta en una foto nueva (atómica)
+        calendar = storage_diario.load_calendar()
+        cambio = pasada.dias(calendar)
+        if cambio and not simular:
+            storage_diario.compactar(calendar)
+    elif storage_particionado.existe():
+        cambio = False
+
+        def _mes(dias):
+            nonlocal cambio
+            cambio_mes = pasada.dias(dias)
+            cambio = cambio or cambio_mes
+            return cambio_mes
+        storage_particionado.transformar(_mes, escribir=not simular)
+    else:
+        calendar = _leer_calendar_json()
+        cambio = pasada.dias(calendar)
+        if cambio and not simular:
+            escribir_json_atomico(storage.CALENDAR_PATH, calendar)
+
+    if simular:
+        return
+    if cambio:
+        # Como un save_calendar: las sesiones abiertas releen y rearman sus índices
+        escribir_json_atomico(storage.CALENDAR_VERSION_PATH, {
+            "version": storage.version_calendario() + 1, "guardado": datetime.now().isoformat(timespec="seconds")})
+    _guardar_version_esquema(VERSION_ACTUAL)
+
+
+def _imprimir_reporte(reporte):
+    print(f"📁 Backend: {reporte['backend']}. Esquema v{reporte['version_origen']} → v{reporte['version_destino']}"
+          f"{' (simulación, no se escribió nada)' if reporte['simulado'] else ''}")
+    if not reporte["pasos"]:
+        print("✅ El calendario ya está en la última versión; no hay pasos pendientes.")
+        return
+    for paso in reporte["pasos"]:
+        print(f"  {paso['version']}. {paso['nombre']}: {paso['eventos_cambiados']} eventos — {paso['descripcion']}")
+    for aviso in reporte["avisos"]:
+        print(f"  ⚠️ {aviso}")
+    if reporte["total_avisos"] > len(reporte["avisos"]):
+        print(f"  ⚠️ ... y {reporte['total_avisos'] - len(reporte['avisos'])} avisos más")
+    if not reporte["simulado"]:
+        print("✅ Migración completada.")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    try:
+        reporte = migrar(simular="--simular" in argv)
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    _imprimir_reporte(reporte)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
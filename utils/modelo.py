@@ -0,0 +1,248 @@
+import sys
+from dataclasses import dataclass
+from datetime import date
+
+# Modelo tipado del calendario para los cálculos: fechas como ordinales enteros
+# (date.toordinal()), unidades y clientes como códigos pequeños de un catálogo.
+# Se convierte desde y hacia el formato JSON de calendar.json sin perder nada: el orden
+# de las claves de cada evento, la clave de asociación del retorno y cualquier campo
+# desconocido o con valor inesperado se conservan tal cual.
+#
+# El calendario JSON sigue siendo la única copia que se guarda y se modifica. El modelo
+# se arma de paso para construir lo derivado (columnas de disponibilidad, árboles de
+# capacidad, índice de clientes) y se descarta: en caché quedan esas estructuras, no él.
+
+CLAVES_ASOCIACION = ("id_entrega_asociada", "pedido_id_asociado")
+
+_tuplas_de_claves = {}
+
+
+def _claves(evento):
+    # El mismo orden de claves se repite en casi todos los eventos: una sola tupla compartida
+    claves = tuple(evento)
+    return _tuplas_de_claves.setdefault(claves, claves)
+
+
+def _ordinal_o_none(valor):
+    if isinstance(valor, str):
+        try:
+            return date.fromisoformat(valor).toordinal()
+        except ValueError:
+            return None
+    return None
+
+
+class Catalogo:
+    """Asigna un código entero a cada nombre (unidad o cliente) y guarda el nombre una sola vez."""
+
+    def __init__(self, nombres=()):
+        self.nombres = []
+        self._codigos = {}
+        for nombre in nombres:
+            self.codigo(nombre)
+
+    def codigo(self, nombre):
+        codigo = self._codigos.get(nombre)
+        if codigo is None:
+            codigo = len(self.nombres)
+            nombre = sys.intern(nombre) if isinstance(nombre, str) else nombre
+            self.nombres.append(nombre)
+            self._codigos[nombre] = codigo
+        return codigo
+
+    def nombre(self, codigo):
+        return self.nombres[codigo]
+
+    def __len__(self):
+        return len(self.nombres)
+
+
+@dataclass(slots=True)
+class Entrega:
+    id: str
+    cliente: int
+    unidad: int
+    dias_retorno: int
+    dias_retorno_calculados: int
+    fecha_pedido: int
+    claves: tuple
+    extra: dict = None  # claves fuera del esquema o con valores que no encajan en los campos
+
+    @property
+    def fecha_retorno(self):
+        return self.fecha_pedido + self.dias_retorno_calculados
+
+
+@dataclass(slots=True)
+class Retorno:
+    unidad: int
+    id_entrega: str
+    cliente: int
+    fecha_pedido: int
+    id: str
+    claves: tuple
+    extra: dict = None
+
+
+class CalendarioModelo:
+    """
+    Calendario en memoria: `dias` mapea el ordinal de cada fecha a sus eventos
+    (Entrega / Retorno) en el mismo orden que en el JSON. Una clave de fecha que no
+    es 'YYYY-MM-DD' se conserva como texto, con sus eventos sin convertir.
+    """
+
+    def __init__(self, unidades=None, clientes=None):
+        self.unidades = unidades if unidades is not None else Catalogo()
+        self.clientes = clientes if clientes is not None else Catalogo()
+        self.dias = {}
+
+    # --- Conversión desde el formato JSON ---
+    @classmethod
+    def desde_json(cls, calendar, unidades=()):
+        modelo = cls(Catalogo(unidades))
+        for fecha_str, eventos in calendar.items():
+            dia = _ordinal_o_none(fecha_str)
+            if dia is None or date.fromordinal(dia).isoformat() != fecha_str:
+                modelo.dias[fecha_str] = eventos
+                continue
+            modelo.dias[dia] = [modelo._desde_evento(evento) for evento in eventos]
+        return modelo
+
+    def _desde_evento(self, evento):
+        tipo = evento.get("tipo_evento")
+        if tipo == "entrega":
+            return self._entrega_desde(evento)
+        if tipo == "retorno":
+            return self._retorno_desde(evento)
+        return dict(evento)  # tipo desconocido: se conserva el diccionario
+
+    def _entrega_desde(self, evento):
+        extra = {}
+        campos = {}
+        for clave, valor in evento.items():
+            if clave == "tipo_evento":
+                continue
+            if clave in ("cliente", "unidad") and isinstance(valor, str):
+                catalogo = self.clientes if clave == "cliente" else self.unidades
+                campos[clave] = catalogo.codigo(valor)
+            elif clave in ("dias_retorno", "dias_retorno_calculados") and type(valor) is int:
+                campos[clave] = valor
+            elif clave == "fecha_pedido" and _ordinal_o_none(valor) is not None \
+                    and date.fromisoformat(valor).isoformat() == valor:
+                campos[clave] = _ordinal_o_none(valor)
+            elif clave == "id" and isinstance(valor, str):
+                campos[clave] = valor
+            else:
+                extra[clave] = valor
+        return Entrega(
+            id=campos.get("id"),
+            cliente=campos.get("cliente"),
+            unidad=campos.get("unidad"),
+            dias_retorno=campos.get("dias_retorno"),
+            # Sin ajuste de sábado guardado, los días efectivos son los configurados
+            dias_retorno_calculados=campos.get("dias_retorno_calculados") if "dias_retorno_calculados" in evento
+            else campos.get("dias_retorno"),
+            fecha_pedido=campos.get("fecha_pedido"),
+            claves=_claves(evento),
+            extra=extra or None
+        )
+
+    def _retorno_desde(self, evento):
+        extra = {}
+        campos = {}
+        for clave, valor in evento.items():
+            if clave == "tipo_evento":
+                continue
+            if clave == "unidad" and isinstance(valor, str):
+                campos[clave] = self.unidades.codigo(valor)
+            elif clave == "cliente_asociado" and isinstance(valor, str):
+                campos[clave] = self.clientes.codigo(valor)
+            elif clave == "fecha_pedido_asociado" and _ordinal_o_none(valor) is not None \
+                    and date.fromisoformat(valor).isoformat() == valor:
+                campos[clave] = _ordinal_o_none(valor)
+            elif clave in CLAVES_ASOCIACION and isinstance(valor, str) and "id_entrega" not in campos:
+                campos["id_entrega"] = valor
+            elif clave == "id" and isinstance(valor, str):
+                campos[clave] = valor
+            else:
+                extra[clave] = valor
+        return Retorno(
+            unidad=campos.get("unidad"),
+            id_entrega=campos.get("id_entrega"),
+            cliente=campos.get("cliente_asociado"),
+            fecha_pedido=campos.get("fecha_pedido_asociado"),
+            id=campos.get("id"),
+            claves=_claves(evento),
+            extra=extra or None
+        )
+
+    # --- Conversión de vuelta al formato JSON ---
+    def a_json(self):
+        calendar = {}
+        for dia, eventos in self.dias.items():
+            if isinstance(dia, str):
+                calendar[dia] = eventos
+            else:
+                calendar[date.fromordinal(dia).isoformat()] = [self.a_evento(evento) for evento in eventos]
+        return calendar
+
+    def a_evento(self, evento):
+        if isinstance(evento, Entrega):
+            valores = {
+                "tipo_evento": "entrega",
+                "id": evento.id,
+                "cliente": self._nombre(self.clientes, evento.cliente),
+                "unidad": self._nombre(self.unidades, evento.unidad),
+                "dias_retorno": evento.dias_retorno,
+                "dias_retorno_calculados": evento.dias_retorno_calculados,
+                "fecha_pedido": self._fecha(evento.fecha_pedido),
+            }
+        elif isinstance(evento, Retorno):
+            valores = {
+                "tipo_evento": "retorno",
+                "id": evento.id,
+                "unidad": self._nombre(self.unidades, evento.unidad),
+                "id_entrega_asociada": evento.id_entrega,
+                "pedido_id_asociado": evento.id_entrega,
+                "cliente_asociado": self._nombre(self.clientes, evento.cliente),
+                "fecha_pedido_asociado": self._fecha(evento.fecha_pedido),
+            }
+        else:
+            return dict(evento)
+        extra = evento.extra or {}
+        return {clave: extra[clave] if clave in extra else valores[clave] for clave in evento.claves}
+
+    @staticmethod
+    def _nombre(catalogo, codigo):
+        return None if codigo is None else catalogo.nombre(codigo)
+
+    @staticmethod
+    def _fecha(ordinal):
+        return None if ordinal is None else date.fromordinal(ordinal).isoformat()
+
+    # --- Recorridos para los cálculos ---
+    def entregas(self):
+        """Todas las entregas del calendario, en orden de fecha del JSON."""
+        for eventos in self.dias.values():
+            for evento in eventos:
+                if isinstance(evento, Entrega):
+                    yield evento
+
+    def retornos(self):
+        """Pares (ordinal del día, retorno)."""
+        for dia, eventos in self.dias.items():
+            if isinstance(dia, str):
+                continue
+            for evento in eventos:
+                if isinstance(evento, Retorno):
+                    yield dia, evento
+
+    def intervalos(self):
+        """
+        (código de unidad, ordinal de carga, ordinal de retorno) de cada entrega con datos
+        completos; la unidad está ocupada en [carga, retorno).
+        """
+        for entrega in self.entregas():
+            if entrega.unidad is None or entrega.fecha_pedido is None or entrega.dias_retorno_calculados is None:
+                continue
+            yield entrega.unidad, entrega.fecha_pedido, entrega.fecha_retorno
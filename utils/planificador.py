@@ -0,0 +1,152 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.calendar_logic import calcular_dias_retorno
+
+# --- Asignación automática de unidad y fecha de carga ---
+# Para un lote de pedidos (los del Excel cargado) propone a cada uno un tipo de unidad y un
+# día de carga sin dejar ningún día con sobrecupo, contando lo ya comprometido en el
+# calendario. Es voraz: primero los pedidos más urgentes y más restringidos, y cada uno toma
+# el primer día posible; entre unidades que sirven ese día, la que más libres conserva en
+# el viaje, para guardar las escasas a quien solo puede usar esas. Cada prueba es un mínimo
+# en ventana deslizante con NumPy sobre las libres por unidad y día: 1,000 pedidos toman
+# unas decenas de milisegundos.
+
+HORIZONTE_DIAS = 14  # días de carga posibles para pedidos sin fecha límite, contando `desde`
+
+
+def _fecha(valor):
+    if valor is None or (not isinstance(valor, (date, str)) and pd.isna(valor)):
+        return None
+    return pd.Timestamp(valor).date()
+
+
+def pedidos_desde_excel(df):
+    """
+    Pedidos a planificar a partir de los pedidos de Excel guardados. Las unidades posibles
+    salen de "Unidades permitidas" o, si no hay, de "Unidad"; "Fecha" es el primer día de
+    carga aceptable y "Fecha límite" el último. `fila` es la del índice más uno, como en la app.
+    """
+    pedidos = []
+    for i in df.index:
+        permitidas = df.at[i, "Unidades permitidas"] if "Unidades permitidas" in df.columns else None
+        if pd.notna(permitidas) and str(permitidas).strip():
+            unidades = [u.strip() for u in str(permitidas).split(",") if u.strip()]
+        elif "Unidad" in df.columns and pd.notna(df.at[i, "Unidad"]):
+            unidades = [str(df.at[i, "Unidad"])]
+        else:
+            unidades = None
+        pedidos.append({
+            "fila": i + 1,
+            "cliente": df.at[i, "Cliente"],
+            "dias_retorno": int(df.at[i, "Días Retorno"]),
+            "unidades": unidades,
+            "fecha_minima": _fecha(df.at[i, "Fecha"]) if "Fecha" in df.columns else None,
+            "fecha_limite": _fecha(df.at[i, "Fecha límite"]) if "Fecha límite" in df.columns else None,
+        })
+    return pedidos
+
+
+def _libres_por_dia(columnas, units, unidades, d0, dias):
+    """Unidades libres por tipo (renglón) y día [d0, d0 + dias) con lo ya comprometido en el calendario."""
+    codigo = {unidad: i for i, unidad in enumerate(unidades)}
+    traduccion = np.array([codigo.get(nombre, -1) for nombre in columnas["unidades"]] + [-1], dtype=np.int64)
+    u = traduccion[columnas["entregas_unidad"]]
+    inicio = np.clip(columnas["entregas_inicio"] - d0, 0, dias)
+    fin = np.clip(columnas["entregas_fin"] - d0, 0, dias)
+    dentro = (u >= 0) & (inicio < fin)
+    diferencias = np.zeros((len(unidades), dias + 1), dtype=np.int64)
+    np.add.at(diferencias, (u[dentro], inicio[dentro]), 1)
+    np.add.at(diferencias, (u[dentro], fin[dentro]), -1)
+    ocupadas = np.cumsum(diferencias, axis=1)[:, :dias]
+    base = np.array([units[unidad] for unidad in unidades], dtype=np.int64).reshape(-1, 1)
+    return base - ocupadas
+
+
+def planificar(pedidos, units, columnas, desde, horizonte=HORIZONTE_DIAS):
+    """
+    Propone unidad y fecha de carga para `pedidos` (ver `pedidos_desde_excel`) a partir del
+    día `desde`, con las columnas del calendario de `utils.disponibilidad.columnas_calendario`.
+    Respeta el día extra de las cargas en sábado (`calcular_dias_retorno`) y nunca deja un
+    día con menos de cero unidades libres, igual que la revisión de `agregar_pedido`.
+
+    Devuelve (asignados, sin_asignar). Los asignados tienen "fila", "cliente", "unidad",
+    "fecha_pedido" (date), "dias_retorno" y "dias_retorno_calculados", listos para
+    `agregar_pedidos`, en el orden en que se planificaron: registrarlos en ese orden repite
+    las mismas revisiones de capacidad (un viaje de 0 días pide una unidad libre sin ocuparla,
+    así que el orden importa). Los sin asignar, en el orden de `pedidos`, traen "fila",
+    "cliente" y "motivo".
+    """
+    unidades = list(units.keys())
+    codigo = {unidad: i for i, unidad in enumerate(unidades)}
+    d0 = desde.toordinal()
+
+    # Ventana de días de carga de cada pedido, relativa a `desde`
+    ventanas = []
+    for pedido in pedidos:
+        minima = pedido.get("fecha_minima")
+        limite = pedido.get("fecha_limite")
+        primero = max(0, minima.toordinal() - d0) if minima else 0
+        ultimo = min(horizonte - 1, limite.toordinal() - d0) if limite else horizonte - 1
+        ventanas.append((primero, ultimo))
+    dias_max = max((pedido["dias_retorno"] for pedido in pedidos), default=0)
+    dias = max((ultimo for _, ultimo in ventanas), default=0) + dias_max + 2  # +1 del sábado
+    libres = _libres_por_dia(columnas, units, unidades, d0, max(dias, 1))
+    es_sabado = np.array([date.fromordinal(d0 + k).weekday() == 5 for k in range(libres.shape[1])])
+
+    # Primero los de fecha límite más cercana y con menos unidades posibles; luego los viajes cortos
+    orden = sorted(range(len(pedidos)), key=lambda j: (
+        ventanas[j][1], len(pedidos[j].get("unidades") or unidades), pedidos[j]["dias_retorno"], j))
+
+    asignados, sin_asignar = [], {}
+    for j in orden:
+        pedido = pedidos[j]
+        primero, ultimo = ventanas[j]
+        if ultimo < primero:
+            limite = pedido.get("fecha_limite")
+            if primero >= horizonte and not (limite and limite.toordinal() - d0 < primero):
+                fin = desde + timedelta(days=horizonte - 1)
+                motivo = f"Su primera fecha de carga queda fuera del horizonte (hasta {fin.isoformat()})."
+            else:
+                motivo = "La fecha límite queda antes de la primera fecha de carga posible."
+            sin_asignar[j] = {"fila": pedido.get("fila", j), "cliente": pedido["cliente"], "motivo": motivo}
+            continue
+        posibles = [codigo[u] for u in (pedido.get("unidades") or unidades) if u in codigo]
+        if not posibles:
+            sin_asignar[j] = {"fila": pedido.get("fila", j), "cliente": pedido["cliente"],
+                              "motivo": f"Ninguna de sus unidades está configurada: {', '.join(pedido.get('unidades') or [])}."}
+            continue
+
+        dias_retorno = pedido["dias_retorno"]
+        candidatos = np.arange(primero, ultimo + 1)
+        mejor = None  # (día, -libres en el viaje, renglón)
+        for u in posibles:
+            fila = libres[u]
+            # Como en verificar_capacidad, un viaje de 0 días pide una unidad libre el día de carga
+            ventana = max(dias_retorno, 1)
+            minimos = np.lib.stride_tricks.sliding_window_view(fila[primero:ultimo + ventana], ventana).min(axis=1)
+            if dias_retorno <= 2:
+                for k in candidatos[es_sabado[primero:ultimo + 1]]:
+                    minimos[k - primero] = fila[k:k + dias_retorno + 1].min()
+            validos = np.flatnonzero(minimos >= 1)
+            if validos.size:
+                k = validos[0]
+                opcion = (int(candidatos[k]), -int(minimos[k]), u)
+                if mejor is None or opcion < mejor:
+                    mejor = opcion
+
+        if mejor is None:
+            sin_asignar[j] = {"fila": pedido.get("fila", j), "cliente": pedido["cliente"],
+                              "motivo": "No quedan unidades posibles libres para todo el viaje en el horizonte."}
+            continue
+        k, _, u = mejor
+        fecha_pedido = desde + timedelta(days=k)
+        calculados = calcular_dias_retorno(fecha_pedido, dias_retorno)
+        libres[u, k:k + calculados] -= 1
+        asignados.append({"fila": pedido.get("fila", j), "cliente": pedido["cliente"], "unidad": unidades[u],
+                          "fecha_pedido": fecha_pedido, "dias_retorno": dias_retorno,
+                          "dias_retorno_calculados": calculados})
+
+    return asignados, [sin_asignar[j] for j in range(len(pedidos)) if j in sin_asignar]
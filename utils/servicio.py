@@ -0,0 +1,367 @@
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from utils.calendar_logic import agregar_pedidos, editar_dias_retorno, eliminar_pedido
+from utils import exportacion
+from utils.disponibilidad import columnas_calendario, pronostico_disponibilidad
+from utils.historial import registrar_auditoria, usuario_del_sistema
+from utils.indices import IndicesCalendario
+from utils.storage import escritura_calendario, load_calendar, load_calendar_rango, load_units, obtener_derivado, \
+    save_calendar
+
+# --- Uso sin Streamlit: CLI y servicio HTTP/JSON local ---
+# Las mismas operaciones de la app sobre el mismo almacenamiento, sin reruns de por medio.
+# Todas reciben lotes: una carga y un solo save_calendar por llamada, sin importar cuántos pedidos.
+# Cada operación que modifica el calendario corre completa bajo storage.escritura_calendario,
+# el mismo candado que toma la app: el calendario en caché y sus índices son de todo el proceso.
+# Cada lote guardado queda en la auditoría (utils.historial) con el usuario REYMA_USUARIO o el del sistema.
+#
+#   python -m utils.servicio registrar --cliente "PDS Cancún" --unidad Torton --fecha 2025-08-01 --dias 3
+#   python -m utils.servicio registrar-lote pedidos.json     (lista JSON; "-" lee de la entrada estándar)
+#   python -m utils.servicio eliminar ID [ID ...]
+#   python -m utils.servicio editar-dias ID DIAS
+#   python -m utils.servicio disponibilidad --desde 2025-08-01 --hasta 2025-08-31
+#   python -m utils.servicio exportar [--desde ...] [--hasta ...]      (calendario en JSON, tal como se guarda)
+#   python -m utils.servicio exportar --formato csv|parquet|xlsx [--salida pedidos.csv] [--unidad Torton ...]
+#                                                                     (una fila por pedido; ver utils.exportacion)
+#   python -m utils.servicio servir [--host 127.0.0.1] [--puerto 8502]
+#
+# Endpoints del servicio (cuerpos y respuestas en JSON):
+#   POST /pedidos                {"pedidos": [{"cliente", "unidad", "fecha_pedido", "dias_retorno"}, ...],
+#                                 "permitir_sobrecupo": false}
+#   POST /pedidos/eliminar       {"ids": [...]}
+#   POST /pedidos/dias-retorno   {"pedidos": [{"id", "dias_retorno"}, ...]}
+#   GET  /disponibilidad?desde=YYYY-MM-DD&hasta=YYYY-MM-DD
+#   GET  /exportar[?desde=...&hasta=...]
+#   GET  /salud
+PUERTO = 8502
+
+
+def _fecha(valor, campo):
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor))
+    except ValueError:
+        raise ValueError(f"{campo} no es una fecha 'YYYY-MM-DD': {valor!r}")
+
+
+def _dias_retorno(valor):
+    """Días de retorno enteros y al menos 1, como en el Excel y en el editor de la app."""
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(f"dias_retorno no es un número entero: {valor!r}")
+    try:
+        dias = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"dias_retorno no es un número entero: {valor!r}")
+    if dias < 1:
+        raise ValueError(f"dias_retorno debe ser al menos 1: {dias}")
+    return dias
+
+
+def _datos_calendario():
+    calendar = load_calendar()
+    indices = obtener_derivado("calendar", "indices", IndicesCalendario.desde_calendario)
+    return calendar, indices
+
+
+def _auditar(accion, descripcion, cambios):
+    registrar_auditoria(usuario_del_sistema(), "servicio", accion, descripcion, cambios)
+
+
+def _cliente(valor):
+    if not isinstance(valor, str) or not valor.strip():
+        raise ValueError(f"cliente debe ser un texto no vacío: {valor!r}")
+    return valor.strip()
+
+
+def _unidad(valor, units):
+    if not isinstance(valor, str) or valor not in units:
+        raise ValueError(f"unidad desconocida: {valor!r} (unidades: {', '.join(units)})")
+    return valor
+
+
+def registrar(pedidos, permitir_sobrecupo=False):
+    """
+    Registra una lista de pedidos {"cliente", "unidad", "fecha_pedido" ('YYYY-MM-DD' o date),
+    "dias_retorno"} con la misma revisión de capacidad de la app. Devuelve el reporte de
+    `agregar_pedidos`, con el id de cada pedido registrado. Una fila que no es un objeto,
+    sin cliente, con una unidad que no está en las unidades configuradas o con fecha o días
+    no válidos queda en el reporte como "Pedido inválido" y no se registra.
+    """
+    if not isinstance(pedidos, list):
+        raise ValueError("pedidos debe ser una lista")
+    units = load_units()
+    lote, invalidos = [], {}
+    for fila, pedido in enumerate(pedidos):
+        if not isinstance(pedido, dict):
+            invalidos[fila] = {"fila": fila, "cliente": None, "unidad": None, "ok": False,
+                               "mensaje": f"Pedido inválido: se esperaba un objeto, no {pedido!r}", "id": None}
+            continue
+        pedido = dict(pedido, fila=pedido.get("fila", fila))
+        try:
+            pedido["cliente"] = _cliente(pedido.get("cliente"))
+            pedido["unidad"] = _unidad(pedido.get("unidad"), units)
+            pedido["fecha_pedido"] = _fecha(pedido.get("fecha_pedido"), "fecha_pedido")
+            pedido["dias_retorno"] = _dias_retorno(pedido.get("dias_retorno"))
+        except ValueError as e:
+            invalidos[fila] = {"fila": pedido["fila"], "cliente": pedido.get("cliente"), "unidad": pedido.get("unidad"),
+                               "ok": False, "mensaje": f"Pedido inválido: {e}", "id": None}
+            continue
+        lote.append(pedido)
+
+    with escritura_calendario:
+        calendar, indices = _datos_calendario()
+        cambios = []
+        reporte = iter(agregar_pedidos(calendar, units, lote, indices=indices, cambios=cambios,
+                                       permitir_sobrecupo=permitir_sobrecupo))
+        if cambios:
+            save_calendar(calendar, cambios)
+            _auditar("agregar", f"Registro de {len(cambios) // 2} pedidos", cambios)
+    return [invalidos[fila] if fila in invalidos else next(reporte) for fila in range(len(pedidos))]
+
+
+def eliminar(ids):
+    """Elimina varios pedidos (y sus retornos). Devuelve [{"id", "ok", "mensaje"}]."""
+    if not isinstance(ids, list):
+        raise ValueError("ids debe ser una lista")
+    with escritura_calendario:
+        units = load_units()
+        calendar, indices = _datos_calendario()
+        cambios = []
+        reporte = []
+        for pedido_id in ids:
+            if isinstance(pedido_id, str):
+                ok, mensaje = eliminar_pedido(calendar, units, pedido_id, indices=indices, cambios=cambios)
+            else:
+                ok, mensaje = False, f"Pedido inválido: el id debe ser un texto, no {pedido_id!r}"
+            reporte.append({"id": pedido_id, "ok": ok, "mensaje": mensaje})
+        if cambios:
+            save_calendar(calendar, cambios)
+            _auditar("eliminar", f"Eliminar {sum(1 for r in reporte if r['ok'])} pedidos", cambios)
+    return reporte
+
+
+def editar_dias(pedidos):
+    """Cambia los días de retorno de varios pedidos [{"id", "dias_retorno"}]. Devuelve [{"id", "ok", "mensaje"}]."""
+    if not isinstance(pedidos, list):
+        raise ValueError("pedidos debe ser una lista")
+    with escritura_calendario:
+        units = load_units()
+        calendar, indices = _datos_calendario()
+        cambios = []
+        reporte = []
+        for pedido in pedidos:
+            try:
+                dias = _dias_retorno(pedido["dias_retorno"])
+                ok, mensaje = editar_dias_retorno(calendar, units, pedido["id"], dias, indices=indices,
+                                                  cambios=cambios)
+            except (KeyError, TypeError, ValueError) as e:
+                ok, mensaje = False, f"Pedido inválido: {e}"
+            reporte.append({"id": pedido.get("id") if isinstance(pedido, dict) else None, "ok": ok, "mensaje": mensaje})
+        if cambios:
+            save_calendar(calendar, cambios)
+            _auditar("editar_dias", f"Días de retorno de {sum(1 for r in reporte if r['ok'])} pedidos", cambios)
+    return reporte
+
+
+def disponibilidad(desde, hasta):
+    """Cargas, retornos, en tránsito y disponibles por unidad y día entre `desde` y `hasta` (inclusive)."""
+    desde, hasta = _fecha(desde, "desde"), _fecha(hasta, "hasta")
+    if hasta < desde:
+        raise ValueError("hasta es anterior a desde")
+    # Armar las columnas recorre el calendario compartido: no debe cruzarse con una escritura.
+    # Lo que resulta son arreglos nuevos que ninguna escritura modifica después.
+    with escritura_calendario:
+        units = load_units()
+        columnas = obtener_derivado("calendar", "columnas_disponibilidad", columnas_calendario)
+    pronostico = pronostico_disponibilidad(columnas, units, desde, (hasta - desde).days + 1)
+    return [
+        {"unidad": unidad, "fecha": fecha.isoformat(), "cargas": int(fila["Cargas"]),
+         "retornos": int(fila["Retornos"]), "en_transito": int(fila["En Tránsito"]),
+         "disponibles": int(fila["Disponibles"])}
+        for (unidad, fecha), fila in pronostico.iterrows()
+    ]
+
+
+def exportar(desde=None, hasta=None):
+    """
+    El calendario tal como está guardado ({fecha: [eventos]}), completo o entre dos fechas.
+    Devuelve una copia tomada con el candado de escritura: se serializa después, mientras otro
+    hilo puede estar modificando el calendario en caché.
+    """
+    desde = _fecha(desde, "desde").isoformat() if desde is not None else None
+    hasta = _fecha(hasta, "hasta").isoformat() if hasta is not None else None
+    with escritura_calendario:
+        if desde is None and hasta is None:
+            calendar = load_calendar()
+        else:
+            calendar = load_calendar_rango(desde or "0000-01-01", hasta or "9999-12-31")
+        return {fecha: [dict(evento) for evento in eventos] for fecha, eventos in calendar.items()}
+
+
+# --- Servicio HTTP ---
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "ReymaServicio/1.0"
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _cuerpo(self):
+        longitud = int(self.headers.get("Content-Length") or 0)
+        if not longitud:
+            return {}
+        cuerpo = json.loads(self.rfile.read(longitud))
+        if not isinstance(cuerpo, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON")
+        return cuerpo
+
+    def _atender(self, rutas):
+        url = urlparse(self.path)
+        operacion = rutas.get(url.path.rstrip("/") or "/")
+        if operacion is None:
+            self._responder(404, {"error": f"No existe {self.command} {url.path}"})
+            return
+        try:
+            parametros = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+            self._responder(200, operacion(self, parametros))
+        except (ValueError, KeyError, TypeError) as e:  # json.JSONDecodeError es un ValueError
+            self._responder(400, {"error": str(e)})
+        except Exception as e:
+            self._responder(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        self._atender({
+            "/salud": lambda _, p: {"ok": True},
+            "/disponibilidad": lambda _, p: disponibilidad(p["desde"], p["hasta"]),
+            "/exportar": lambda _, p: exportar(p.get("desde"), p.get("hasta")),
+        })
+
+    def do_POST(self):
+        self._atender({
+            "/pedidos": lambda m, _: _con_resumen(registrar(*_lote(m._cuerpo()))),
+            "/pedidos/eliminar": lambda m, _: _con_resumen(eliminar(m._cuerpo()["ids"])),
+            "/pedidos/dias-retorno": lambda m, _: _con_resumen(editar_dias(m._cuerpo()["pedidos"])),
+        })
+
+    def log_message(self, formato, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {self.address_string()} {formato % args}\n")
+
+
+def _lote(cuerpo):
+    pedidos = cuerpo["pedidos"]
+    if not isinstance(pedidos, list):
+        raise ValueError("'pedidos' debe ser una lista")
+    return pedidos, bool(cuerpo.get("permitir_sobrecupo", False))
+
+
+def _con_resumen(reporte):
+    return {"total": len(reporte), "ok": sum(1 for r in reporte if r["ok"]), "resultados": reporte}
+
+
+def servir(host="127.0.0.1", puerto=PUERTO):
+    servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    print(f"🚚 Servicio en http://{host}:{puerto} (Ctrl+C para detener)", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+# --- CLI ---
+def _imprimir(datos):
+    json.dump(datos, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.servicio",
+                                     description="Operaciones del calendario sin la interfaz de Streamlit.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("registrar", help="Registra un pedido")
+    p.add_argument("--cliente", required=True)
+    p.add_argument("--unidad", required=True)
+    p.add_argument("--fecha", required=True, help="Fecha de carga YYYY-MM-DD")
+    p.add_argument("--dias", type=int, required=True, help="Días de retorno")
+    p.add_argument("--sobrecupo", action="store_true", help="Registrar aunque no haya unidades disponibles")
+
+    p = sub.add_parser("registrar-lote", help="Registra una lista JSON de pedidos")
+    p.add_argument("archivo", help='Archivo JSON con la lista de pedidos, o "-" para la entrada estándar')
+    p.add_argument("--sobrecupo", action="store_true")
+
+    p = sub.add_parser("eliminar", help="Elimina pedidos por id")
+    p.add_argument("ids", nargs="+")
+
+    p = sub.add_parser("editar-dias", help="Cambia los días de retorno de un pedido")
+    p.add_argument("id")
+    p.add_argument("dias", type=int)
+
+    p = sub.add_parser("disponibilidad", help="Disponibilidad por unidad y día")
+    p.add_argument("--desde", default=date.today().isoformat())
+    p.add_argument("--hasta", default=(date.today() + timedelta(days=6)).isoformat())
+
+    p = sub.add_parser("exportar", help="Calendario en JSON, o una fila por pedido en CSV, Parquet o Excel")
+    p.add_argument("--desde")
+    p.add_argument("--hasta")
+    p.add_argument("--formato", choices=("json",) + exportacion.FORMATOS, default="json")
+    p.add_argument("--salida", help="Archivo de salida (CSV sin --salida va a la salida estándar)")
+    p.add_argument("--unidad", action="append", help="Solo esta unidad (se puede repetir)")
+
+    p = sub.add_parser("servir", help="Inicia el servicio HTTP/JSON")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--puerto", type=int, default=PUERTO)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.comando == "registrar":
+            reporte = registrar([{"cliente": args.cliente, "unidad": args.unidad, "fecha_pedido": args.fecha,
+                                  "dias_retorno": args.dias}], args.sobrecupo)
+        elif args.comando == "registrar-lote":
+            if args.archivo == "-":
+                pedidos = json.load(sys.stdin)
+            else:
+                with open(args.archivo, "r", encoding="utf-8") as f:
+                    pedidos = json.load(f)
+            reporte = registrar(pedidos, args.sobrecupo)
+        elif args.comando == "eliminar":
+            reporte = eliminar(args.ids)
+        elif args.comando == "editar-dias":
+            reporte = editar_dias([{"id": args.id, "dias_retorno": args.dias}])
+        elif args.comando == "disponibilidad":
+            _imprimir(disponibilidad(args.desde, args.hasta))
+            return 0
+        elif args.comando == "exportar" and args.formato == "json":
+            _imprimir(exportar(args.desde, args.hasta))
+            return 0
+        elif args.comando == "exportar":
+            if args.salida is None and args.formato != "csv":
+                raise ValueError(f"--formato {args.formato} requiere --salida")
+            desde = _fecha(args.desde, "desde") if args.desde else None
+            hasta = _fecha(args.hasta, "hasta") if args.hasta else None
+            filas = exportacion.exportar(args.salida or sys.stdout.buffer, args.formato, desde, hasta, args.unidad)
+            print(f"✅ {filas} pedidos exportados", file=sys.stderr)
+            return 0
+        else:
+            servir(args.host, args.puerto)
+            return 0
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    _imprimir(_con_resumen(reporte))
+    return 0 if all(r["ok"] for r in reporte) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,44 @@
+import functools
 import json
 import os
+import threading
+from datetime import datetime
+import numpy as np
 import pandas as pd # Necesitamos pandas para manejar DataFrames
 
+from utils import storage_columnar, storage_diario, storage_particionado, storage_sqlite
+from utils.archivos import bloqueo, escribir_json_atomico
+from utils.cambios import aplicar_cambios
+from utils.diagnostico import medido
+from utils.texto import normalizar_texto
+
+# --- Backend de almacenamiento ---
+#   "json":   archivos en data/ (por defecto). El calendario va por mes en data/calendar/
+#             si existe esa carpeta (`python -m utils.storage_particionado` la crea desde
+#             calendar.json); si no, en el calendar.json de un solo archivo.
+#   "diario": calendar.json como foto + registro de cambios data/calendar.wal.jsonl
+#   "sqlite": data/reyma.db. Para pasar a SQLite: `python -m utils.storage_sqlite`
+#             importa los JSON actuales y luego se arranca la app con REYMA_STORAGE=sqlite.
+STORAGE_BACKEND = os.environ.get("REYMA_STORAGE", "json")
+
 # --- Rutas base de los archivos JSON ---
 UNITS_PATH = os.path.join("data", "units.json")
 CALENDAR_PATH = os.path.join("data", "calendar.json")
-PEDIDOS_EXCEL_PATH = os.path.join("data", "pedidos_excel_guardados.json") # Nueva ruta para los pedidos del Excel
+PEDIDOS_EXCEL_PATH = os.path.join("data", "pedidos_excel_guardados.json") # Formato anterior: se lee si aún no hay columnar
+
+# --- Varias sesiones o procesos sobre el mismo calendario (backends "json" y "diario") ---
+# Cada save_calendar toma el candado exclusivo y sube la versión guardada en
+# calendar.version.json; las lecturas toman el candado compartido. Si la versión en disco
+# ya no es la que se cargó, los `cambios` de la sesión se reaplican sobre la última versión
+# en lugar de escribir su copia vieja encima (ver save_calendar). SQLite usa sus transacciones.
+CALENDAR_VERSION_PATH = os.path.join("data", "calendar.version.json")
+CALENDAR_LOCK_PATH = os.path.join("data", "calendar.lock")
+
+# --- Varios hilos del mismo proceso (sesiones de Streamlit, hilos del servicio HTTP) ---
+# Todos comparten el calendario en caché y sus índices, que calendar_logic modifica en el
+# lugar: el candado de archivo no los separa. Cada operación que modifica el calendario corre
+# completa (cargar, modificar, save_calendar y registrar en el historial) con este candado.
+escritura_calendario = threading.RLock()
 
 # --- Utilidad genérica para asegurar que el directorio y el archivo existen ---
 def _asegurar_directorio_y_archivo(path, estructura_inicial):
@@ -21,9 +54,98 @@ def _asegurar_directorio_y_archivo(path, estructura_inicial):
         with open(path, "w", encoding='utf-8') as f: # Usa utf-8 para consistencia
             json.dump(estructura_inicial, f, indent=2) # Añadido indent para legibilidad
 
+# --- Caché en memoria entre reruns de Streamlit ---
+# Cada dato se guarda junto a una firma: backend, contador de versión y (mtime, tamaño)
+# de sus archivos. Si la firma no cambió se devuelve el mismo objeto sin releer disco.
+# El objeto es compartido: solo debe modificarse justo antes del save_* correspondiente,
+# que además invalida la entrada (y sus derivados) subiendo el contador de versión.
+# Excepción: los derivados de DERIVADOS_INCREMENTALES los mantiene al día calendar_logic
+# junto con el calendario en memoria, así que al guardar con `cambios` se conservan.
+DERIVADOS_INCREMENTALES = {"calendar": {"indices"}}
+_cache = {}  # nombre -> (firma, valor)
+_cache_derivados = {}  # (nombre, clave) -> (firma, valor)
+_versiones = {}  # nombre -> número de save_* hechos por este proceso
+_base = {}  # nombre -> (objeto cargado, versión guardada cuando se cargó)
+
+def _rutas_de(nombre):
+    """Archivos de los que depende cada dato según el backend activo."""
+    if STORAGE_BACKEND == "sqlite":
+        return [storage_sqlite.DB_PATH, storage_sqlite.DB_PATH + "-wal"]
+    if nombre == "calendar" and STORAGE_BACKEND == "diario":
+        return [storage_diario.CALENDAR_PATH, storage_diario.DIARIO_PATH, CALENDAR_VERSION_PATH]
+    if nombre == "calendar":
+        # La carpeta cambia de mtime con cada partición reemplazada
+        return [storage_particionado.CALENDARIO_DIR, CALENDAR_PATH, CALENDAR_VERSION_PATH]
+    if nombre == "pedidos_excel":
+        return [storage_columnar.COLUMNAS_PATH, PEDIDOS_EXCEL_PATH]
+    return [{"units": UNITS_PATH, "calendar": CALENDAR_PATH}[nombre]]
+
+def _firma(nombre):
+    firma = [STORAGE_BACKEND, _versiones.get(nombre, 0)]
+    for ruta in _rutas_de(nombre):
+        try:
+            estado = os.stat(ruta)
+            firma.append((estado.st_mtime_ns, estado.st_size))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+def _invalidar(nombre):
+    _versiones[nombre] = _versiones.get(nombre, 0) + 1
+    _cache.pop(nombre, None)
+    for clave in [clave for clave in _cache_derivados if clave[0] == nombre]:
+        del _cache_derivados[clave]
+
+def _con_cache(nombre):
+    """Decorador para los load_*: devuelve lo que hay en memoria mientras la firma no cambie."""
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura():
+            # La firma se toma antes de leer: si el archivo cambia durante la lectura,
+            # la siguiente llamada vuelve a cargar en lugar de quedarse con datos viejos.
+            firma = _firma(nombre)
+            en_cache = _cache.get(nombre)
+            if en_cache is not None and en_cache[0] == firma:
+                return en_cache[1]
+            valor = func()
+            _cache[nombre] = (firma, valor)
+            return valor
+        return envoltura
+    return decorador
+
+def _invalida(nombre):
+    """Decorador para los save_*: tras escribir, descarta la copia en memoria y sus derivados."""
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _invalidar(nombre)
+        return envoltura
+    return decorador
+
+def obtener_derivado(nombre, clave, construir):
+    """
+    Estructura derivada de un dato persistido ("units", "calendar" o "pedidos_excel"),
+    p. ej. índices o resúmenes. `construir(valor)` solo se ejecuta cuando el dato cambió.
+    """
+    valor = {"units": load_units, "calendar": load_calendar, "pedidos_excel": load_pedidos_excel}[nombre]()
+    firma = _firma(nombre)
+    en_cache = _cache_derivados.get((nombre, clave))
+    if en_cache is not None and en_cache[0] == firma:
+        return en_cache[1]
+    derivado = construir(valor)
+    _cache_derivados[(nombre, clave)] = (firma, derivado)
+    return derivado
+
 # --- Funciones para Unidades ---
+@medido("storage.load_units")
+@_con_cache("units")
 def load_units():
     """Carga las unidades disponibles desde units.json. Crea el archivo si no existe."""
+    if STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.load_units()
     _asegurar_directorio_y_archivo(UNITS_PATH, {
         "Tráiler 53": 0,
         "Tráiler 48": 0,
@@ -33,31 +155,177 @@ def load_units():
     with open(UNITS_PATH, "r", encoding='utf-8') as f:
         return json.load(f)
 
+@medido("storage.save_units")
+@_invalida("units")
 def save_units(data):
     """Guarda las unidades actualizadas en units.json."""
-    # El directorio ya debería existir por load_units o la llamada inicial de _asegurar_directorio_y_archivo
-    with open(UNITS_PATH, "w", encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+    if STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.save_units(data)
+    escribir_json_atomico(UNITS_PATH, data)
 
 # --- Funciones para Calendario ---
+def version_calendario():
+    """Versión guardada del calendario: sube en uno con cada save_calendar, de cualquier proceso."""
+    if STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.version_calendario()
+    try:
+        with open(CALENDAR_VERSION_PATH, "r", encoding='utf-8') as f:
+            return json.load(f)["version"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return 0
+
+@medido("storage.load_calendar")
+@_con_cache("calendar")
 def load_calendar():
     """Carga el calendario completo desde calendar.json. Crea el archivo si no existe."""
+    if STORAGE_BACKEND == "sqlite":
+        calendar, version = storage_sqlite.load_calendar_con_version()
+        _base["calendar"] = (calendar, version)
+        return calendar
+    with bloqueo(CALENDAR_LOCK_PATH, compartido=True):
+        version = version_calendario()
+        calendar = _leer_calendario(retener=True)
+    _base["calendar"] = (calendar, version)
+    return calendar
+
+def _leer_calendario(retener=False):
+    """
+    Lectura directa del backend de archivos, sin caché ni candado. Con `retener` (la carga
+    del calendario en caché) los meses particionados que no cambiaron no se vuelven a leer;
+    sin él todo sale del disco, como necesita la relectura antes de reaplicar cambios.
+    """
+    if STORAGE_BACKEND == "diario":
+        return storage_diario.load_calendar()
+    if storage_particionado.existe():
+        return storage_particionado.load_calendar(retener)
     _asegurar_directorio_y_archivo(CALENDAR_PATH, {}) # Estructura inicial: diccionario vacío
     with open(CALENDAR_PATH, "r", encoding='utf-8') as f:
         return json.load(f)
 
-def save_calendar(data):
-    """Guarda el calendario actualizado en calendar.json."""
-    with open(CALENDAR_PATH, "w", encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
+@medido("storage.load_calendar_rango")
+def load_calendar_rango(desde, hasta):
+    """Carga solo los días entre `desde` y `hasta` ('YYYY-MM-DD', ambos inclusive)."""
+    if STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.load_calendar_rango(desde, hasta)
+    if STORAGE_BACKEND == "json" and storage_particionado.existe():
+        with bloqueo(CALENDAR_LOCK_PATH, compartido=True):
+            return storage_particionado.load_calendar_rango(desde, hasta)
+    return {fecha: eventos for fecha, eventos in load_calendar().items() if desde <= fecha <= hasta}
+
+def iterar_calendario(desde=None):
+    """
+    (fecha, eventos) en orden de fecha desde `desde` ('YYYY-MM-DD', inclusive) para recorridos
+    de un solo paso sobre historiales largos: con particiones o SQLite se lee un mes o un
+    cursor a la vez, sin cargar el calendario completo. Con calendar.json o el diario, que ya
+    se leen enteros, se recorre el calendario en caché. Las claves que no son fechas se omiten.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        yield from storage_sqlite.iterar_dias(desde)
+        return
+    if STORAGE_BACKEND == "json" and storage_particionado.existe():
+        # Un recorrido puede tardar: el candado compartido se toma mes por mes, no en todo el recorrido
+        yield from storage_particionado.iterar_dias(
+            desde, candado=lambda: bloqueo(CALENDAR_LOCK_PATH, compartido=True))
+        return
+    calendar = load_calendar()
+    for fecha_str in sorted(calendar):
+        if len(fecha_str) == 10 and (desde is None or fecha_str >= desde):
+            yield fecha_str, calendar[fecha_str]
+
+def _incrementales_al_dia(nombre, valor):
+    """Derivados incrementales en caché que corresponden a `valor`, el objeto en caché de `nombre`."""
+    en_cache = _cache.get(nombre)
+    if en_cache is None or en_cache[1] is not valor:
+        return {}
+    return {clave: derivado for (dato, clave), (firma, derivado) in _cache_derivados.items()
+            if dato == nombre and clave in DERIVADOS_INCREMENTALES.get(nombre, ()) and firma == en_cache[0]}
+
+def _conservar(nombre, valor, derivados):
+    """Tras un save_*, deja `valor` y sus derivados incrementales en caché con la firma nueva."""
+    firma = _firma(nombre)
+    _cache[nombre] = (firma, valor)
+    for clave, derivado in derivados.items():
+        _cache_derivados[(nombre, clave)] = (firma, derivado)
+
+@medido("storage.save_calendar")
+def save_calendar(data, cambios=None):
+    """
+    Guarda el calendario actualizado en calendar.json, siempre de forma atómica.
+    `cambios` (ver utils.cambios) permite a los backends SQLite y diario, y a las particiones
+    por mes, escribir solo lo afectado.
+
+    Si otra sesión o proceso guardó después de que se cargó `data`, con `cambios` se relee
+    la última versión y se reaplican sobre ella (las altas que ya existen y las bajas o
+    ediciones de eventos que ya no están se ignoran); `data` queda sin usar. Sin `cambios`
+    (limpieza, importación) `data` reemplaza el calendario completo. En SQLite los cambios
+    siempre se aplican fila por fila sobre lo último, dentro de la transacción que sube la versión.
+    Devuelve True si hubo que reaplicar los cambios sobre una versión más nueva.
+
+    Si no hubo que reaplicar, `data` (el calendario en caché) y sus índices, que
+    calendar_logic ya actualizó, siguen en caché: el siguiente rerun no los rearma.
+    """
+    incrementales = _incrementales_al_dia("calendar", data) if cambios is not None else {}
+    if STORAGE_BACKEND == "sqlite":
+        # Los cambios se aplican fila por fila sobre lo último, en la transacción que sube la versión
+        base = _base.pop("calendar", None)
+        try:
+            version = storage_sqlite.save_calendar(data, cambios)
+        finally:
+            _invalidar("calendar")
+        reaplicar = cambios is not None and (base is None or base[0] is not data or base[1] != version)
+        if cambios is not None and not reaplicar:
+            _conservar("calendar", data, incrementales)
+            _base["calendar"] = (data, version + 1)
+        return reaplicar
+    try:
+        with bloqueo(CALENDAR_LOCK_PATH):
+            version = version_calendario()
+            base = _base.pop("calendar", None)
+            reaplicar = cambios is not None and (base is None or base[0] is not data or base[1] != version)
+            if reaplicar and STORAGE_BACKEND != "diario":  # el diario ya guarda solo los cambios
+                data = aplicar_cambios(_leer_calendario(), cambios)
+            # La versión sube antes de escribir: un corte a la mitad obliga a releer, nunca a pisar
+            escribir_json_atomico(CALENDAR_VERSION_PATH, {"version": version + 1,
+                                                          "guardado": datetime.now().isoformat(timespec="seconds")})
+            if STORAGE_BACKEND == "diario":
+                storage_diario.save_calendar(data, cambios)
+            elif storage_particionado.existe():
+                storage_particionado.save_calendar(data, cambios)
+            else:
+                escribir_json_atomico(CALENDAR_PATH, data)
+    except BaseException:
+        # Los meses retenidos pueden traer cambios en memoria que no llegaron al disco
+        storage_particionado.olvidar()
+        raise
+    finally:
+        _invalidar("calendar")
+    if cambios is not None and not reaplicar:
+        _conservar("calendar", data, incrementales)
+        _base["calendar"] = (data, version + 1)
+    return reaplicar
 
 # --- ¡Nuevas Funciones para Pedidos de Excel Persistentes! ---
+@medido("storage.load_pedidos_excel")
+@_con_cache("pedidos_excel")
 def load_pedidos_excel():
     """
-    Carga los pedidos de Excel guardados desde un archivo JSON.
-    Retorna un DataFrame de pandas o None si no hay datos/archivo.
+    Carga los pedidos de Excel guardados (columnar en data/pedidos_excel/, ver utils.storage_columnar).
+    Si solo existe el JSON del formato anterior, se lee ese. "Cliente" siempre queda como categoría.
+    Retorna un DataFrame de pandas (vacío si no hay datos).
     """
-    _asegurar_directorio_y_archivo(PEDIDOS_EXCEL_PATH, []) # Estructura inicial: lista vacía
+    if STORAGE_BACKEND == "sqlite":
+        df = storage_sqlite.load_pedidos_excel()
+    elif storage_columnar.existe():
+        df = storage_columnar.load_pedidos_excel()
+    else:
+        df = _load_pedidos_excel_json()
+    if "Cliente" in df.columns and not isinstance(df["Cliente"].dtype, pd.CategoricalDtype):
+        df["Cliente"] = df["Cliente"].astype(str).astype("category")
+    return df
+
+def _load_pedidos_excel_json():
+    if not os.path.exists(PEDIDOS_EXCEL_PATH):
+        return pd.DataFrame()
     with open(PEDIDOS_EXCEL_PATH, "r", encoding='utf-8') as f:
         try:
             data = json.load(f)
@@ -71,11 +339,38 @@ def load_pedidos_excel():
             # Si el archivo está vacío o corrupto, retorna un DataFrame vacío
             return pd.DataFrame() # O None, dependiendo de tu preferencia
 
+def clientes_normalizados(df):
+    """
+    Clientes sin acentos y en minúsculas, alineados con `df["Cliente"].cat.categories`.
+    En formato columnar vienen precalculados desde disco (si corresponden a estas categorías);
+    si no, se calculan una vez por valor distinto.
+    """
+    if "Cliente" not in df.columns:
+        return np.array([], dtype=str)
+    if STORAGE_BACKEND != "sqlite" and storage_columnar.existe():
+        guardados = storage_columnar.load_clientes_normalizados()
+        if guardados is not None and len(guardados) == len(df["Cliente"].cat.categories):
+            return guardados
+    return np.array([normalizar_texto(cliente) for cliente in df["Cliente"].cat.categories], dtype=str)
+
+@medido("storage.save_pedidos_excel")
+@_invalida("pedidos_excel")
 def save_pedidos_excel(df: pd.DataFrame):
     """
-    Guarda un DataFrame de pedidos de Excel en un archivo JSON.
+    Guarda un DataFrame de pedidos de Excel en formato columnar y retira el JSON anterior.
     """
-    _asegurar_directorio_y_archivo(PEDIDOS_EXCEL_PATH, []) # Asegura que el archivo exista antes de intentar escribir
-    with open(PEDIDOS_EXCEL_PATH, "w", encoding='utf-8') as f:
-        # Convertir DataFrame a lista de diccionarios para guardar en JSON
-        json.dump(df.to_dict(orient="records"), f, indent=2)
\ No newline at end of file
+    if STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.save_pedidos_excel(df)
+    storage_columnar.save_pedidos_excel(df)
+    if os.path.exists(PEDIDOS_EXCEL_PATH):
+        os.remove(PEDIDOS_EXCEL_PATH)
+
+@medido("storage.delete_pedidos_excel")
+@_invalida("pedidos_excel")
+def delete_pedidos_excel():
+    """Elimina permanentemente los pedidos de Excel guardados."""
+    if STORAGE_BACKEND == "sqlite":
+        return storage_sqlite.delete_pedidos_excel()
+    storage_columnar.delete_pedidos_excel()
+    if os.path.exists(PEDIDOS_EXCEL_PATH):
+        os.remove(PEDIDOS_EXCEL_PATH)
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils.archivos import escribir_json_atomico
+from utils.texto import normalizar_texto
+
+# --- Pedidos de Excel en formato columnar (arreglos NumPy .npy) ---
+# data/pedidos_excel/
+#   columnas.json                 nombres, tipo de cada columna y número de filas (se escribe al final)
+#   columna_<i>.npy               columnas numéricas tal cual
+#   columna_<i>.codigos.npy       columnas de texto: un código int32 por fila (-1 = vacío)...
+#   columna_<i>.categorias.npy    ...y cada valor distinto una sola vez
+#   clientes_normalizados.npy     categorías de "Cliente" sin acentos y en minúsculas, para buscar
+# Los .npy se abren con memoria mapeada: cargar no copia los arreglos ni rearma texto por fila.
+PEDIDOS_EXCEL_DIR = os.path.join("data", "pedidos_excel")
+COLUMNAS_PATH = os.path.join(PEDIDOS_EXCEL_DIR, "columnas.json")
+
+
+def existe():
+    return os.path.exists(COLUMNAS_PATH)
+
+
+def _ruta(nombre):
+    return os.path.join(PEDIDOS_EXCEL_DIR, nombre)
+
+
+def _guardar_npy(nombre, arreglo):
+    """Escribe un .npy en un temporal y lo renombra encima: quien lo tenga mapeado sigue leyendo el anterior."""
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".npy", dir=PEDIDOS_EXCEL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, arreglo, allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, _ruta(nombre))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _cargar_npy(nombre):
+    return np.load(_ruta(nombre), mmap_mode="r", allow_pickle=False)
+
+
+def _categorias_texto(valores):
+    # Arreglo de texto de ancho fijo (no de objetos) para poder mapearlo desde disco
+    return np.array([str(valor) for valor in valores], dtype=str) if len(valores) else np.array([], dtype="<U1")
+
+
+def save_pedidos_excel(df: pd.DataFrame):
+    os.makedirs(PEDIDOS_EXCEL_DIR, exist_ok=True)
+    columnas = []
+    escritos = set()
+    for i, nombre in enumerate(df.columns):
+        serie = df[nombre]
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            _guardar_npy(f"columna_{i}.npy", serie.to_numpy())
+            escritos.add(f"columna_{i}.npy")
+            columnas.append({"nombre": nombre, "tipo": "numerica"})
+            continue
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos, categorias = serie.cat.codes.to_numpy(), serie.cat.categories
+        else:
+            codigos, categorias = pd.factorize(serie)
+        _guardar_npy(f"columna_{i}.codigos.npy", codigos.astype(np.int32))
+        _guardar_npy(f"columna_{i}.categorias.npy", _categorias_texto(categorias))
+        escritos.update({f"columna_{i}.codigos.npy", f"columna_{i}.categorias.npy"})
+        columnas.append({"nombre": nombre, "tipo": "categorica"})
+        if nombre == "Cliente":
+            _guardar_npy("clientes_normalizados.npy",
+                         _categorias_texto([normalizar_texto(cliente) for cliente in categorias]))
+            escritos.add("clientes_normalizados.npy")
+
+    escribir_json_atomico(COLUMNAS_PATH, {"filas": len(df), "columnas": columnas})
+    # Lo que quedó de un Excel anterior (más columnas, o "Cliente" en otra forma) ya no corresponde
+    for nombre in os.listdir(PEDIDOS_EXCEL_DIR):
+        if nombre.endswith(".npy") and not nombre.startswith(".tmp-") and nombre not in escritos:
+            os.remove(_ruta(nombre))
+
+
+def load_pedidos_excel():
+    with open(COLUMNAS_PATH, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    datos = {}
+    for i, columna in enumerate(meta["columnas"]):
+        if columna["tipo"] == "numerica":
+            datos[columna["nombre"]] = _cargar_npy(f"columna_{i}.npy")
+        else:
+            categorias = _cargar_npy(f"columna_{i}.categorias.npy")
+            datos[columna["nombre"]] = pd.Categorical.from_codes(_cargar_npy(f"columna_{i}.codigos.npy"),
+                                                                categories=pd.Index(categorias))
+    return pd.DataFrame(datos, index=pd.RangeIndex(meta["filas"]))
+
+
+def load_clientes_normalizados():
+    """
+    Categorías de "Cliente" normalizadas, en el mismo orden que `df["Cliente"].cat.categories`,
+    o None si no se guardaron.
+    """
+    if not os.path.exists(_ruta("clientes_normalizados.npy")):
+        return None
+    return _cargar_npy("clientes_normalizados.npy")
+
+
+def delete_pedidos_excel():
+    if os.path.exists(PEDIDOS_EXCEL_DIR):
+        shutil.rmtree(PEDIDOS_EXCEL_DIR)
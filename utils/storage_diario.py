@@ -0,0 +1,95 @@
+import json
+import os
+
+from utils.archivos import escribir_json_atomico
+from utils.cambios import aplicar_cambios
+
+# --- Calendario en modo diario: última foto (snapshot) + registro de cambios (WAL) ---
+# La foto es el mismo calendar.json de siempre; cada alta, baja o edición agrega
+# una línea JSON compacta al registro y se sincroniza a disco antes de volver.
+CALENDAR_PATH = os.path.join("data", "calendar.json")
+DIARIO_PATH = os.path.join("data", "calendar.wal.jsonl")
+
+# Cuántas líneas de registro se toleran antes de consolidarlas en una nueva foto
+UMBRAL_COMPACTACION = int(os.environ.get("REYMA_DIARIO_UMBRAL", "500"))
+
+
+def _leer_foto():
+    if not os.path.exists(CALENDAR_PATH):
+        return {}
+    with open(CALENDAR_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _leer_diario():
+    """Cambios del registro, en orden. Las líneas incompletas (corte a mitad de escritura) se descartan."""
+    if not os.path.exists(DIARIO_PATH):
+        return []
+    cambios = []
+    with open(DIARIO_PATH, "r", encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                cambios.append(json.loads(linea))
+            except json.JSONDecodeError:
+                continue
+    return cambios
+
+
+def _lineas_en_diario():
+    if not os.path.exists(DIARIO_PATH):
+        return 0
+    with open(DIARIO_PATH, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def _termina_en_salto(tamano):
+    with open(DIARIO_PATH, "rb") as f:
+        f.seek(tamano - 1)
+        return f.read(1) == b"\n"
+
+
+def load_calendar():
+    """Última foto más los cambios registrados desde entonces."""
+    return aplicar_cambios(_leer_foto(), _leer_diario())
+
+
+def compactar(data=None):
+    """
+    Escribe una nueva foto de forma atómica y vacía el registro. Sin `data`, la foto
+    se arma desde disco (foto anterior + registro) para no perder cambios ajenos.
+    """
+    if data is None:
+        data = load_calendar()
+    escribir_json_atomico(CALENDAR_PATH, data)
+    with open(DIARIO_PATH, "w", encoding="utf-8") as f:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def save_calendar(data, cambios=None):
+    """
+    Con `cambios`, agrega una línea por cambio al registro y hace fsync: el costo no
+    depende del tamaño del historial. Sin ellos (limpieza, importación) se compacta
+    directamente con `data` como nueva foto.
+    """
+    if cambios is None:
+        compactar(data)
+        return
+
+    dir_name = os.path.dirname(DIARIO_PATH)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    with open(DIARIO_PATH, "ab") as f:
+        # Si un corte dejó una línea a medias, los cambios nuevos empiezan en su propia línea
+        if f.tell() > 0 and not _termina_en_salto(f.tell()):
+            f.write(b"\n")
+        for cambio in cambios:
+            f.write((json.dumps(cambio, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+    if _lineas_en_diario() >= UMBRAL_COMPACTACION:
+        compactar()
@@ -0,0 +1,245 @@
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import date
+
+# --- Calendario particionado por mes ---
+# data/calendar/2025-08.json       un archivo por mes con los días de ese mes
+# data/calendar/2025-01.json.gz    meses viejos archivados con gzip (se siguen leyendo igual)
+# data/calendar/sin-fecha.json     claves que no son 'YYYY-MM-DD', si las hubiera
+# Guardar solo reescribe los meses que cambiaron; cargar un rango solo lee los meses que lo tocan.
+# Para pasar de data/calendar.json a este formato: `python -m utils.storage_particionado`
+# (calendar.json queda como respaldo; con data/calendar/ presente, la app usa las particiones).
+CALENDARIO_DIR = os.path.join("data", "calendar")
+SIN_FECHA = "sin-fecha"
+
+# Meses completos de antigüedad a partir de los cuales una partición se comprime
+MESES_PARA_ARCHIVAR = int(os.environ.get("REYMA_MESES_ARCHIVO", "6"))
+
+_PATRON_PARTICION = re.compile(r"^(\d{4}-\d{2}|sin-fecha)\.json(\.gz)?$")
+_PATRON_FECHA = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+_huellas = {}  # mes -> sha1 del contenido escrito o leído, para no reescribir lo que no cambió
+_leidas = {}  # nombre de archivo -> ((mtime, tamaño), días leídos)
+
+
+def existe():
+    return os.path.isdir(CALENDARIO_DIR)
+
+
+def _mes(fecha_str):
+    return fecha_str[:7] if _PATRON_FECHA.match(fecha_str) else SIN_FECHA
+
+
+def _particiones():
+    """{mes: nombre de archivo} de las particiones presentes en disco."""
+    if not existe():
+        return {}
+    particiones = {}
+    for nombre in os.listdir(CALENDARIO_DIR):
+        coincidencia = _PATRON_PARTICION.match(nombre)
+        if coincidencia:
+            particiones[coincidencia.group(1)] = nombre
+    return particiones
+
+
+def _leer(nombre, guardar=True):
+    """
+    Días de una partición. Si el archivo no cambió (mtime y tamaño) desde la última lectura
+    se devuelve lo ya leído, sin copiarlo: tras guardar un mes, recargar el calendario solo
+    relee ese mes. Lo retenido es lo mismo que queda en el calendario en memoria, que se
+    modifica en el lugar; sigue valiendo porque cada save_calendar reescribe los meses que
+    tocó (cambia su firma y se releen) y `olvidar` lo descarta si un guardado falla.
+    Con guardar=False se lee del disco y no se retiene: recorridos de un solo paso, como la
+    exportación, lo que se modifica sin ser el calendario en memoria, como las migraciones,
+    o la relectura antes de reaplicar cambios, que tiene que reflejar el archivo.
+    """
+    path = os.path.join(CALENDARIO_DIR, nombre)
+    estado = os.stat(path)
+    firma = (estado.st_mtime_ns, estado.st_size)
+    en_cache = _leidas.get(nombre)
+    if guardar and en_cache is not None and en_cache[0] == firma:
+        return en_cache[1]
+    abrir = gzip.open if nombre.endswith(".gz") else open
+    with abrir(path, "rb") as f:
+        contenido = f.read()
+    _huellas[_PATRON_PARTICION.match(nombre).group(1)] = hashlib.sha1(contenido).hexdigest()
+    dias = json.loads(contenido)
+    if guardar:
+        _leidas[nombre] = (firma, dias)
+    return dias
+
+
+def olvidar():
+    """Descarta los meses retenidos: la siguiente carga los lee todos del disco."""
+    _leidas.clear()
+
+
+def _serializar(dias):
+    return json.dumps(dias, indent=2).encode("utf-8")
+
+
+def _escribir(mes, dias, comprimido):
+    """Escribe una partición de forma atómica y retira la versión en el otro formato, si existe."""
+    contenido = _serializar(dias)
+    nombre = f"{mes}.json.gz" if comprimido else f"{mes}.json"
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=CALENDARIO_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(gzip.compress(contenido, mtime=0) if comprimido else contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(CALENDARIO_DIR, nombre))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    otro = os.path.join(CALENDARIO_DIR, f"{mes}.json" if comprimido else f"{mes}.json.gz")
+    if os.path.exists(otro):
+        os.remove(otro)
+    _huellas[mes] = hashlib.sha1(contenido).hexdigest()
+
+
+def _borrar(mes, nombre):
+    os.remove(os.path.join(CALENDARIO_DIR, nombre))
+    _huellas.pop(mes, None)
+
+
+def _por_mes(data, meses=None):
+    agrupado = {}
+    for fecha_str, eventos in data.items():
+        mes = _mes(fecha_str)
+        if meses is None or mes in meses:
+            agrupado.setdefault(mes, {})[fecha_str] = eventos
+    return agrupado
+
+
+def load_calendar(retener=True):
+    """
+    Todos los meses, incluidos los archivados, en orden cronológico. Con `retener` los meses
+    que no cambiaron se toman de lo ya leído (ver `_leer`); sin él todo se lee del disco.
+    """
+    calendar = {}
+    for _, nombre in sorted(_particiones().items()):
+        calendar.update(_leer(nombre, guardar=retener))
+    return calendar
+
+
+def load_calendar_rango(desde, hasta):
+    """Días entre `desde` y `hasta` ('YYYY-MM-DD', inclusive), leyendo solo los meses que los tocan."""
+    calendar = {}
+    for mes, nombre in sorted(_particiones().items()):
+        if mes == SIN_FECHA or not desde[:7] <= mes <= hasta[:7]:
+            continue
+        for fecha_str, eventos in _leer(nombre).items():
+            if desde <= fecha_str <= hasta:
+                calendar[fecha_str] = [dict(evento) for evento in eventos]  # lo retenido no sale tal cual
+    return calendar
+
+
+def iterar_dias(desde=None, candado=contextlib.nullcontext):
+    """
+    (fecha, eventos) en orden de fecha desde `desde` ('YYYY-MM-DD', inclusive), un mes a la
+    vez y sin retener los meses ya recorridos. Omite la partición sin fecha. `candado()` se
+    toma para listar las particiones y para leer cada mes, no durante todo el recorrido.
+    """
+    with candado():
+        particiones = sorted(_particiones().items())
+    for mes, nombre in particiones:
+        if mes == SIN_FECHA or (desde is not None and mes < desde[:7]):
+            continue
+        with candado():
+            try:
+                dias = _leer(nombre, guardar=False)
+            except FileNotFoundError:  # se archivó con gzip (o se vació) después de listarla
+                nombre = _particiones().get(mes)
+                if nombre is None:
+                    continue
+                dias = _leer(nombre, guardar=False)
+        for fecha_str, eventos in sorted(dias.items()):
+            if desde is None or fecha_str >= desde:
+                yield fecha_str, eventos
+
+
+def transformar(procesar_mes, escribir=True):
+    """
+    Pasa cada mes, en orden, por `procesar_mes(dias)`, que modifica los días en el lugar y
+    devuelve True si cambió algo; con `escribir`, esos meses se reescriben de forma atómica.
+    Solo hay un mes en memoria a la vez.
+    """
+    for mes, nombre in sorted(_particiones().items()):
+        dias = _leer(nombre, guardar=False)
+        if procesar_mes(dias) and escribir:
+            _escribir(mes, dias, comprimido=nombre.endswith(".gz"))
+
+
+def save_calendar(data, cambios=None):
+    """
+    Con `cambios`, reescribe solo los meses de las fechas afectadas. Sin ellos compara cada
+    mes con lo último leído o escrito y reescribe solo los distintos; los meses que ya no
+    están en `data` se borran. Al final archiva los meses viejos.
+    """
+    os.makedirs(CALENDARIO_DIR, exist_ok=True)
+    particiones = _particiones()
+
+    if cambios is not None:
+        meses = {_mes(cambio["fecha"]) for cambio in cambios}
+        agrupado = _por_mes(data, meses)
+        for mes in meses:
+            dias = agrupado.get(mes)
+            if dias:
+                _escribir(mes, dias, comprimido=particiones.get(mes, "").endswith(".gz"))
+            elif mes in particiones:
+                _borrar(mes, particiones[mes])
+    else:
+        agrupado = _por_mes(data)
+        for mes, dias in agrupado.items():
+            if _huellas.get(mes) != hashlib.sha1(_serializar(dias)).hexdigest() or mes not in particiones:
+                _escribir(mes, dias, comprimido=particiones.get(mes, "").endswith(".gz"))
+        for mes, nombre in particiones.items():
+            if mes not in agrupado:
+                _borrar(mes, nombre)
+
+    archivar()
+
+
+def archivar(meses=MESES_PARA_ARCHIVAR, hoy=None):
+    """Comprime con gzip las particiones de meses anteriores al corte (hoy menos `meses` meses)."""
+    hoy = hoy or date.today()
+    total = hoy.year * 12 + hoy.month - 1 - meses
+    corte = f"{total // 12:04d}-{total % 12 + 1:02d}"
+    archivados = 0
+    for mes, nombre in _particiones().items():
+        if mes != SIN_FECHA and mes < corte and not nombre.endswith(".gz"):
+            _escribir(mes, _leer(nombre), comprimido=True)
+            archivados += 1
+    return archivados
+
+
+def migrar_desde_archivo(calendar_path):
+    """Reparte un calendar.json de un solo archivo en particiones por mes. El original no se toca."""
+    with open(calendar_path, "r", encoding="utf-8") as f:
+        calendar = json.load(f)
+    os.makedirs(CALENDARIO_DIR, exist_ok=True)
+    for mes, dias in _por_mes(calendar).items():
+        _escribir(mes, dias, comprimido=False)
+    archivar()
+    return calendar
+
+
+if __name__ == "__main__":
+    from utils.storage import CALENDAR_PATH
+
+    if existe() and _particiones():
+        print(f"⚠️ {CALENDARIO_DIR} ya tiene particiones; no se migró nada.")
+    else:
+        print(f"📁 Repartiendo {CALENDAR_PATH} en {CALENDARIO_DIR}...")
+        calendario = migrar_desde_archivo(CALENDAR_PATH)
+        particiones = _particiones()
+        archivadas = sum(1 for nombre in particiones.values() if nombre.endswith(".gz"))
+        print(f"✅ Migración completada. {len(calendario)} días en {len(particiones)} meses "
+              f"({archivadas} archivados con gzip). {CALENDAR_PATH} queda como respaldo.")
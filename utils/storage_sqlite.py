@@ -0,0 +1,320 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from utils import storage_columnar, storage_particionado
+from utils.cambios import clave_evento
+
+# --- Ruta de la base de datos ---
+DB_PATH = os.path.join("data", "reyma.db")
+
+UNIDADES_INICIALES = {
+    "Tráiler 53": 0,
+    "Tráiler 48": 0,
+    "Torton": 0,
+    "Interplanta": 0
+}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS unidades (
+    nombre TEXT PRIMARY KEY,
+    cantidad INTEGER NOT NULL,
+    orden INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY,  -- conserva el orden de inserción dentro de cada día
+    fecha TEXT NOT NULL,
+    tipo_evento TEXT,
+    unidad TEXT,
+    pedido_id TEXT,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_eventos_fecha ON eventos (fecha);
+CREATE INDEX IF NOT EXISTS idx_eventos_unidad_fecha ON eventos (unidad, fecha);
+CREATE INDEX IF NOT EXISTS idx_eventos_pedido ON eventos (pedido_id, tipo_evento);
+CREATE TABLE IF NOT EXISTS pedidos_excel (
+    fila INTEGER PRIMARY KEY,
+    datos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+"""
+
+
+def _conectar():
+    """Abre la base de datos y crea las tablas si hace falta."""
+    dir_name = os.path.dirname(DB_PATH)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    conexion = sqlite3.connect(DB_PATH)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.executescript(_ESQUEMA)
+    return conexion
+
+
+def _fila_evento(fecha_str, evento):
+    tipo, pedido_id = clave_evento(evento)
+    return fecha_str, tipo, evento.get("unidad"), pedido_id, json.dumps(evento, ensure_ascii=False)
+
+
+def _filtro_evento(fecha_str, evento):
+    """WHERE para ubicar un evento: por id de pedido, o por su contenido si no tiene id."""
+    tipo, pedido_id = clave_evento(evento)
+    if pedido_id:
+        return "fecha = ? AND tipo_evento = ? AND pedido_id = ?", (fecha_str, tipo, pedido_id)
+    return "fecha = ? AND datos = ?", (fecha_str, json.dumps(evento, ensure_ascii=False))
+
+
+# --- Unidades ---
+def load_units():
+    with closing(_conectar()) as conexion:
+        filas = conexion.execute("SELECT nombre, cantidad FROM unidades ORDER BY orden").fetchall()
+        if not filas:
+            save_units(UNIDADES_INICIALES)
+            return dict(UNIDADES_INICIALES)
+        return {nombre: cantidad for nombre, cantidad in filas}
+
+
+def save_units(data):
+    """Inserta o actualiza cada unidad; las filas sin cambios no se reescriben."""
+    with closing(_conectar()) as conexion, conexion:
+        conexion.executemany(
+            "INSERT INTO unidades (nombre, cantidad, orden) VALUES (?, ?, ?) "
+            "ON CONFLICT(nombre) DO UPDATE SET cantidad = excluded.cantidad "
+            "WHERE cantidad != excluded.cantidad",
+            [(nombre, int(cantidad), orden) for orden, (nombre, cantidad) in enumerate(data.items())]
+        )
+
+
+# --- Calendario ---
+def _subir_version(conexion):
+    """Sube la versión del calendario dentro de la misma transacción que lo modifica. Devuelve la nueva."""
+    conexion.execute("INSERT INTO meta (clave, valor) VALUES ('version_calendario', 1) "
+                     "ON CONFLICT(clave) DO UPDATE SET valor = valor + 1")
+    return conexion.execute("SELECT valor FROM meta WHERE clave = 'version_calendario'").fetchone()[0]
+
+
+def version_calendario():
+    with closing(_conectar()) as conexion:
+        fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'version_calendario'").fetchone()
+        return fila[0] if fila else 0
+
+
+def _filas_a_calendario(filas):
+    calendar = {}
+    for fecha_str, datos in filas:
+        calendar.setdefault(fecha_str, []).append(json.loads(datos))
+    return calendar
+
+
+def load_calendar():
+    return load_calendar_con_version()[0]
+
+
+def load_calendar_con_version():
+    """(calendario, versión) leídos en una misma transacción: la versión es exactamente la de lo leído."""
+    with closing(_conectar()) as conexion:
+        conexion.execute("BEGIN")
+        fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'version_calendario'").fetchone()
+        calendar = _filas_a_calendario(conexion.execute("SELECT fecha, datos FROM eventos ORDER BY fecha, id"))
+        conexion.rollback()
+    return calendar, fila[0] if fila else 0
+
+
+def load_calendar_rango(desde, hasta):
+    """Solo los días entre `desde` y `hasta` ('YYYY-MM-DD', inclusive), vía el índice por fecha."""
+    with closing(_conectar()) as conexion:
+        return _filas_a_calendario(conexion.execute(
+            "SELECT fecha, datos FROM eventos WHERE fecha BETWEEN ? AND ? ORDER BY fecha, id", (desde, hasta)
+        ))
+
+
+def iterar_dias(desde=None):
+    """(fecha, eventos) en orden de fecha desde `desde`, leyendo las filas con un cursor (sin cargar todo)."""
+    with closing(_conectar()) as conexion:
+        filas = conexion.execute("SELECT fecha, datos FROM eventos WHERE fecha >= ? ORDER BY fecha, id",
+                                 (desde or "",))
+        fecha_actual, eventos = None, []
+        for fecha_str, datos in filas:
+            if fecha_str != fecha_actual:
+                if eventos:
+                    yield fecha_actual, eventos
+                fecha_actual, eventos = fecha_str, []
+            eventos.append(json.loads(datos))
+        if eventos:
+            yield fecha_actual, eventos
+
+
+def version_esquema():
+    """Versión de esquema de los eventos (ver utils.migraciones); 0 si nunca se migró."""
+    with closing(_conectar()) as conexion:
+        fila = conexion.execute("SELECT valor FROM meta WHERE clave = 'version_esquema'").fetchone()
+        return fila[0] if fila else 0
+
+
+def transformar(procesar_dia, version, escribir=True):
+    """
+    Pasa cada día, en orden, por `procesar_dia(fecha, eventos)`, que modifica los eventos en
+    el lugar. Con `escribir`, las filas que cambiaron (con sus columnas de búsqueda) se
+    actualizan por tandas en una sola transacción, que además deja `version` como versión
+    de esquema; al final se reconstruyen los índices. Se lee con un cursor aparte (WAL), así
+    que en memoria solo hay un día y una tanda de filas.
+    """
+    with closing(_conectar()) as lectura, closing(_conectar()) as escritura:
+        tanda = []
+        fecha_actual, filas_dia = None, []
+
+        def _procesar():
+            eventos = [json.loads(datos) for _, datos in filas_dia]
+            procesar_dia(fecha_actual, eventos)
+            for (fila_id, datos), evento in zip(filas_dia, eventos):
+                _, tipo, unidad, pedido_id, nuevos = _fila_evento(fecha_actual, evento)
+                if nuevos != datos:
+                    tanda.append((tipo, unidad, pedido_id, nuevos, fila_id))
+            if escribir and len(tanda) >= 1000:
+                _actualizar()
+
+        def _actualizar():
+            escritura.executemany("UPDATE eventos SET tipo_evento = ?, unidad = ?, pedido_id = ?, datos = ? "
+                                  "WHERE id = ?", tanda)
+            tanda.clear()
+
+        with escritura:
+            if escribir:
+                escritura.execute("BEGIN IMMEDIATE")
+                _subir_version(escritura)
+            for fila_id, fecha_str, datos in lectura.execute("SELECT id, fecha, datos FROM eventos ORDER BY fecha, id"):
+                if fecha_str != fecha_actual and filas_dia:
+                    _procesar()
+                    filas_dia = []
+                fecha_actual = fecha_str
+                filas_dia.append((fila_id, datos))
+            if filas_dia:
+                _procesar()
+            if not escribir:
+                return
+            _actualizar()
+            escritura.execute("INSERT INTO meta (clave, valor) VALUES ('version_esquema', ?) "
+                              "ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor", (version,))
+        escritura.execute("REINDEX eventos")
+        escritura.execute("ANALYZE eventos")
+
+
+def aplicar_cambios(cambios):
+    """
+    Aplica los cambios de `calendar_logic` fila por fila dentro de una transacción.
+    Devuelve la versión que tenía el calendario justo antes de aplicarlos.
+    """
+    with closing(_conectar()) as conexion, conexion:
+        version = _subir_version(conexion)
+        for cambio in cambios:
+            fecha_str, evento = cambio["fecha"], cambio["evento"]
+            if cambio["op"] == "insertar":
+                conexion.execute(
+                    "INSERT INTO eventos (fecha, tipo_evento, unidad, pedido_id, datos) VALUES (?, ?, ?, ?, ?)",
+                    _fila_evento(fecha_str, evento)
+                )
+            elif cambio["op"] == "quitar":
+                where, params = _filtro_evento(fecha_str, evento)
+                conexion.execute(f"DELETE FROM eventos WHERE id = (SELECT id FROM eventos WHERE {where} LIMIT 1)",
+                                 params)
+            elif cambio["op"] == "actualizar":
+                where, params = _filtro_evento(fecha_str, cambio["anterior"])
+                _, _, unidad, _, datos = _fila_evento(fecha_str, evento)
+                conexion.execute(f"UPDATE eventos SET unidad = ?, datos = ? WHERE {where}", (unidad, datos, *params))
+    return version - 1
+
+
+def save_calendar(data, cambios=None):
+    """
+    Con `cambios` solo se escriben esas filas. Sin ellos se reemplaza el calendario
+    completo (limpieza de datos, importación), también en una sola transacción.
+    Devuelve la versión que tenía el calendario antes de guardar.
+    """
+    if cambios is not None:
+        return aplicar_cambios(cambios)
+    with closing(_conectar()) as conexion, conexion:
+        version = _subir_version(conexion)
+        conexion.execute("DELETE FROM eventos")
+        conexion.executemany(
+            "INSERT INTO eventos (fecha, tipo_evento, unidad, pedido_id, datos) VALUES (?, ?, ?, ?, ?)",
+            (_fila_evento(fecha_str, evento) for fecha_str, eventos in data.items() for evento in eventos)
+        )
+    return version - 1
+
+
+# --- Pedidos de Excel ---
+def load_pedidos_excel():
+    with closing(_conectar()) as conexion:
+        filas = conexion.execute("SELECT datos FROM pedidos_excel ORDER BY fila").fetchall()
+    return pd.DataFrame([json.loads(datos) for datos, in filas])
+
+
+def save_pedidos_excel(df: pd.DataFrame):
+    with closing(_conectar()) as conexion, conexion:
+        conexion.execute("DELETE FROM pedidos_excel")
+        conexion.executemany(
+            "INSERT INTO pedidos_excel (fila, datos) VALUES (?, ?)",
+            [(fila, json.dumps(registro, ensure_ascii=False, default=str))
+             for fila, registro in enumerate(df.to_dict(orient="records"))]
+        )
+
+
+def delete_pedidos_excel():
+    with closing(_conectar()) as conexion, conexion:
+        conexion.execute("DELETE FROM pedidos_excel")
+
+
+# --- Importación única desde los archivos JSON ---
+def importar_desde_json(units_path, calendar_path, pedidos_excel_path):
+    """
+    Copia units.json, el calendario (particionado por mes o calendar.json) y los pedidos de
+    Excel guardados (columnares o, si no hay, el JSON anterior) a la base de datos.
+    """
+    resumen = {"unidades": 0, "eventos": 0, "pedidos_excel": 0}
+
+    if os.path.exists(units_path):
+        with open(units_path, "r", encoding="utf-8") as f:
+            units = json.load(f)
+        save_units(units)
+        resumen["unidades"] = len(units)
+
+    if storage_particionado.existe():
+        calendar = storage_particionado.load_calendar()
+        save_calendar(calendar)
+        resumen["eventos"] = sum(len(eventos) for eventos in calendar.values())
+    elif os.path.exists(calendar_path):
+        with open(calendar_path, "r", encoding="utf-8") as f:
+            calendar = json.load(f)
+        save_calendar(calendar)
+        resumen["eventos"] = sum(len(eventos) for eventos in calendar.values())
+
+    if storage_columnar.existe():
+        pedidos = storage_columnar.load_pedidos_excel()
+        save_pedidos_excel(pedidos)
+        resumen["pedidos_excel"] = len(pedidos)
+    elif os.path.exists(pedidos_excel_path):
+        with open(pedidos_excel_path, "r", encoding="utf-8") as f:
+            try:
+                pedidos = json.load(f)
+            except json.JSONDecodeError:
+                pedidos = []
+        if isinstance(pedidos, list):
+            save_pedidos_excel(pd.DataFrame(pedidos))
+            resumen["pedidos_excel"] = len(pedidos)
+
+    return resumen
+
+
+if __name__ == "__main__":
+    from utils.storage import UNITS_PATH, CALENDAR_PATH, PEDIDOS_EXCEL_PATH
+
+    print(f"📁 Importando datos JSON a {DB_PATH}...")
+    resumen = importar_desde_json(UNITS_PATH, CALENDAR_PATH, PEDIDOS_EXCEL_PATH)
+    print(f"✅ Importación completada. {resumen['unidades']} unidades, {resumen['eventos']} eventos, "
+          f"{resumen['pedidos_excel']} pedidos de Excel.")
@@ -0,0 +1,11 @@
+import unicodedata
+
+
+def normalizar_texto(valor):
+    """
+    Texto para comparar y buscar: sin acentos, en minúsculas (casefold) y con los
+    espacios repetidos colapsados. 'Cancún  Centro' -> 'cancun centro'.
+    """
+    texto = unicodedata.normalize("NFKD", str(valor))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split()).casefold()